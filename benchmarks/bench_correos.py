@@ -0,0 +1,165 @@
+# benchmarks/bench_correos.py
+
+"""
+Benchmark del envío de correos de las operaciones de parqueo.
+
+Ejecuta alquilar_espacio, registrar_multa y verificar_multas contra el
+servidor SMTP local (modulo_smtp_local), en una carpeta temporal, y
+reporta:
+- Latencia de cada operación (p50/p99), que incluye dejar el correo en
+  la bandeja de salida
+- Correos por segundo, latencia de envío por correo (p50/p99) y
+  conexiones SMTP abiertas al vaciar la bandeja
+
+Con --directo cada correo se envía dentro de la operación, sin bandeja de
+salida, para comparar. --demora simula la latencia de un servidor real
+(segundos antes de cada respuesta SMTP) y --sin-reutilizar desactiva las
+conexiones guardadas del transporte.
+
+Uso:
+    python benchmarks/bench_correos.py [--alquileres 200] [--multas 20] [--vencidos 200]
+        [--demora 0.005] [--almacen sqlite] [--directo] [--sin-reutilizar]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import modulo_almacen as ma
+import modulo_multas as mm
+import modulo_parqueo as mp
+import modulo_smtp_local as msl
+import modulo_utiles as mu
+
+class TransporteMedido(mu.TransporteSMTP):
+    """Transporte que guarda la duración de cada envío."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.duraciones = []
+
+    def enviar(self, mensaje) -> None:
+        inicio = time.perf_counter()
+        super().enviar(mensaje)
+        self.duraciones.append(time.perf_counter() - inicio)
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil p (0-100) por el método del rango más cercano."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))]
+
+def enviar_sin_bandeja(mensajes: list, path: str = None) -> list:
+    """Reemplazo de mu.encolar_correos que envía cada correo en el momento."""
+    transporte = mu.obtener_transporte()
+    for destino, asunto, cuerpo, *resto in mensajes:
+        transporte.enviar(mu._crear_mensaje(destino, asunto, cuerpo, resto[0] if resto else ()))
+    return [""] * len(mensajes)
+
+def preparar_datos(almacen, cantidad: int) -> None:
+    """
+    Crea espacios libres y usuarios, cada uno con un vehículo.
+
+    Args:
+        almacen: Almacén configurado (ver modulo_almacen).
+        cantidad (int): Cantidad de espacios y de usuarios.
+    """
+    mu.escribir_json(mp.CONFIG_PATH, {"tarifa": 140, "tiempo_minimo": 1, "multa": 150})
+    almacen.guardar_espacios({
+        str(i): {"habilitado": "S", "usuario": "", "placa": "", "inicio": "", "tiempo": 0, "fin": ""}
+        for i in range(1, cantidad + 1)
+    })
+    for i in range(cantidad):
+        almacen.agregar_usuario({"identificacion": str(i), "nombre": f"Usuario {i}",
+                                 "correo": f"u{i}@correo.com", "tarjeta": {"numero": f"4111{i:012d}"},
+                                 "vehiculos": [{"placa": f"P{i:05d}"}]})
+
+def medir(nombre: str, llamadas) -> None:
+    """Ejecuta las llamadas e imprime la latencia de la operación."""
+    duraciones = []
+    for llamada in llamadas:
+        inicio = time.perf_counter()
+        llamada()
+        duraciones.append(time.perf_counter() - inicio)
+    total = sum(duraciones)
+    print(f"{nombre}: {len(duraciones)} en {total:.2f} s, "
+          f"p50 {percentil(duraciones, 50) * 1000:.1f} ms, p99 {percentil(duraciones, 99) * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--alquileres", type=int, default=200)
+    parser.add_argument("--multas", type=int, default=20)
+    parser.add_argument("--vencidos", type=int, default=200,
+                        help="alquileres vencidos que encuentra verificar_multas")
+    parser.add_argument("--usuarios-vencidos", type=int, default=50,
+                        help="usuarios entre los que se reparten los vencidos")
+    parser.add_argument("--demora", type=float, default=0.0)
+    parser.add_argument("--almacen", choices=("json", "sqlite"), default="sqlite")
+    parser.add_argument("--directo", action="store_true")
+    parser.add_argument("--sin-reutilizar", action="store_true")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_correos_"))
+    os.makedirs("data")
+    almacen = ma.AlmacenSQLite("data/bench.db") if args.almacen == "sqlite" else ma.AlmacenJSON()
+    ma.configurar_almacen(almacen)
+    preparar_datos(almacen, args.alquileres + args.vencidos)
+
+    servidor = msl.ServidorSMTPLocal(demora=args.demora, guardar=False).iniciar()
+    transporte = TransporteMedido(*servidor.direccion, clave="clave", tls=False,
+                                  max_conexiones=0 if args.sin_reutilizar else 2)
+    mu.configurar_transporte(transporte)
+    if args.directo:
+        mu.encolar_correos = enviar_sin_bandeja
+    print(f"{'Envío directo' if args.directo else 'Bandeja de salida'}, almacén {args.almacen}, "
+          f"demora del servidor {args.demora * 1000:.1f} ms")
+
+    medir("alquilar_espacio", [
+        lambda i=i: mp.alquilar_espacio(f"u{i}@correo.com", i + 1, 30, f"P{i:05d}")
+        for i in range(args.alquileres)
+    ])
+    medir("registrar_multa", [
+        lambda i=i: mm.registrar_multa(i + 1, f"P{i:05d}", "Vehículo sin alquiler vigente")
+        for i in range(args.multas)
+    ])
+
+    # Alquileres activos que ya vencieron, repartidos entre algunos usuarios
+    hace_una_hora = datetime.now() - timedelta(hours=1)
+    for i in range(args.vencidos):
+        espacio_id = args.alquileres + i + 1
+        almacen.agregar_alquiler(mu.sellar_fechas({
+            "id": f"vencido-{i}", "espacio_id": espacio_id, "usuario": f"u{i % args.usuarios_vencidos}@correo.com",
+            "inicio": (hace_una_hora - timedelta(minutes=30)).strftime(mu.FORMATO_FECHA),
+            "fin": hace_una_hora.strftime(mu.FORMATO_FECHA),
+            "estado": "activo", "costo_total": 70.0, "placa": f"V{i:05d}",
+        }))
+    medir(f"verificar_multas ({args.vencidos} vencidos)", [mp.verificar_multas])
+
+    # Vaciar la bandeja de salida, como lo haría el despachador
+    inicio = time.perf_counter()
+    while mu.procesar_correos():
+        pass
+    vaciado = time.perf_counter() - inicio
+
+    enviados = len(transporte.duraciones)
+    envio = sum(transporte.duraciones)
+    print(f"Correos: {enviados} enviados, {servidor.recibidos} recibidos por el servidor")
+    if not args.directo:
+        print(f"Bandeja vaciada en {vaciado:.2f} s ({enviados / vaciado if vaciado else 0:.0f} correos/s)")
+    print(f"Envío: {enviados / envio if envio else 0:.0f} correos/s, "
+          f"p50 {percentil(transporte.duraciones, 50) * 1000:.2f} ms, "
+          f"p99 {percentil(transporte.duraciones, 99) * 1000:.2f} ms")
+    print(f"Conexiones SMTP: {transporte.conexiones_abiertas} abiertas por el transporte, "
+          f"{servidor.conexiones} aceptadas y {servidor.logins} logins en el servidor")
+
+    mu.configurar_transporte(None)
+    servidor.detener()
+
+if __name__ == "__main__":
+    main()
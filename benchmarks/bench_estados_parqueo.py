@@ -0,0 +1,97 @@
+# benchmarks/bench_estados_parqueo.py
+
+"""
+Benchmark de la selección de alquileres en actualizar_estados_de_parqueo.
+
+Compara el algoritmo anterior (por cada espacio, ordenar todos los
+alquileres por "fin" y recorrerlos) con la pasada única de
+modulo_utiles.alquiler_mas_reciente_por_espacio.
+
+El algoritmo anterior es O(S · A log A): con los tamaños por defecto no
+termina en un tiempo razonable, así que se mide sobre una muestra de
+espacios y se extrapola al total.
+
+Uso:
+    python benchmarks/bench_estados_parqueo.py [--espacios 10000] [--alquileres 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import modulo_utiles as mu
+
+def generar_datos(cantidad_espacios: int, cantidad_alquileres: int) -> tuple:
+    """
+    Genera espacios y un historial de alquileres con un activo por espacio.
+
+    Args:
+        cantidad_espacios (int): Cantidad de espacios.
+        cantidad_alquileres (int): Cantidad total de alquileres.
+
+    Returns:
+        tuple: (espacios, alquileres)
+    """
+    aleatorio = random.Random(42)
+    base = datetime(2024, 1, 1)
+    espacios = {str(i): {"usuario": f"u{i}@correo.com"} for i in range(1, cantidad_espacios + 1)}
+    alquileres = []
+    for i in range(cantidad_alquileres):
+        espacio_id = i % cantidad_espacios + 1
+        fin = base + timedelta(minutes=aleatorio.randrange(0, 600_000))
+        alquileres.append({
+            "id": str(i),
+            "espacio_id": espacio_id,
+            "fin": fin.strftime("%d/%m/%Y %H:%M"),
+            # Los últimos alquileres de cada espacio siguen activos
+            "estado": "activo" if i >= cantidad_alquileres - cantidad_espacios else "finalizado",
+        })
+    return espacios, alquileres
+
+def seleccion_original(espacios_ids: list, alquileres: list) -> dict:
+    """Algoritmo anterior: un ordenamiento completo por cada espacio."""
+    recientes = {}
+    for espacio_id in espacios_ids:
+        alquiler = next(
+            (a for a in sorted(alquileres, key=lambda x: x["fin"], reverse=True)
+             if a["espacio_id"] == int(espacio_id) and a["estado"] == "activo"),
+            None
+        )
+        if alquiler:
+            recientes[espacio_id] = alquiler
+    return recientes
+
+def medir(funcion, *args) -> float:
+    """Retorna los segundos que tarda una llamada."""
+    inicio = time.perf_counter()
+    funcion(*args)
+    return time.perf_counter() - inicio
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--espacios", type=int, default=10_000)
+    parser.add_argument("--alquileres", type=int, default=1_000_000)
+    parser.add_argument("--muestra", type=int, default=3,
+                        help="espacios medidos con el algoritmo anterior")
+    args = parser.parse_args()
+
+    espacios, alquileres = generar_datos(args.espacios, args.alquileres)
+    print(f"{args.espacios} espacios, {args.alquileres} alquileres")
+
+    muestra = list(espacios)[:args.muestra]
+    tiempo_muestra = medir(seleccion_original, muestra, alquileres)
+    tiempo_original = tiempo_muestra / len(muestra) * len(espacios)
+    print(f"Anterior:  {tiempo_muestra:.2f} s para {len(muestra)} espacios, "
+          f"~{tiempo_original:,.0f} s estimados para todos")
+
+    tiempo_nuevo = medir(mu.alquiler_mas_reciente_por_espacio, alquileres)
+    print(f"Una pasada: {tiempo_nuevo:.2f} s para todos los espacios")
+    print(f"Mejora estimada: ~{tiempo_original / tiempo_nuevo:,.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_marcas_de_tiempo.py
+
+"""
+Benchmark de las fechas en texto contra las marcas de tiempo.
+
+Mide sobre un historial de alquileres las dos operaciones que repiten los
+reportes y las revisiones periódicas:
+- Filtrar por un rango de días y ordenar por inicio (historial_usos)
+- Encontrar los alquileres activos vencidos (verificar_multas)
+
+"Texto" es el algoritmo anterior: datetime.strptime sobre cada registro.
+"Marcas" usa los campos "<campo>_ts" con modulo_utiles.marca, de modo que
+las comparaciones son entre enteros.
+
+Uso:
+    python benchmarks/bench_marcas_de_tiempo.py [--alquileres 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import modulo_utiles as mu
+
+def generar_alquileres(cantidad: int) -> list:
+    """
+    Genera un historial de alquileres con fechas en texto y marcas.
+
+    Args:
+        cantidad (int): Cantidad de alquileres.
+
+    Returns:
+        list: Alquileres con inicio, fin, inicio_ts y fin_ts.
+    """
+    aleatorio = random.Random(42)
+    base = datetime(2024, 1, 1)
+    alquileres = []
+    for i in range(cantidad):
+        inicio = base + timedelta(minutes=aleatorio.randrange(0, 525_600))
+        fin = inicio + timedelta(minutes=aleatorio.choice((30, 60, 120)))
+        alquileres.append(mu.sellar_fechas({
+            "id": str(i),
+            "inicio": inicio.strftime(mu.FORMATO_FECHA),
+            "fin": fin.strftime(mu.FORMATO_FECHA),
+            "estado": "activo" if i % 100 == 0 else "finalizado",
+        }))
+    return alquileres
+
+def historial_texto(alquileres: list, desde: str, hasta: str) -> list:
+    """Filtro y orden anteriores: strptime por registro."""
+    desde_dt = datetime.strptime(desde, "%d/%m/%Y")
+    hasta_dt = datetime.strptime(hasta, "%d/%m/%Y")
+    usados = [(datetime.strptime(a["inicio"], "%d/%m/%Y %H:%M"), a) for a in alquileres]
+    usados = [(inicio, a) for inicio, a in usados if desde_dt.date() <= inicio.date() <= hasta_dt.date()]
+    usados.sort(key=lambda x: x[0], reverse=True)
+    return [a for _, a in usados]
+
+def historial_marcas(alquileres: list, desde: str, hasta: str) -> list:
+    """Filtro y orden con marcas de tiempo."""
+    inicio_rango, fin_rango = mu.rango_de_marcas(desde, hasta)
+    usados = [(inicio, a) for a in alquileres
+              if (inicio := mu.marca(a, "inicio")) is not None and inicio_rango <= inicio < fin_rango]
+    usados.sort(key=lambda x: x[0], reverse=True)
+    return [a for _, a in usados]
+
+def vencidos_texto(alquileres: list, ahora: datetime) -> list:
+    """Revisión anterior de vencidos: strptime por alquiler activo."""
+    return [a for a in alquileres
+            if a["estado"] == "activo" and datetime.strptime(a["fin"], "%d/%m/%Y %H:%M") < ahora]
+
+def vencidos_marcas(alquileres: list, ahora: datetime) -> list:
+    """Revisión de vencidos con marcas de tiempo."""
+    ahora_ts = ahora.timestamp()
+    return [a for a in alquileres if a["estado"] == "activo" and mu.marca(a, "fin") < ahora_ts]
+
+def medir(funcion, *args) -> tuple:
+    """Retorna (segundos, resultado) de una llamada."""
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--alquileres", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    alquileres = generar_alquileres(args.alquileres)
+    print(f"{args.alquileres} alquileres")
+
+    pruebas = [
+        ("Historial (1 mes)", historial_texto, historial_marcas, ("01/06/2024", "30/06/2024")),
+        ("Vencidos", vencidos_texto, vencidos_marcas, (datetime(2024, 7, 1),)),
+    ]
+    for nombre, texto, marcas, parametros in pruebas:
+        tiempo_texto, resultado_texto = medir(texto, alquileres, *parametros)
+        tiempo_marcas, resultado_marcas = medir(marcas, alquileres, *parametros)
+        assert [a["id"] for a in resultado_texto] == [a["id"] for a in resultado_marcas]
+        print(f"{nombre}: texto {tiempo_texto:.2f} s, marcas {tiempo_marcas:.2f} s "
+              f"({tiempo_texto / tiempo_marcas:.1f}x, {len(resultado_marcas)} registros)")
+
+if __name__ == "__main__":
+    main()
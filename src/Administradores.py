@@ -15,6 +15,7 @@ de navegación para permitir el retorno a frames anteriores.
 import tkinter as tk
 from tkinter import messagebox
 from frames.administradores.menu_frame import MenuAdminFrame
+import modulo_utiles as mu
 
 class AppAdmin:
     def __init__(self):
@@ -86,5 +87,6 @@ class AppAdmin:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    mu.iniciar_despachador()
     app = AppAdmin()
     app.run()
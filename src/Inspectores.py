@@ -13,6 +13,7 @@ de navegación basado en frames.
 
 import tkinter as tk
 from frames.inspectores.menu_frame import MenuInspectorFrame
+import modulo_utiles as mu
 
 class AppInspectores(tk.Tk):
     """
@@ -67,5 +68,6 @@ class AppInspectores(tk.Tk):
         self.cambiar_frame(MenuInspectorFrame)
 
 if __name__ == "__main__":
+    mu.iniciar_despachador()
     app = AppInspectores()
     app.mainloop()
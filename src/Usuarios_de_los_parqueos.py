@@ -7,11 +7,15 @@ Este módulo implementa la interfaz gráfica para los usuarios regulares, permit
 - Gestionar sus parqueos y vehículos
 
 La aplicación utiliza Tkinter para la interfaz gráfica y comienza
-mostrando la pantalla de inicio de sesión.
+mostrando la pantalla de inicio de sesión. Con el almacén JSON, mientras
+está abierta un hilo en segundo plano compacta la bitácora de alquileres.
 """
 
 import tkinter as tk
 from frames.login_frame import LoginFrame
+import modulo_almacen as ma
+import modulo_bitacora as mb
+import modulo_utiles as mu
 
 class App(tk.Tk):
     """
@@ -62,5 +66,9 @@ class App(tk.Tk):
         self.current_frame.pack(fill="both", expand=True)
 
 if __name__ == "__main__":
+    almacen = ma.obtener_almacen()
+    if isinstance(almacen, ma.AlmacenJSON):
+        mb.iniciar_compactador([almacen.alquileres_path])
+    mu.iniciar_despachador()
     app = App()
     app.mainloop()
@@ -7,11 +7,9 @@ gestionar los espacios de parqueo del sistema.
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import modulo_utiles as mu
+import modulo_almacen as ma
 from frames.base_frame import BaseFrame
 
-ESPACIOS_PATH = "data/pc_espacios.json"
-
 class EspaciosFrame(BaseFrame):
     """
     Frame para la gestión de espacios de parqueo.
@@ -42,12 +40,12 @@ class EspaciosFrame(BaseFrame):
 
     def cargar_espacios(self):
         """
-        Carga los espacios de parqueo desde el archivo JSON.
+        Carga los espacios de parqueo desde el almacén.
         
         Returns:
             dict: Diccionario de espacios de parqueo
         """
-        espacios = mu.leer_json(ESPACIOS_PATH)
+        espacios = ma.obtener_almacen().leer_espacios()
         if not isinstance(espacios, dict):
             messagebox.showwarning("Advertencia", "No se pudieron cargar los espacios. Se iniciará con un diccionario vacío.")
             return {}
@@ -174,11 +172,11 @@ class EspaciosFrame(BaseFrame):
         Guarda los cambios realizados en los espacios de parqueo.
         
         Este método:
-        1. Escribe los espacios actualizados en el archivo JSON
+        1. Escribe los espacios actualizados en el almacén
         2. Muestra un mensaje de éxito o error
         """
         try:
-            mu.escribir_json(ESPACIOS_PATH, self.espacios)
+            ma.obtener_almacen().guardar_espacios(self.espacios)
             messagebox.showinfo("Guardado", "Cambios guardados correctamente.")
         except Exception as e:
             messagebox.showerror("Error", f"Error al guardar los cambios: {str(e)}")
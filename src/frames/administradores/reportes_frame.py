@@ -4,23 +4,22 @@ Módulo para la generación y visualización de reportes administrativos.
 Este módulo implementa la interfaz que permite a los administradores:
 - Generar reportes de ingresos
 - Ver estadísticas de uso
-- Exportar reportes en diferentes formatos
+- Exportar reportes a CSV o NDJSON, opcionalmente comprimidos
 - Filtrar reportes por fecha y tipo
 
 La interfaz utiliza Tkinter y hereda de BaseFrame para mantener
 la consistencia con el resto de la aplicación.
 """
 
+import itertools
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 from datetime import datetime
+import modulo_almacen as ma
+import modulo_reportes as mr
 import modulo_utiles as mu
 from frames.base_frame import BaseFrame
 
-ALQUILERES_PATH = "data/pc_alquileres.json"
-MULTAS_PATH = "data/pc_multas.json"
-ESPACIOS_PATH = "data/pc_espacios.json"
-
 class ReportesAdminFrame(BaseFrame):
     """
     Frame para la gestión de reportes administrativos.
@@ -33,6 +32,9 @@ class ReportesAdminFrame(BaseFrame):
         fecha_fin_var (StringVar): Variable para la fecha de fin
         tipo_reporte_var (StringVar): Variable para el tipo de reporte
     """
+
+    # Filas que se insertan en la tabla antes de devolver el control a Tk
+    FILAS_POR_LOTE = 200
     
     def __init__(self, master, app):
         """
@@ -48,6 +50,8 @@ class ReportesAdminFrame(BaseFrame):
         self.fecha_inicio_var = tk.StringVar()
         self.fecha_fin_var = tk.StringVar()
         self.tipo_reporte_var = tk.StringVar()
+        self._filas_pendientes = None
+        self.progreso_var = tk.StringVar()
         self.crear_widgets()
 
     def crear_widgets(self):
@@ -106,6 +110,7 @@ class ReportesAdminFrame(BaseFrame):
         # Botones
         tk.Button(filtros_frame, text="Generar", command=self.generar_reporte).grid(row=1, column=2, padx=5)
         tk.Button(filtros_frame, text="Exportar", command=self.exportar_reporte).grid(row=1, column=3, padx=5)
+        tk.Label(filtros_frame, textvariable=self.progreso_var).grid(row=2, column=0, columnspan=4)
 
         # Tabla de resultados
         self.tabla = ttk.Treeview(self)
@@ -119,7 +124,7 @@ class ReportesAdminFrame(BaseFrame):
         Este método:
         1. Solicita las fechas de inicio y fin
         2. Valida las fechas ingresadas
-        3. Obtiene los alquileres del sistema
+        3. Lee los ingresos acumulados por día del rango
         4. Calcula los ingresos por día y total
         5. Muestra los resultados en la interfaz
         """
@@ -130,22 +135,15 @@ class ReportesAdminFrame(BaseFrame):
             return messagebox.showerror("Error", "Complete todos los campos.")
 
         try:
-            desde_dt = datetime.strptime(fecha_inicio, "%d/%m/%Y")
-            hasta_dt = datetime.strptime(fecha_fin, "%d/%m/%Y")
+            desde = datetime.strptime(fecha_inicio, "%d/%m/%Y").date().isoformat()
+            hasta = datetime.strptime(fecha_fin, "%d/%m/%Y").date().isoformat()
         except ValueError:
             return messagebox.showerror("Error", "Formato incorrecto. Use dd/mm/yyyy")
 
-        alquileres = mu.leer_json(ALQUILERES_PATH)
-        ingresos_por_dia = {}
-        total = 0
-
-        for a in alquileres:
-            fecha_inicio = datetime.strptime(a["inicio"], "%d/%m/%Y %H:%M")
-            fecha = fecha_inicio.date()
-            if desde_dt.date() <= fecha <= hasta_dt.date():
-                ingresos_por_dia.setdefault(str(fecha), 0)
-                ingresos_por_dia[str(fecha)] += a.get("costo_total", 0)
-                total += a.get("costo_total", 0)
+        # Solo se leen los días del rango, no el historial de alquileres
+        ingresos = ma.obtener_almacen().leer_ingresos(desde, hasta)
+        ingresos_por_dia = {dia: sum(por_espacio.values()) for dia, por_espacio in ingresos.items()}
+        total = sum(ingresos_por_dia.values())
 
         contenido = "💵 Ingresos por estacionamiento:\n\n"
         for dia in sorted(ingresos_por_dia):
@@ -164,7 +162,7 @@ class ReportesAdminFrame(BaseFrame):
         3. Filtra la lista según el tipo seleccionado
         4. Muestra los resultados en la interfaz
         """
-        espacios = mu.leer_json(ESPACIOS_PATH)
+        espacios = ma.obtener_almacen().leer_espacios()
         if not isinstance(espacios, dict):
             return messagebox.showerror("Error", "Error leyendo espacios.")
 
@@ -178,18 +176,15 @@ class ReportesAdminFrame(BaseFrame):
         if eleccion not in opciones:
             return
 
-        ahora = datetime.now()
+        ahora = datetime.now().timestamp()
         resultado = []
 
         for id_esp, datos in sorted(espacios.items()):
-            try:
-                fin_dt = datetime.strptime(datos["fin"], "%d/%m/%Y %H:%M") if datos["fin"] else None
-            except:
-                fin_dt = None
+            fin = mu.marca(datos, "fin")
 
-            if eleccion == "b" and (not fin_dt or fin_dt < ahora):
+            if eleccion == "b" and (fin is None or fin < ahora):
                 continue
-            if eleccion == "c" and fin_dt and fin_dt >= ahora:
+            if eleccion == "c" and fin is not None and fin >= ahora:
                 continue
 
             linea = f"{id_esp} - Habilitado: {datos['habilitado']}"
@@ -209,9 +204,8 @@ class ReportesAdminFrame(BaseFrame):
         Este método:
         1. Solicita las fechas de inicio y fin
         2. Valida las fechas ingresadas
-        3. Obtiene los alquileres del sistema
-        4. Filtra los alquileres según las fechas
-        5. Muestra los resultados en la interfaz
+        3. Obtiene del almacén los alquileres del rango, ya ordenados
+        4. Muestra los resultados en la interfaz
         """
         fecha_inicio = self.fecha_inicio_var.get()
         fecha_fin = self.fecha_fin_var.get()
@@ -220,18 +214,12 @@ class ReportesAdminFrame(BaseFrame):
             return messagebox.showerror("Error", "Complete todos los campos.")
 
         try:
-            desde_dt = datetime.strptime(fecha_inicio, "%d/%m/%Y")
-            hasta_dt = datetime.strptime(fecha_fin, "%d/%m/%Y")
+            desde, hasta = mu.rango_de_marcas(fecha_inicio, fecha_fin)
         except ValueError:
             return messagebox.showerror("Error", "Formato incorrecto.")
 
-        alquileres = mu.leer_json(ALQUILERES_PATH)
-        usados = [
-            a for a in alquileres
-            if desde_dt.date() <= datetime.strptime(a["inicio"], "%d/%m/%Y %H:%M").date() <= hasta_dt.date()
-        ]
-
-        usados.sort(key=lambda x: x["inicio"], reverse=True)
+        # El índice por inicio entrega el rango ordenado, más recientes primero
+        usados = ma.obtener_almacen().alquileres_por_inicio(desde, hasta)
         contenido = "📆 Historial de espacios usados:\n\n"
         for a in usados:
             contenido += (
@@ -248,9 +236,8 @@ class ReportesAdminFrame(BaseFrame):
         Este método:
         1. Solicita las fechas de inicio y fin
         2. Valida las fechas ingresadas
-        3. Obtiene las multas del sistema
-        4. Filtra las multas según las fechas
-        5. Muestra los resultados en la interfaz
+        3. Obtiene del almacén las multas del rango, ya ordenadas
+        4. Muestra los resultados en la interfaz
         """
         fecha_inicio = self.fecha_inicio_var.get()
         fecha_fin = self.fecha_fin_var.get()
@@ -259,18 +246,11 @@ class ReportesAdminFrame(BaseFrame):
             return messagebox.showerror("Error", "Complete todos los campos.")
 
         try:
-            desde_dt = datetime.strptime(fecha_inicio, "%d/%m/%Y")
-            hasta_dt = datetime.strptime(fecha_fin, "%d/%m/%Y")
+            desde, hasta = mu.rango_de_marcas(fecha_inicio, fecha_fin)
         except ValueError:
             return messagebox.showerror("Error", "Formato incorrecto.")
 
-        multas = mu.leer_json(MULTAS_PATH)
-        filtro = [
-            m for m in multas
-            if desde_dt.date() <= datetime.strptime(m["fecha"], "%d/%m/%Y %H:%M").date() <= hasta_dt.date()
-        ]
-
-        filtro.sort(key=lambda x: x["fecha"], reverse=True)
+        filtro = ma.obtener_almacen().multas_por_fecha(desde, hasta)
         contenido = "⚠️ Historial de multas:\n\n"
         total = 0
         for m in filtro:
@@ -310,48 +290,98 @@ class ReportesAdminFrame(BaseFrame):
         Muestra los resultados del reporte en la tabla.
         
         Args:
-            datos (list): Lista de datos del reporte generado
+            datos (iterable): Filas del reporte generado
             
         Este método:
         1. Limpia la tabla actual
         2. Configura las columnas según el tipo de reporte
-        3. Inserta los datos en la tabla
+        3. Inserta los datos en la tabla por lotes, sin bloquear la interfaz
         """
         self.tabla.delete(*self.tabla.get_children())
+        filas = iter(datos)
+        primera = next(filas, None)
         
-        if not datos:
+        if primera is None:
+            self._filas_pendientes = None
             return
 
         # Configurar columnas según el tipo de reporte
-        self.tabla["columns"] = list(datos[0].keys())
+        self.tabla["columns"] = list(primera.keys())
         self.tabla["show"] = "headings"
 
         for col in self.tabla["columns"]:
             self.tabla.heading(col, text=col)
             self.tabla.column(col, width=100)
 
-        # Insertar datos
-        for fila in datos:
-            self.tabla.insert("", tk.END, values=list(fila.values()))
+        # Insertar datos; un reporte nuevo reemplaza al que se estaba cargando
+        self.tabla.insert("", tk.END, values=list(primera.values()))
+        self._filas_pendientes = filas
+        self._insertar_lote(filas)
+
+    def _insertar_lote(self, filas):
+        """Inserta el siguiente lote de filas y programa el siguiente."""
+        if filas is not self._filas_pendientes:
+            return
+        try:
+            insertadas = 0
+            for fila in itertools.islice(filas, self.FILAS_POR_LOTE):
+                self.tabla.insert("", tk.END, values=list(fila.values()))
+                insertadas += 1
+        except Exception as e:
+            self._filas_pendientes = None
+            return messagebox.showerror("Error", f"No se pudo generar el reporte: {e}")
+
+        if insertadas == self.FILAS_POR_LOTE:
+            self.after(1, self._insertar_lote, filas)
+        else:
+            self._filas_pendientes = None
 
     def exportar_reporte(self):
         """
-        Exporta el reporte actual a un archivo.
+        Exporta el reporte seleccionado a un archivo.
         
         Este método:
-        1. Verifica que haya datos para exportar
-        2. Solicita la ubicación del archivo
-        3. Exporta los datos en el formato seleccionado
+        1. Valida las fechas y el tipo de reporte
+        2. Solicita la ubicación del archivo; la extensión define el formato
+        3. Exporta los datos por bloques directamente desde el almacén,
+           mostrando el progreso sin bloquear la interfaz
         4. Muestra mensajes de éxito o error
         """
-        if not self.tabla.get_children():
-            return messagebox.showerror("Error", "No hay datos para exportar.")
+        fecha_inicio = self.fecha_inicio_var.get()
+        fecha_fin = self.fecha_fin_var.get()
+        tipo = self.tipo_reporte_var.get()
+
+        if not all([fecha_inicio, fecha_fin, tipo]):
+            return messagebox.showerror("Error", "Complete todos los campos.")
+
+        ruta = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("NDJSON", "*.ndjson"),
+                       ("CSV comprimido", "*.csv.gz"), ("NDJSON comprimido", "*.ndjson.gz")]
+        )
+        if not ruta:
+            return
 
         try:
-            mr.exportar_reporte(self.tabla)
-            messagebox.showinfo("Éxito", "Reporte exportado correctamente.")
+            bloques = mr.exportar_por_bloques(mr.generar_reporte(tipo, fecha_inicio, fecha_fin), ruta)
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo exportar el reporte: {e}")
+            return messagebox.showerror("Error", f"No se pudo exportar el reporte: {e}")
+        self._exportar_bloque(bloques, ruta)
+
+    def _exportar_bloque(self, bloques, ruta):
+        """Escribe el siguiente bloque de la exportación y programa el siguiente."""
+        try:
+            escritas = next(bloques, None)
+        except Exception as e:
+            self.progreso_var.set("")
+            return messagebox.showerror("Error", f"No se pudo exportar el reporte: {e}")
+
+        if escritas is None:
+            self.progreso_var.set("")
+            return messagebox.showinfo("Éxito", f"Reporte exportado correctamente en {ruta}.")
+
+        self.progreso_var.set(f"Exportando... {escritas} filas")
+        self.after(1, self._exportar_bloque, bloques, ruta)
 
     def actualizar_texto(self, texto):
         self.reporte_actual = texto
@@ -9,6 +9,9 @@ from frames.base_frame import BaseFrame
 import modulo_parqueo as mp
 import modulo_usuarios as mu
 
+# Cantidad de espacios libres que se muestran como sugerencia
+ESPACIOS_SUGERIDOS = 5
+
 class AlquilarFrame(BaseFrame):
     """
     Frame para la interfaz de alquiler de espacios de parqueo.
@@ -46,6 +49,7 @@ class AlquilarFrame(BaseFrame):
         Crea y configura todos los widgets de la interfaz.
         
         Este método configura:
+        - Cantidad de espacios libres y algunos sugeridos
         - Etiquetas y campos de entrada para el ID del espacio
         - Menú desplegable para seleccionar el vehículo
         - Campo para ingresar la duración del alquiler
@@ -53,6 +57,12 @@ class AlquilarFrame(BaseFrame):
         """
         tk.Label(self, text="🅿️ Alquilar espacio", font=("Arial", 16)).pack(pady=10)
 
+        # Espacios libres como referencia para elegir
+        libres = mp.contar_espacios_disponibles()
+        sugeridos = ", ".join(str(i) for i in mp.obtener_espacios_disponibles(ESPACIOS_SUGERIDOS))
+        texto_libres = f"Espacios libres: {libres}" + (f" (por ejemplo: {sugeridos})" if sugeridos else "")
+        tk.Label(self, text=texto_libres).pack()
+
         # Entrada manual de ID
         tk.Label(self, text="ID del espacio de parqueo:").pack()
         tk.Entry(self, textvariable=self.espacio_var).pack()
@@ -2,12 +2,10 @@
 
 import tkinter as tk
 from tkinter import messagebox
+import modulo_almacen as ma
 import modulo_utiles as mu
 from datetime import datetime
 
-ESPACIOS_PATH = "data/pc_espacios.json"
-MULTAS_PATH = "data/pc_multas.json"
-
 class ReportesInspectorFrame(tk.Frame):
     def __init__(self, master):
         super().__init__(master)
@@ -24,22 +22,18 @@ class ReportesInspectorFrame(tk.Frame):
 
     def reporte_espacios(self):
         self.resultado.delete("1.0", tk.END)
-        espacios = mu.leer_json(ESPACIOS_PATH)
+        espacios = ma.obtener_almacen().leer_espacios()
 
         if not isinstance(espacios, dict):
             self.resultado.insert(tk.END, "Error: No se pudieron leer los datos de los espacios.")
             return
 
-        ahora = datetime.now()
+        ahora = datetime.now().timestamp()
         reporte = "📄 Lista de espacios de parqueo:\n\n"
 
         for id_esp, datos in sorted(espacios.items()):
-            ocupado = False
-            try:
-                fin_dt = datetime.strptime(datos.get("fin", ""), "%d/%m/%Y %H:%M")
-                ocupado = fin_dt >= ahora
-            except:
-                ocupado = False
+            fin = mu.marca(datos, "fin")
+            ocupado = fin is not None and fin >= ahora
 
             estado = "🟥 Ocupado" if ocupado else "🟩 Libre"
             reporte += f"{id_esp} - {estado} - Habilitado: {datos.get('habilitado', 'N/A')}\n"
@@ -48,7 +42,7 @@ class ReportesInspectorFrame(tk.Frame):
 
     def reporte_multas(self):
         self.resultado.delete("1.0", tk.END)
-        multas = mu.leer_json(MULTAS_PATH)
+        multas = ma.obtener_almacen().leer_multas()
 
         if not isinstance(multas, list):
             self.resultado.insert(tk.END, "Error: No se pudieron leer los datos de las multas.")
@@ -57,7 +51,7 @@ class ReportesInspectorFrame(tk.Frame):
         reporte = "⚠️ Historial de multas:\n\n"
         total = 0
 
-        for m in sorted(multas, key=lambda x: x.get("fecha", ""), reverse=True):
+        for m in sorted(multas, key=lambda x: mu.marca(x, "fecha") or 0, reverse=True):
             reporte += (
                 f"Fecha: {m.get('fecha', '')}\n"
                 f"Espacio: {m.get('espacio', '')}\n"
@@ -3,10 +3,9 @@
 import tkinter as tk
 from tkinter import messagebox
 from datetime import datetime
-import modulo_utiles as mu
+import modulo_almacen as ma
 import modulo_multas as mm
-
-ESPACIOS_PATH = "data/pc_espacios.json"
+import modulo_utiles as mu
 
 class RevisionParqueoFrame(tk.Frame):
     def __init__(self, master):
@@ -38,12 +37,11 @@ class RevisionParqueoFrame(tk.Frame):
         if not espacio or not placa_observada:
             return messagebox.showwarning("Datos faltantes", "Debe ingresar el espacio y la placa.")
 
-        espacios = mu.leer_json(ESPACIOS_PATH)
+        espacio_info = ma.obtener_almacen().buscar_espacio(espacio)
 
-        if not isinstance(espacios, dict) or espacio not in espacios:
+        if espacio_info is None:
             return messagebox.showerror("Error", "Espacio no encontrado en el sistema.")
 
-        espacio_info = espacios[espacio]
         fin = espacio_info.get("fin")
         placa_registrada = espacio_info.get("placa", "")
 
@@ -51,14 +49,13 @@ class RevisionParqueoFrame(tk.Frame):
             detalle = "No hay alquiler registrado en este espacio."
             return self.registrar_multa(espacio, placa_observada, detalle)
 
-        try:
-            dt_fin = datetime.strptime(fin, "%d/%m/%Y %H:%M")
-        except ValueError:
+        fin_ts = mu.marca(espacio_info, "fin")
+        if fin_ts is None:
             detalle = "Formato inválido en la fecha de finalización del alquiler."
             return self.registrar_multa(espacio, placa_observada, detalle)
 
-        if ahora > dt_fin:
-            detalle = f"Tiempo vencido | Finalizó: {fin} | Observado: {ahora.strftime('%d/%m/%Y %H:%M')}"
+        if ahora.timestamp() > fin_ts:
+            detalle = f"Tiempo vencido | Finalizó: {fin} | Observado: {ahora.strftime(mu.FORMATO_FECHA)}"
             return self.registrar_multa(espacio, placa_observada, detalle)
 
         if placa_observada != placa_registrada.upper():
@@ -75,7 +72,7 @@ class RevisionParqueoFrame(tk.Frame):
             f"Espacio: {espacio_id}\n"
             f"Placa: {placa}\n"
             f"Detalle: {detalle}\n"
-            f"Correo enviado: {'Sí' if enviado else 'No'}"
+            f"Correo al propietario: {'En cola de envío' if enviado else 'No'}"
         )
         self.resultado.insert("1.0", mensaje + "\n")
         messagebox.showwarning("Multa registrada", f"Se ha generado una multa.\n{detalle}")
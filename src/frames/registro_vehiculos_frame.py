@@ -110,7 +110,8 @@ class RegistroVehiculosFrame(BaseFrame):
         
         Este método:
         1. Valida los datos ingresados
-        2. Verifica que la placa no esté duplicada
+        2. Verifica que la placa no esté duplicada, ni en sus vehículos ni
+           en los de otro usuario
         3. Agrega el vehículo a la lista del usuario
         4. Actualiza la interfaz
         5. Muestra mensajes de éxito o error
@@ -128,6 +129,8 @@ class RegistroVehiculosFrame(BaseFrame):
         # Verificar placa duplicada
         if any(v["placa"] == placa for v in self.usuario.get("vehiculos", [])):
             return messagebox.showerror("Error", "Esta placa ya está registrada.")
+        if mu.placa_registrada(placa, self.usuario["identificacion"]):
+            return messagebox.showerror("Error", "Esta placa ya está registrada por otro usuario.")
 
         # Crear vehículo
         vehiculo = {
@@ -148,6 +151,7 @@ class RegistroVehiculosFrame(BaseFrame):
             self.limpiar_campos()
             self.crear_widgets()  # Actualizar lista
         else:
+            self.usuario["vehiculos"].remove(vehiculo)
             messagebox.showerror("Error", "No se pudo registrar el vehículo.")
 
     def eliminar_vehiculo(self, vehiculo):
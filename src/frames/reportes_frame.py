@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import messagebox
 from frames.base_frame import BaseFrame
-import modulo_utiles as mu
+import modulo_almacen as ma
 from modulo_reportes import generar_pdf, enviar_reporte_pdf
 
 class ReportesFrame(BaseFrame):
@@ -29,7 +29,7 @@ class ReportesFrame(BaseFrame):
         self.crear_boton_volver()
 
     def mostrar_disponibles(self):
-        espacios = mu.leer_json("data/pc_espacios.json")
+        espacios = ma.obtener_almacen().leer_espacios()
         libres = [f"{int(id_espacio)}: {datos.get('ubicacion', 'Sin ubicación')}" 
                  for id_espacio, datos in espacios.items() 
                  if datos["habilitado"] == "S" and datos["usuario"] == ""]
@@ -38,8 +38,7 @@ class ReportesFrame(BaseFrame):
         self.actualizar_reporte(contenido)
 
     def mostrar_historial_alquileres(self):
-        alquileres = mu.leer_json("data/pc_alquileres.json")
-        propios = [a for a in alquileres if a["usuario"] == self.usuario["correo"]]
+        propios = ma.obtener_almacen().alquileres_de_usuario(self.usuario["correo"])
 
         if not propios:
             return self.actualizar_reporte("No hay alquileres registrados.")
@@ -57,7 +56,7 @@ class ReportesFrame(BaseFrame):
         self.actualizar_reporte(contenido)
 
     def mostrar_historial_multas(self):
-        multas = mu.leer_json("data/pc_multas.json")
+        multas = ma.obtener_almacen().leer_multas()
         propios = [m for m in multas if m["correo"] == self.usuario["correo"]]
 
         if not propios:
@@ -148,20 +148,26 @@ class PerfilUsuarioFrame(BaseFrame):
         
         Este método:
         1. Solicita la placa del nuevo vehículo
-        2. Verifica que la placa no esté duplicada
+        2. Verifica que la placa no esté duplicada, ni en sus vehículos ni
+           en los de otro usuario
         3. Agrega el vehículo a la lista del usuario
         4. Actualiza la información en la base de datos
         """
         nueva = simpledialog.askstring("Agregar vehículo", "Placa del nuevo vehículo:")
-        if not nueva:
+        if not nueva or not nueva.strip():
             return
+        nueva = nueva.strip().upper()
         if any(v["placa"] == nueva for v in self.usuario.get("vehiculos", [])):
             return messagebox.showerror("Error", "Esa placa ya está registrada.")
+        if mu.placa_registrada(nueva, self.usuario["identificacion"]):
+            return messagebox.showerror("Error", "Esa placa ya está registrada por otro usuario.")
 
         nuevo_vehiculo = {"placa": nueva, "marca": "", "modelo": ""}
         self.usuario.setdefault("vehiculos", []).append(nuevo_vehiculo)
 
-        mu.actualizar_usuario(self.usuario["identificacion"], self.usuario)
+        if not mu.actualizar_usuario(self.usuario["identificacion"], self.usuario):
+            self.usuario["vehiculos"].remove(nuevo_vehiculo)
+            return messagebox.showerror("Error", "No se pudo agregar el vehículo.")
         messagebox.showinfo("Éxito", "Vehículo agregado.")
         self.master.cambiar_frame(PerfilUsuarioFrame, self.usuario)
 
@@ -0,0 +1,1698 @@
+# src/modulo_almacen.py
+
+"""
+Módulo de almacenamiento del sistema de parqueos.
+
+Este módulo define dónde se guardan los espacios, alquileres, multas y
+usuarios. Los demás módulos no leen los archivos directamente sino que
+piden el almacén configurado con obtener_almacen():
+- AlmacenJSON: archivos data/*.json (opción por defecto)
+- AlmacenSQLite: base de datos SQLite con índices por usuario, estado,
+  espacio, fin y placa, pensada para despliegues grandes
+
+El almacén se elige con la variable de entorno PARQUEOS_ALMACEN
+("json" o "sqlite") y la ruta de la base con PARQUEOS_SQLITE.
+
+Las operaciones que tocan varias colecciones (por ejemplo alquilar un
+espacio) se hacen dentro de almacen.transaccion(): los cambios se
+preparan en memoria y se confirman todos juntos o ninguno.
+
+Para importar los datos existentes a SQLite:
+    python src/modulo_almacen.py [ruta_base.db]
+
+Para recalcular los ingresos diarios desde el historial de alquileres:
+    python src/modulo_almacen.py --ingresos
+
+Para agregar las marcas de tiempo ("inicio_ts", "fin_ts", "fecha_ts") a
+los datos guardados antes de que existieran:
+    python src/modulo_almacen.py --marcas
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+import modulo_utiles as mu
+import modulo_bitacora as mb
+import modulo_indices as mi
+
+# Rutas de los archivos de datos
+ESPACIOS_PATH = "data/pc_espacios.json"
+ALQUILERES_PATH = "data/pc_alquileres.json"
+MULTAS_PATH = "data/pc_multas.json"
+USUARIOS_PATH = "data/pc_usuarios.json"
+TRANSACCIONES_PATH = "data/pc_transacciones.jsonl"
+INGRESOS_PATH = "data/pc_ingresos.json"
+# Solo se usa su archivo de bloqueo, que guarda la versión de los datos
+VERSION_DATOS_PATH = "data/pc_datos"
+
+# Selección del almacén
+ALMACEN = os.environ.get("PARQUEOS_ALMACEN", "json")
+SQLITE_PATH = os.environ.get("PARQUEOS_SQLITE", "data/parqueos.db")
+
+_almacen = None
+_lock_almacen = threading.Lock()
+
+class ValorDuplicado(ValueError):
+    """
+    Un valor que debe ser único ya pertenece a otro registro.
+
+    Attributes:
+        campo (str): Campo con el valor repetido (por ejemplo "placa")
+        valor (str): Valor repetido
+    """
+
+    def __init__(self, campo: str, valor: str):
+        super().__init__(f"{campo} ya registrada: {valor}")
+        self.campo = campo
+        self.valor = valor
+
+def _firma(path: str) -> list | None:
+    """
+    Retorna [mtime_ns, tamaño, inodo] de un archivo, o None si no existe.
+
+    Args:
+        path (str): Ruta del archivo.
+    """
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [info.st_mtime_ns, info.st_size, info.st_ino]
+
+def _sumar_ingresos(dias: dict, ingresos) -> None:
+    """
+    Suma montos a un acumulado de ingresos diarios.
+
+    Args:
+        dias (dict): "YYYY-MM-DD" -> {id del espacio: monto}; se modifica.
+        ingresos: Iterable de (dia, espacio_id, monto).
+    """
+    for dia, espacio_id, monto in ingresos:
+        por_espacio = dias.setdefault(dia, {})
+        por_espacio[str(espacio_id)] = round(por_espacio.get(str(espacio_id), 0) + monto, 2)
+
+def calcular_ingresos(alquileres) -> dict:
+    """
+    Calcula los ingresos diarios de un historial de alquileres.
+
+    Args:
+        alquileres: Iterable de alquileres; se recorre una sola vez.
+
+    Returns:
+        dict: "YYYY-MM-DD" -> {id del espacio: monto}.
+
+    Notas:
+        - El costo total de cada alquiler (con sus extensiones) se cuenta
+          en el día en que inició, igual que el reporte de ingresos
+    """
+    dias = {}
+    _sumar_ingresos(dias, (
+        (mu.dia_de_marca(inicio), alquiler["espacio_id"], alquiler.get("costo_total", 0))
+        for alquiler in alquileres if (inicio := mu.marca(alquiler, "inicio")) is not None
+    ))
+    return dias
+
+def _fecha_ordenable(fecha: str) -> str:
+    """
+    Convierte "DD/MM/YYYY HH:MM" a "YYYY-MM-DD HH:MM" para poder ordenar.
+
+    Args:
+        fecha (str): Fecha en el formato del sistema, o cadena vacía.
+
+    Returns:
+        str: Fecha ordenable lexicográficamente, o cadena vacía.
+    """
+    if not fecha or len(fecha) < 16:
+        return ""
+    return f"{fecha[6:10]}-{fecha[3:5]}-{fecha[0:2]} {fecha[11:16]}"
+
+# ----------------------------
+# Almacén en archivos JSON
+# ----------------------------
+# Índices sobre los usuarios: nombre -> clase de modulo_indices
+_INDICES_USUARIOS = {"usuarios": mi.IndiceUsuarios, "placas": mi.IndicePlacas}
+
+class AlmacenJSON:
+    """
+    Almacén basado en los archivos JSON de la carpeta data/.
+
+    Los alquileres usan la bitácora de modulo_bitacora; el resto de las
+    colecciones se leen y escriben completas con modulo_utiles. Sobre los
+    alquileres se mantienen índices en memoria (ver modulo_indices): por
+    id, por hora de inicio, por hora de fin y activos por usuario,
+    guardados junto al snapshot al compactar. Las multas tienen un índice
+    por fecha sobre su posición en el archivo. Sobre los usuarios se mantienen índices únicos
+    por identificación, correo, tarjeta y placa; el de placas se guarda
+    junto al archivo de usuarios.
+
+    Los ingresos por día y espacio se acumulan en el archivo de ingresos
+    con cada alquiler o extensión, para que el reporte de ingresos no
+    recorra el historial.
+
+    version_datos() es un contador que el almacén aumenta después de cada
+    escritura (una sola vez por transacción); los reportes lo usan para
+    saber si un resultado guardado sigue vigente.
+
+    Las transacciones se confirman escribiendo primero un único registro
+    con todos sus cambios en el archivo de transacciones (write-ahead log)
+    y aplicándolos después a cada archivo. Si el proceso se interrumpe a
+    mitad de la aplicación, el registro se vuelve a aplicar al reabrir.
+
+    Varios procesos pueden compartir los archivos: las modificaciones de
+    una colección se hacen con su bloqueo de archivo tomado, y una
+    transacción verifica al confirmar que las colecciones que leyó siguen
+    en la misma versión (si no, lanza mu.ConflictoVersion).
+
+    Attributes:
+        espacios_path (str): Ruta del archivo de espacios
+        alquileres_path (str): Ruta del snapshot de alquileres
+        multas_path (str): Ruta del archivo de multas
+        usuarios_path (str): Ruta del archivo de usuarios
+        transacciones_path (str): Ruta del registro de transacciones
+        ingresos_path (str): Ruta de los ingresos diarios
+        version_path (str): Ruta cuya versión es la versión de los datos
+    """
+
+    # Transacciones recientes cuyos ingresos ya se sumaron; alcanza con
+    # pocas porque el registro de transacciones se vacía en cada confirmación
+    TRANSACCIONES_RECORDADAS = 32
+
+    # Alquileres que se copian de la bitácora por cada página de un recorrido
+    PAGINA_RECORRIDO = 500
+
+    def __init__(self, espacios_path=ESPACIOS_PATH, alquileres_path=ALQUILERES_PATH,
+                 multas_path=MULTAS_PATH, usuarios_path=USUARIOS_PATH,
+                 transacciones_path=TRANSACCIONES_PATH, ingresos_path=INGRESOS_PATH,
+                 version_path=VERSION_DATOS_PATH):
+        self.espacios_path = espacios_path
+        self.alquileres_path = alquileres_path
+        self.multas_path = multas_path
+        self.usuarios_path = usuarios_path
+        self.transacciones_path = transacciones_path
+        self.ingresos_path = ingresos_path
+        self.version_path = version_path
+        self._lock = threading.RLock()
+        self._libres = None
+        self._version_libres = None
+        self._multas = None
+        self._por_fecha = None
+        self._version_multas = None
+        self._indices_usuarios = {}
+        self._version_usuarios = None
+        self._local = threading.local()
+        mb.registrar_indice(alquileres_path, "vencimientos", mi.IndiceVencimientos)
+        mb.registrar_indice(alquileres_path, "activos_por_usuario", mi.IndiceActivosPorUsuario)
+        mb.registrar_indice(alquileres_path, "por_usuario", mi.IndiceAlquileresPorUsuario)
+        mb.registrar_indice(alquileres_path, "por_inicio", mi.IndicePorInicio)
+        self.recuperar()
+
+    # Versión de los datos
+    def version_datos(self) -> int:
+        """Retorna la versión de los datos, compartida entre procesos."""
+        return mu.version_json(self.version_path)
+
+    def incrementar_version_datos(self) -> int:
+        """Marca que los datos cambiaron y retorna la versión nueva."""
+        return mu.incrementar_version_json(self.version_path)
+
+    def _datos_cambiaron(self) -> None:
+        """
+        Aumenta la versión de los datos después de una escritura.
+
+        Notas:
+            - Mientras se aplica una transacción no hace nada: _confirmar
+              y recuperar la aumentan una vez al terminar
+        """
+        if not getattr(self._local, "aplicando", False):
+            self.incrementar_version_datos()
+
+    # Transacciones
+    def transaccion(self) -> "TransaccionJSON":
+        """Retorna una transacción nueva para usar con "with"."""
+        return TransaccionJSON(self)
+
+    def _rutas_transaccion(self) -> list:
+        """Retorna los archivos que se bloquean al confirmar o recuperar."""
+        return [self.espacios_path, self.alquileres_path, self.multas_path,
+                self.ingresos_path, self.transacciones_path]
+
+    def _confirmar(self, registro: dict, versiones: dict = None) -> None:
+        """
+        Confirma una transacción: registro en el log, aplicación y limpieza.
+
+        Args:
+            registro (dict): Cambios de la transacción con las llaves
+                alquileres, espacios y multas.
+            versiones (dict, optional): Ruta -> versión de cada colección
+                que la transacción leyó.
+
+        Raises:
+            mu.ConflictoVersion: Si otra escritura cambió alguna de las
+                colecciones leídas; no se escribe nada.
+        """
+        linea = json.dumps(registro, ensure_ascii=False) + "\n"
+        with self._lock, mu.bloquear_archivos(self._rutas_transaccion()):
+            for path, version in (versiones or {}).items():
+                actual = mu.version_json(path)
+                if actual != version:
+                    raise mu.ConflictoVersion(f"{path}: se leyó la versión {version} y la actual es {actual}")
+            with open(self.transacciones_path, "a", encoding="utf-8") as archivo:
+                archivo.write(linea)
+                archivo.flush()
+                os.fsync(archivo.fileno())
+            self._aplicar(registro)
+            self._vaciar_log()
+            self.incrementar_version_datos()
+
+    def _aplicar(self, registro: dict, reaplicando: bool = False) -> None:
+        """
+        Aplica los cambios de un registro de transacción a los archivos.
+
+        Args:
+            registro (dict): Cambios de la transacción.
+            reaplicando (bool): True si el registro viene de recuperar y
+                pudo haberse aplicado en parte.
+
+        Notas:
+            - Aplicar dos veces el mismo registro no cambia el resultado:
+              alquileres y multas se identifican por id, los espacios se
+              reemplazan con sus valores finales y el archivo de ingresos
+              recuerda las transacciones que ya sumó
+            - Las multas ya guardadas solo se buscan al reaplicar; en una
+              confirmación normal sus ids son nuevos y no hace falta leer
+              el archivo de multas completo
+        """
+        self._local.aplicando = True
+        try:
+            if registro.get("ingresos"):
+                # Antes de aplicar los alquileres, para que el acumulado
+                # reconstruido no incluya los de esta transacción
+                self._asegurar_ingresos()
+            mb.aplicar_entradas(self.alquileres_path, registro["alquileres"])
+            if registro["espacios"]:
+                self.actualizar_espacios(registro["espacios"])
+            if registro["multas"]:
+                nuevas = registro["multas"]
+                if reaplicando:
+                    existentes = {m.get("id") for m in self.leer_multas()}
+                    nuevas = [m for m in nuevas if m["id"] not in existentes]
+                self.agregar_multas(nuevas)
+            if registro.get("ingresos"):
+                self._aplicar_ingresos(registro["ingresos"], registro["id"])
+        finally:
+            self._local.aplicando = False
+
+    def _vaciar_log(self) -> None:
+        """Vacía el log de transacciones cuando sus cambios ya están en disco."""
+        mu.vaciar_escrituras_pendientes()
+        with open(self.transacciones_path, "w", encoding="utf-8") as archivo:
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+    def recuperar(self) -> int:
+        """
+        Vuelve a aplicar las transacciones que quedaron a medias.
+
+        Returns:
+            int: Cantidad de transacciones recuperadas.
+
+        Notas:
+            - Una última línea incompleta corresponde a una transacción que
+              nunca se confirmó y se descarta
+            - Si otro proceso está confirmando, espera a que termine
+        """
+        with self._lock, mu.bloquear_archivos(self._rutas_transaccion()):
+            try:
+                with open(self.transacciones_path, "r", encoding="utf-8") as archivo:
+                    lineas = archivo.read().split("\n")[:-1]
+            except FileNotFoundError:
+                return 0
+            if not lineas:
+                return 0
+            for linea in lineas:
+                self._aplicar(json.loads(linea), reaplicando=True)
+            self._vaciar_log()
+            self.incrementar_version_datos()
+            return len(lineas)
+
+    # Espacios
+    def leer_espacios(self) -> dict:
+        """Retorna todos los espacios como diccionario id -> datos."""
+        espacios = mu.leer_json(self.espacios_path)
+        return espacios if isinstance(espacios, dict) else {}
+
+    def buscar_espacio(self, id_espacio: str) -> dict | None:
+        """Retorna los datos de un espacio, o None si no existe."""
+        return self.leer_espacios().get(str(id_espacio))
+
+    def actualizar_espacios(self, cambios: dict) -> None:
+        """Reemplaza los datos de los espacios indicados (id -> datos)."""
+        with self._lock, mu.bloquear_archivo(self.espacios_path):
+            version = mu.version_json(self.espacios_path)
+            espacios = self.leer_espacios()
+            espacios.update({str(k): v for k, v in cambios.items()})
+            mu.escribir_json(self.espacios_path, espacios)
+
+            # Si nadie más escribió desde que se armó, el índice se actualiza
+            # solo con los espacios cambiados
+            if self._libres is not None and self._version_libres == version:
+                for id_espacio, datos in cambios.items():
+                    self._libres.actualizar(id_espacio, datos)
+                self._version_libres = mu.version_json(self.espacios_path)
+        self._datos_cambiaron()
+
+    def guardar_espacios(self, espacios: dict) -> None:
+        """Reemplaza la colección completa de espacios."""
+        with self._lock, mu.bloquear_archivo(self.espacios_path):
+            mu.escribir_json(self.espacios_path, espacios)
+            self._libres = mi.IndiceEspaciosLibres(espacios)
+            self._version_libres = mu.version_json(self.espacios_path)
+        self._datos_cambiaron()
+
+    def _indice_libres(self) -> mi.IndiceEspaciosLibres:
+        """
+        Retorna el índice de espacios libres.
+
+        Notas:
+            - Se arma una vez y se mantiene con las escrituras de este
+              almacén; si otro proceso escribió los espacios (cambió la
+              versión del archivo) se vuelve a armar
+        """
+        if self._libres is None or mu.version_json(self.espacios_path) != self._version_libres:
+            espacios, version = mu.leer_json_versionado(self.espacios_path)
+            self._libres = mi.IndiceEspaciosLibres(espacios if isinstance(espacios, dict) else {})
+            self._version_libres = version
+        return self._libres
+
+    def espacios_libres(self, limite: int = None) -> list:
+        """Retorna los ids (int) de los espacios libres en orden ascendente."""
+        with self._lock:
+            return self._indice_libres().primeros(limite)
+
+    def contar_espacios_libres(self) -> int:
+        """Retorna la cantidad de espacios libres."""
+        with self._lock:
+            return len(self._indice_libres())
+
+    # Alquileres
+    def leer_alquileres(self) -> list:
+        """Retorna todos los alquileres en orden de registro."""
+        return mb.leer_registros(self.alquileres_path)
+
+    def buscar_alquiler(self, id_alquiler: str) -> dict | None:
+        """Retorna un alquiler por su id, o None si no existe."""
+        return mb.buscar_registro(self.alquileres_path, id_alquiler)
+
+    def alquileres_activos(self) -> list:
+        """Retorna los alquileres en estado 'activo'."""
+        return mb.buscar_por_indice(self.alquileres_path, "activos_por_usuario",
+                                    lambda indice: indice.todos(), en_orden=True)
+
+    def alquileres_vencidos(self, ahora: datetime) -> list:
+        """Retorna los alquileres activos cuyo fin es anterior a ahora."""
+        return mb.buscar_por_indice(self.alquileres_path, "vencimientos",
+                                    lambda indice: indice.vencidos(ahora.timestamp()))
+
+    def alquileres_de_usuario(self, correo: str) -> list:
+        """Retorna los alquileres de un usuario en orden de registro."""
+        return mb.buscar_por_indice(self.alquileres_path, "por_usuario",
+                                    lambda indice: indice.de(correo), en_orden=True)
+
+    def alquileres_por_inicio(self, desde: int, hasta: int, descendente: bool = True) -> list:
+        """
+        Retorna los alquileres con inicio en [desde, hasta), ordenados.
+
+        Args:
+            desde (int): Marca de tiempo inicial, incluida.
+            hasta (int): Marca de tiempo final, excluida.
+            descendente (bool): True para los más recientes primero.
+
+        Returns:
+            list: Alquileres ordenados por inicio.
+        """
+        return mb.buscar_por_indice(self.alquileres_path, "por_inicio",
+                                    lambda indice: indice.rango(desde, hasta, descendente))
+
+    def recorrer_alquileres_por_inicio(self, desde: int, hasta: int, descendente: bool = False):
+        """
+        Recorre los alquileres con inicio en [desde, hasta), ordenados.
+
+        Notas:
+            - Los alquileres se copian por páginas de PAGINA_RECORRIDO;
+              cada página continúa después del último alquiler entregado
+        """
+        despues = None
+        while True:
+            pagina = mb.buscar_por_indice(
+                self.alquileres_path, "por_inicio",
+                lambda indice: indice.rango(desde, hasta, descendente, self.PAGINA_RECORRIDO, despues)
+            )
+            yield from pagina
+            if len(pagina) < self.PAGINA_RECORRIDO:
+                return
+            despues = (mu.marca(pagina[-1], "inicio"), pagina[-1]["id"])
+
+    def alquiler_activo_de(self, correo: str) -> dict | None:
+        """Retorna el alquiler activo de un usuario, o None."""
+        activos = mb.buscar_por_indice(self.alquileres_path, "activos_por_usuario",
+                                       lambda indice: indice.activos_de(correo), en_orden=True)
+        return activos[0] if activos else None
+
+    def agregar_alquiler(self, alquiler: dict) -> None:
+        """Registra un alquiler nuevo."""
+        mb.agregar_registro(self.alquileres_path, alquiler)
+        self._datos_cambiaron()
+
+    def actualizar_alquileres(self, cambios: dict) -> None:
+        """Modifica campos de varios alquileres (id -> campos)."""
+        mb.actualizar_registros(self.alquileres_path, cambios)
+        self._datos_cambiaron()
+
+    # Multas
+    def leer_multas(self) -> list:
+        """Retorna todas las multas en orden de registro."""
+        multas = mu.leer_json(self.multas_path)
+        return multas if isinstance(multas, list) else []
+
+    def agregar_multas(self, multas: list) -> None:
+        """Registra varias multas con una sola escritura."""
+        if multas:
+            with self._lock, mu.bloquear_archivo(self.multas_path):
+                anteriores, indice = self._estado_multas()
+                mu.escribir_json(self.multas_path, anteriores + list(multas))
+                # Las multas nuevas van al final: basta con agregarlas a las
+                # guardadas en memoria y sus posiciones al índice
+                for posicion, multa in enumerate(multas, len(anteriores)):
+                    anteriores.append(dict(multa))
+                    if (fecha := mu.marca(multa, "fecha")) is not None:
+                        indice.agregar(fecha, posicion)
+                self._version_multas = mu.version_json(self.multas_path)
+            self._datos_cambiaron()
+
+    def guardar_multas(self, multas: list) -> None:
+        """Reemplaza la colección completa de multas."""
+        with self._lock, mu.bloquear_archivo(self.multas_path):
+            mu.escribir_json(self.multas_path, list(multas))
+            self._multas = [dict(multa) for multa in multas]
+            self._por_fecha = mi.IndicePorFecha.por_posicion(self._multas)
+            self._version_multas = mu.version_json(self.multas_path)
+        self._datos_cambiaron()
+
+    def _estado_multas(self) -> tuple:
+        """
+        Retorna las multas en memoria y su índice por fecha.
+
+        Returns:
+            tuple: (multas, índice por posición).
+
+        Notas:
+            - Se llama con self._lock tomado
+            - El archivo solo se vuelve a leer si cambió su versión (otro
+              proceso escribió); las escrituras de este almacén actualizan
+              la copia en memoria, como modulo_bitacora con los alquileres
+        """
+        if self._multas is None or self._version_multas != mu.version_json(self.multas_path):
+            multas, version = mu.leer_json_versionado(self.multas_path)
+            self._multas = multas if isinstance(multas, list) else []
+            self._por_fecha = mi.IndicePorFecha.por_posicion(self._multas)
+            self._version_multas = version
+        return self._multas, self._por_fecha
+
+    def multas_por_fecha(self, desde: int, hasta: int, descendente: bool = True) -> list:
+        """
+        Retorna las multas con fecha en [desde, hasta), ordenadas.
+
+        Args:
+            desde (int): Marca de tiempo inicial, incluida.
+            hasta (int): Marca de tiempo final, excluida.
+            descendente (bool): True para las más recientes primero.
+
+        Returns:
+            list: Multas ordenadas por fecha.
+
+        Notas:
+            - Dos búsquedas binarias en el índice y una copia de las
+              multas del rango; el archivo no se lee si no cambió
+        """
+        with self._lock:
+            multas, indice = self._estado_multas()
+            return [dict(multas[posicion]) for posicion in indice.rango(desde, hasta, descendente)]
+
+    def recorrer_multas_por_fecha(self, desde: int, hasta: int, descendente: bool = False):
+        """
+        Recorre las multas con fecha en [desde, hasta), ordenadas.
+
+        Notas:
+            - Las multas se copian por páginas de PAGINA_RECORRIDO; cada
+              página continúa en el índice después de la última entregada
+        """
+        despues = None
+        while True:
+            with self._lock:
+                multas, indice = self._estado_multas()
+                posiciones = indice.rango(desde, hasta, descendente, self.PAGINA_RECORRIDO, despues)
+                pagina = [dict(multas[posicion]) for posicion in posiciones]
+            yield from pagina
+            if len(pagina) < self.PAGINA_RECORRIDO:
+                return
+            despues = (mu.marca(pagina[-1], "fecha"), posiciones[-1])
+
+    def recorrer_alquileres(self):
+        """Recorre todos los alquileres en orden de registro."""
+        yield from self.leer_alquileres()
+
+    # Ingresos
+    def _leer_archivo_ingresos(self) -> dict:
+        """Lee el archivo de ingresos: {"dias": {...}, "transacciones": [...]}."""
+        datos = mu.leer_json(self.ingresos_path)
+        return datos if isinstance(datos, dict) and "dias" in datos else {"dias": {}, "transacciones": []}
+
+    def _asegurar_ingresos(self) -> None:
+        """
+        Crea el archivo de ingresos desde el historial si todavía no existe.
+
+        Notas:
+            - En una instalación anterior a los ingresos acumulados el
+              archivo no existe; sin esto, el primer alquiler crearía un
+              acumulado con solo su monto y el reporte perdería el historial
+        """
+        with mu.bloquear_archivos([self.alquileres_path, self.ingresos_path]):
+            if not os.path.exists(self.ingresos_path):
+                self._reconstruir_ingresos()
+
+    def _aplicar_ingresos(self, ingresos: list, id_transaccion: str = None) -> None:
+        """
+        Suma ingresos al archivo de ingresos.
+
+        Args:
+            ingresos (list): Montos como [dia, espacio_id, monto].
+            id_transaccion (str, optional): Transacción de la que vienen;
+                si ya se sumó, no se vuelve a sumar.
+        """
+        self._asegurar_ingresos()
+        with mu.bloquear_archivo(self.ingresos_path):
+            datos = self._leer_archivo_ingresos()
+            if id_transaccion is not None:
+                if id_transaccion in datos["transacciones"]:
+                    return
+                datos["transacciones"] = (datos["transacciones"] + [id_transaccion])[-self.TRANSACCIONES_RECORDADAS:]
+            _sumar_ingresos(datos["dias"], ingresos)
+            mu.escribir_json(self.ingresos_path, datos)
+
+    def sumar_ingreso(self, dia: str, espacio_id, monto: float) -> None:
+        """
+        Suma un monto a los ingresos de un día y un espacio.
+
+        Args:
+            dia (str): Día en formato "YYYY-MM-DD".
+            espacio_id (str | int): Id del espacio.
+            monto (float): Monto a sumar.
+        """
+        self._aplicar_ingresos([[dia, str(espacio_id), monto]])
+        self._datos_cambiaron()
+
+    def leer_ingresos(self, desde: str, hasta: str) -> dict:
+        """
+        Retorna los ingresos de un rango de días.
+
+        Args:
+            desde (str): Primer día, "YYYY-MM-DD".
+            hasta (str): Último día (incluido), "YYYY-MM-DD".
+
+        Returns:
+            dict: Día -> {id del espacio: monto}, solo días con ingresos.
+
+        Notas:
+            - Si el archivo de ingresos no existe se calcula una vez
+              desde el historial
+        """
+        self._asegurar_ingresos()
+        dias = self._leer_archivo_ingresos()["dias"]
+        return {dia: dias[dia] for dia in sorted(dias) if desde <= dia <= hasta}
+
+    def reconstruir_ingresos(self) -> int:
+        """
+        Recalcula los ingresos diarios desde el historial de alquileres.
+
+        Returns:
+            int: Cantidad de días con ingresos.
+        """
+        dias = self._reconstruir_ingresos()
+        self._datos_cambiaron()
+        return dias
+
+    def _reconstruir_ingresos(self) -> int:
+        """Recalcula los ingresos sin cambiar la versión de los datos."""
+        with mu.bloquear_archivos([self.alquileres_path, self.ingresos_path]):
+            dias = calcular_ingresos(self.recorrer_alquileres())
+            mu.escribir_json(self.ingresos_path, {"dias": dias, "transacciones": []})
+        return len(dias)
+
+    # Usuarios
+    def leer_usuarios(self) -> list:
+        """Retorna todos los usuarios."""
+        usuarios = mu.leer_json(self.usuarios_path)
+        return usuarios if isinstance(usuarios, list) else []
+
+    def contar_usuarios(self) -> int:
+        """Retorna la cantidad de usuarios registrados."""
+        return len(self._indice_usuarios("usuarios"))
+
+    def buscar_usuario(self, campo: str, valor) -> dict | None:
+        """
+        Busca un usuario por "identificacion", "correo" o "tarjeta".
+
+        Returns:
+            dict | None: Datos del usuario, o None si no existe.
+
+        Notas:
+            - Se responde desde el índice, sin leer el archivo de usuarios
+        """
+        return self._indice_usuarios("usuarios").buscar(campo, valor)
+
+    def _indice_usuarios(self, nombre: str):
+        """
+        Retorna un índice de usuarios de _INDICES_USUARIOS.
+
+        Notas:
+            - Cada índice se arma la primera vez que se pide; los que se
+              pueden exportar se cargan del archivo de índices si se
+              guardaron con el archivo de usuarios actual
+            - Se mantienen con las escrituras de este almacén; si otro
+              proceso escribió los usuarios (cambió la versión) se
+              descartan y se vuelven a cargar
+        """
+        with self._lock, mu.bloquear_archivo(self.usuarios_path, exclusivo=False):
+            version = mu.version_json(self.usuarios_path)
+            if self._version_usuarios != version:
+                self._indices_usuarios = {}
+                self._version_usuarios = version
+            if nombre not in self._indices_usuarios:
+                self._indices_usuarios[nombre] = self._cargar_indice_usuarios(nombre)
+            return self._indices_usuarios[nombre]
+
+    def _cargar_indice_usuarios(self, nombre: str):
+        """Carga un índice de usuarios del archivo de índices o lo arma."""
+        clase = _INDICES_USUARIOS[nombre]
+        if hasattr(clase, "desde_exportado"):
+            guardado = mu.leer_json(mb.ruta_indices(self.usuarios_path))
+            firma = _firma(self.usuarios_path)
+            if guardado and firma is not None and guardado.get("firma") == firma \
+                    and nombre in guardado.get("indices", {}):
+                return clase.desde_exportado(guardado["indices"][nombre])
+            indice = clase(self.leer_usuarios())
+            self._guardar_indices_usuarios({**self._indices_usuarios, nombre: indice})
+            return indice
+        return clase(self.leer_usuarios())
+
+    def _guardar_indices_usuarios(self, indices: dict) -> None:
+        """Guarda los índices exportables junto al archivo de usuarios, con su firma."""
+        firma = _firma(self.usuarios_path)
+        exportables = {nombre: indice.exportar() for nombre, indice in indices.items()
+                       if hasattr(indice, "exportar")}
+        if firma is not None and exportables:
+            mu.escribir_json(mb.ruta_indices(self.usuarios_path), {"firma": firma, "indices": exportables})
+
+    def _verificar_unicos(self, usuario: dict, identificacion: str = None, anterior: dict = None) -> None:
+        """
+        Verifica que la identificación, el correo, la tarjeta y las placas
+        del usuario no sean de otro usuario.
+
+        Args:
+            usuario (dict): Datos del usuario a guardar.
+            identificacion (str, optional): Identificación actual, None si
+                es un usuario nuevo.
+            anterior (dict, optional): Datos guardados del usuario; solo
+                se verifican los valores que cambian.
+
+        Raises:
+            ValorDuplicado: Con el primer campo repetido.
+
+        Notas:
+            - En datos anteriores a los índices una tarjeta o una placa
+              puede ser de varios usuarios; mientras no la cambien, esos
+              usuarios pueden seguir actualizando el resto de sus datos
+        """
+        duplicados = self._indice_usuarios("usuarios").duplicados(usuario, identificacion, anterior)
+        duplicados += [("placa", placa) for placa in
+                       self._indice_usuarios("placas").duplicadas(usuario, identificacion, anterior)]
+        if duplicados:
+            raise ValorDuplicado(*duplicados[0])
+
+    def _escribir_usuarios(self, usuarios: list, anterior: dict | None, nuevo: dict | None) -> None:
+        """
+        Escribe los usuarios y actualiza los índices solo con el cambiado.
+
+        Args:
+            usuarios (list): Colección completa a escribir.
+            anterior (dict | None): Datos del usuario antes del cambio.
+            nuevo (dict | None): Datos del usuario después del cambio.
+
+        Notas:
+            - Se llama con el archivo de usuarios bloqueado en exclusiva y
+              después de _verificar_unicos, que deja los índices al día
+        """
+        mu.escribir_json(self.usuarios_path, usuarios)
+        for indice in self._indices_usuarios.values():
+            if anterior is not None:
+                indice.quitar(anterior)
+            if nuevo is not None:
+                indice.agregar(nuevo)
+        self._version_usuarios = mu.version_json(self.usuarios_path)
+        self._guardar_indices_usuarios(self._indices_usuarios)
+
+    def buscar_dueno_placa(self, placa: str) -> dict | None:
+        """
+        Busca el dueño de un vehículo por su placa.
+
+        Returns:
+            dict | None: {"identificacion", "correo"} del dueño, o None.
+        """
+        dueno = self._indice_usuarios("placas").dueno(placa)
+        return {"identificacion": dueno[0], "correo": dueno[1]} if dueno else None
+
+    def agregar_usuario(self, usuario: dict) -> None:
+        """
+        Registra un usuario nuevo.
+
+        Raises:
+            ValorDuplicado: Si su identificación, correo, tarjeta o alguna
+                de sus placas ya está registrada.
+        """
+        with self._lock, mu.bloquear_archivo(self.usuarios_path):
+            self._verificar_unicos(usuario)
+            self._escribir_usuarios(self.leer_usuarios() + [usuario], None, usuario)
+        self._datos_cambiaron()
+
+    def reemplazar_usuario(self, identificacion: str, usuario: dict) -> bool:
+        """
+        Reemplaza los datos de un usuario. Retorna False si no existe.
+
+        Raises:
+            ValorDuplicado: Si su identificación, correo, tarjeta o alguna
+                de sus placas es de otro usuario.
+        """
+        with self._lock, mu.bloquear_archivo(self.usuarios_path):
+            anterior = self._indice_usuarios("usuarios").buscar("identificacion", identificacion)
+            if anterior is None:
+                return False
+            self._verificar_unicos(usuario, identificacion, anterior)
+            usuarios = self.leer_usuarios()
+            for i, u in enumerate(usuarios):
+                if u["identificacion"] == identificacion:
+                    usuarios[i] = usuario
+                    self._escribir_usuarios(usuarios, u, usuario)
+                    break
+            else:
+                return False
+        self._datos_cambiaron()
+        return True
+
+    def eliminar_usuario(self, identificacion: str) -> bool:
+        """Elimina un usuario. Retorna False si no existe."""
+        with self._lock, mu.bloquear_archivo(self.usuarios_path):
+            anterior = self._indice_usuarios("usuarios").buscar("identificacion", identificacion)
+            if anterior is None:
+                return False
+            # Se verifican ambos índices para que queden cargados y al día
+            self._indice_usuarios("placas")
+            usuarios = [u for u in self.leer_usuarios() if u["identificacion"] != identificacion]
+            self._escribir_usuarios(usuarios, anterior, None)
+        self._datos_cambiaron()
+        return True
+
+class TransaccionJSON:
+    """
+    Unidad de trabajo sobre un AlmacenJSON.
+
+    Lee cada colección una sola vez, acumula los cambios en memoria y los
+    confirma juntos al salir del bloque "with" sin errores. Si el bloque
+    lanza una excepción los cambios se descartan. Mientras dura el bloque
+    ningún otro hilo del proceso puede confirmar en el mismo almacén.
+    Otros procesos sí pueden hacerlo: se guarda la versión de cada
+    colección leída y, si alguna cambió al confirmar, se lanza
+    mu.ConflictoVersion para que el llamador repita la operación. Expone
+    los mismos métodos de lectura y escritura que el almacén para las
+    colecciones de espacios, alquileres, multas e ingresos.
+
+    Attributes:
+        almacen (AlmacenJSON): Almacén sobre el que se confirma
+    """
+
+    def __init__(self, almacen: AlmacenJSON):
+        self.almacen = almacen
+        self._espacios = None
+        self._espacios_cambiados = {}
+        self._altas = {}
+        self._cambios = {}
+        self._multas = []
+        self._ingresos = []
+        self._versiones = {}
+
+    def __enter__(self):
+        self.almacen._lock.acquire()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        try:
+            if tipo is None:
+                self.confirmar()
+        finally:
+            self.almacen._lock.release()
+        return False
+
+    # Espacios
+    def _cargar_espacios(self) -> dict:
+        """Lee los espacios una sola vez, guardando su versión."""
+        if self._espacios is None:
+            espacios, version = mu.leer_json_versionado(self.almacen.espacios_path)
+            self._espacios = espacios if isinstance(espacios, dict) else {}
+            self._versiones[self.almacen.espacios_path] = version
+        return self._espacios
+
+    def leer_espacios(self) -> dict:
+        """Retorna todos los espacios con los cambios de la transacción."""
+        self._cargar_espacios()
+        return {k: dict(v) for k, v in self._espacios.items()}
+
+    def buscar_espacio(self, id_espacio: str) -> dict | None:
+        """Retorna los datos de un espacio, o None si no existe."""
+        espacio = self._cargar_espacios().get(str(id_espacio))
+        return dict(espacio) if espacio is not None else None
+
+    def actualizar_espacios(self, cambios: dict) -> None:
+        """Prepara el reemplazo de los espacios indicados (id -> datos)."""
+        self._cargar_espacios()
+        for id_espacio, datos in cambios.items():
+            self._espacios[str(id_espacio)] = dict(datos)
+            self._espacios_cambiados[str(id_espacio)] = dict(datos)
+
+    # Alquileres
+    def _marcar_lectura_alquileres(self) -> None:
+        """Guarda la versión de los alquileres antes de la primera lectura."""
+        path = self.almacen.alquileres_path
+        if path not in self._versiones:
+            self._versiones[path] = mu.version_json(path)
+
+    def _con_cambios(self, alquiler: dict) -> dict:
+        """Aplica a un alquiler los cambios preparados en la transacción."""
+        return {**alquiler, **self._cambios.get(alquiler["id"], {})}
+
+    def buscar_alquiler(self, id_alquiler: str) -> dict | None:
+        """Retorna un alquiler por su id, o None si no existe."""
+        self._marcar_lectura_alquileres()
+        alquiler = self._altas.get(id_alquiler) or self.almacen.buscar_alquiler(id_alquiler)
+        return self._con_cambios(alquiler) if alquiler else None
+
+    def alquileres_activos(self) -> list:
+        """Retorna los alquileres activos con los cambios de la transacción."""
+        self._marcar_lectura_alquileres()
+        alquileres = [self._con_cambios(a) for a in self.almacen.alquileres_activos()]
+        alquileres += [self._con_cambios(a) for a in self._altas.values()]
+        return [a for a in alquileres if a["estado"] == "activo"]
+
+    def alquileres_vencidos(self, ahora: datetime) -> list:
+        """Retorna los alquileres vencidos con los cambios de la transacción."""
+        self._marcar_lectura_alquileres()
+        candidatos = self.almacen.alquileres_vencidos(ahora)
+        ids = {c["id"] for c in candidatos}
+        candidatos += [a for a in self._altas.values() if a["id"] not in ids]
+        ahora_ts = ahora.timestamp()
+        vencidos = []
+        for alquiler in map(self._con_cambios, candidatos):
+            fin = mu.marca(alquiler, "fin")
+            if alquiler["estado"] == "activo" and fin is not None and fin < ahora_ts:
+                vencidos.append(alquiler)
+        return vencidos
+
+    def agregar_alquiler(self, alquiler: dict) -> None:
+        """Prepara el registro de un alquiler nuevo."""
+        self._altas[alquiler["id"]] = dict(alquiler)
+
+    def actualizar_alquileres(self, cambios: dict) -> None:
+        """Prepara cambios de campos de varios alquileres (id -> campos)."""
+        for id_alquiler, campos in cambios.items():
+            self._cambios.setdefault(id_alquiler, {}).update(campos)
+
+    # Multas
+    def agregar_multas(self, multas: list) -> None:
+        """Prepara el registro de varias multas."""
+        for multa in multas:
+            self._multas.append({"id": str(uuid.uuid4()), **multa})
+
+    # Ingresos
+    def sumar_ingreso(self, dia: str, espacio_id, monto: float) -> None:
+        """Prepara la suma de un monto a los ingresos de un día y un espacio."""
+        self._ingresos.append([dia, str(espacio_id), monto])
+
+    def confirmar(self) -> None:
+        """
+        Confirma todos los cambios preparados con un solo registro.
+
+        Raises:
+            mu.ConflictoVersion: Si otro proceso modificó una colección
+                leída por la transacción.
+
+        Notas:
+            - Si no hay cambios no se escribe nada
+        """
+        alquileres = [{"op": "alta", "registro": a} for a in self._altas.values()]
+        alquileres += [{"op": "cambio", "id": k, "campos": v} for k, v in self._cambios.items()]
+        if not (alquileres or self._espacios_cambiados or self._multas or self._ingresos):
+            return
+        self.almacen._confirmar({
+            "id": str(uuid.uuid4()),
+            "alquileres": alquileres,
+            "espacios": self._espacios_cambiados,
+            "multas": self._multas,
+            "ingresos": self._ingresos,
+        }, self._versiones)
+
+# ----------------------------
+# Almacén en SQLite
+# ----------------------------
+# Condición de espacio libre; debe coincidir con la del índice parcial
+_CONDICION_LIBRE = "usuario = '' AND json_extract(datos, '$.habilitado') = 'S'"
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS espacios (
+    id TEXT PRIMARY KEY,
+    usuario TEXT NOT NULL DEFAULT '',
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_espacios_usuario ON espacios(usuario);
+CREATE INDEX IF NOT EXISTS idx_espacios_libres ON espacios(CAST(id AS INTEGER))
+    WHERE usuario = '' AND json_extract(datos, '$.habilitado') = 'S';
+
+CREATE TABLE IF NOT EXISTS alquileres (
+    id TEXT PRIMARY KEY,
+    usuario TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    espacio_id TEXT NOT NULL,
+    fin TEXT NOT NULL,
+    placa TEXT NOT NULL DEFAULT '',
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alquileres_usuario ON alquileres(usuario, estado);
+CREATE INDEX IF NOT EXISTS idx_alquileres_estado ON alquileres(estado, fin);
+CREATE INDEX IF NOT EXISTS idx_alquileres_espacio ON alquileres(espacio_id);
+CREATE INDEX IF NOT EXISTS idx_alquileres_fin ON alquileres(fin);
+CREATE INDEX IF NOT EXISTS idx_alquileres_placa ON alquileres(placa);
+CREATE INDEX IF NOT EXISTS idx_alquileres_inicio ON alquileres(json_extract(datos, '$.inicio_ts'));
+
+CREATE TABLE IF NOT EXISTS multas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    correo TEXT NOT NULL DEFAULT '',
+    espacio TEXT NOT NULL DEFAULT '',
+    fecha TEXT NOT NULL DEFAULT '',
+    placa TEXT NOT NULL DEFAULT '',
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_multas_placa ON multas(placa);
+CREATE INDEX IF NOT EXISTS idx_multas_correo ON multas(correo);
+CREATE INDEX IF NOT EXISTS idx_multas_fecha ON multas(fecha);
+CREATE INDEX IF NOT EXISTS idx_multas_fecha_ts ON multas(json_extract(datos, '$.fecha_ts'));
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    identificacion TEXT PRIMARY KEY,
+    correo TEXT,
+    tarjeta TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_usuarios_correo ON usuarios(correo);
+CREATE INDEX IF NOT EXISTS idx_usuarios_tarjeta ON usuarios(tarjeta);
+
+CREATE TABLE IF NOT EXISTS placas (
+    placa TEXT PRIMARY KEY,
+    identificacion TEXT NOT NULL,
+    correo TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_placas_identificacion ON placas(identificacion);
+
+CREATE TABLE IF NOT EXISTS ingresos (
+    dia TEXT NOT NULL,
+    espacio_id TEXT NOT NULL,
+    monto REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, espacio_id)
+);
+
+CREATE TABLE IF NOT EXISTS contadores (
+    nombre TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+class AlmacenSQLite:
+    """
+    Almacén basado en una base de datos SQLite.
+
+    Cada tabla guarda el registro completo como JSON en la columna datos y
+    copia en columnas indexadas los campos por los que se busca. Las fechas
+    indexadas se guardan como "YYYY-MM-DD HH:MM" para que ordenen bien.
+    Los historiales por rango de fechas usan índices sobre las marcas de
+    tiempo de datos; los registros sin marcas se completan con
+    migrar_marcas_de_tiempo.
+
+    transaccion() abre una transacción de SQLite; las escrituras hechas
+    dentro del bloque forman parte de ella y se confirman juntas.
+
+    La tabla placas relaciona cada placa normalizada con su dueño; su
+    llave primaria impide registrar la misma placa para dos usuarios. El
+    correo y la tarjeta también son únicos: se verifican con sus índices
+    antes de guardar un usuario.
+
+    La tabla ingresos acumula los ingresos por día y espacio; se
+    actualiza en la misma transacción que el alquiler o la extensión.
+    La tabla contadores guarda la versión de los datos (ver
+    version_datos).
+
+    Attributes:
+        db_path (str): Ruta del archivo de la base de datos
+    """
+
+    def __init__(self, db_path=SQLITE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._conexion().executescript(ESQUEMA_SQLITE)
+        self._completar_placas()
+        self._completar_ingresos()
+
+    def _completar_ingresos(self) -> None:
+        """Calcula los ingresos en bases creadas antes de que existieran."""
+        con = self._conexion()
+        if con.execute("SELECT 1 FROM ingresos LIMIT 1").fetchone():
+            return
+        if con.execute("SELECT 1 FROM alquileres LIMIT 1").fetchone():
+            self.reconstruir_ingresos()
+
+    def _completar_placas(self) -> None:
+        """Llena la tabla de placas en bases creadas antes de que existiera."""
+        con = self._conexion()
+        if con.execute("SELECT 1 FROM placas LIMIT 1").fetchone():
+            return
+        if not con.execute("SELECT 1 FROM usuarios LIMIT 1").fetchone():
+            return
+        with self._transaccion() as con:
+            for usuario in self.leer_usuarios():
+                self._guardar_placas(con, usuario, estricto=False)
+
+    def _conexion(self) -> sqlite3.Connection:
+        """Retorna la conexión del hilo actual, creándola si hace falta."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    @contextmanager
+    def _transaccion(self):
+        """
+        Ejecuta el bloque en una transacción de escritura.
+
+        Notas:
+            - Si ya hay una transacción abierta en el hilo, el bloque se
+              suma a ella en lugar de abrir otra
+        """
+        con = self._conexion()
+        if con.in_transaction:
+            yield con
+            return
+        con.execute("BEGIN IMMEDIATE")
+        self._local.cambios = False
+        try:
+            yield con
+            if self._local.cambios:
+                self._sumar_version(con)
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.cambios = False
+        con.execute("COMMIT")
+
+    def _datos_cambiaron(self) -> None:
+        """
+        Marca que la transacción en curso escribió datos.
+
+        Notas:
+            - La versión de los datos aumenta una sola vez, al confirmar
+              la transacción externa y dentro de ella
+        """
+        self._local.cambios = True
+
+    # Versión de los datos
+    def version_datos(self) -> int:
+        """Retorna la versión de los datos, compartida entre procesos."""
+        fila = self._conexion().execute("SELECT valor FROM contadores WHERE nombre = 'datos'").fetchone()
+        return fila[0] if fila else 0
+
+    def incrementar_version_datos(self) -> int:
+        """Marca que los datos cambiaron y retorna la versión nueva."""
+        with self._transaccion() as con:
+            self._sumar_version(con)
+            return con.execute("SELECT valor FROM contadores WHERE nombre = 'datos'").fetchone()[0]
+
+    def _sumar_version(self, con) -> None:
+        """Aumenta la versión de los datos dentro de una transacción."""
+        con.execute(
+            "INSERT INTO contadores (nombre, valor) VALUES ('datos', 1) "
+            "ON CONFLICT(nombre) DO UPDATE SET valor = valor + 1"
+        )
+
+    @contextmanager
+    def transaccion(self):
+        """Agrupa las operaciones del bloque en una sola transacción."""
+        with self._transaccion():
+            yield self
+
+    def _consultar(self, sql: str, parametros=()) -> list:
+        """Ejecuta una consulta y decodifica la columna datos de cada fila."""
+        return [json.loads(fila[0]) for fila in self._conexion().execute(sql, parametros)]
+
+    # Espacios
+    def leer_espacios(self) -> dict:
+        """Retorna todos los espacios como diccionario id -> datos."""
+        filas = self._conexion().execute("SELECT id, datos FROM espacios ORDER BY rowid")
+        return {id_espacio: json.loads(datos) for id_espacio, datos in filas}
+
+    def buscar_espacio(self, id_espacio: str) -> dict | None:
+        """Retorna los datos de un espacio, o None si no existe."""
+        filas = self._consultar("SELECT datos FROM espacios WHERE id = ?", (str(id_espacio),))
+        return filas[0] if filas else None
+
+    def _guardar_espacio(self, con, id_espacio, datos) -> None:
+        """Inserta o reemplaza un espacio dentro de una transacción."""
+        con.execute(
+            "INSERT INTO espacios (id, usuario, datos) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET usuario = excluded.usuario, datos = excluded.datos",
+            (str(id_espacio), datos.get("usuario", ""), json.dumps(datos, ensure_ascii=False))
+        )
+
+    def actualizar_espacios(self, cambios: dict) -> None:
+        """Reemplaza los datos de los espacios indicados (id -> datos)."""
+        with self._transaccion() as con:
+            for id_espacio, datos in cambios.items():
+                self._guardar_espacio(con, id_espacio, datos)
+            self._datos_cambiaron()
+
+    def guardar_espacios(self, espacios: dict) -> None:
+        """Reemplaza la colección completa de espacios."""
+        with self._transaccion() as con:
+            con.execute("DELETE FROM espacios")
+            for id_espacio, datos in espacios.items():
+                self._guardar_espacio(con, id_espacio, datos)
+            self._datos_cambiaron()
+
+    def espacios_libres(self, limite: int = None) -> list:
+        """Retorna los ids (int) de los espacios libres en orden ascendente."""
+        filas = self._conexion().execute(
+            f"SELECT id FROM espacios INDEXED BY idx_espacios_libres WHERE {_CONDICION_LIBRE} ORDER BY CAST(id AS INTEGER) LIMIT ?",
+            (-1 if limite is None else limite,)
+        )
+        return [int(id_espacio) for id_espacio, in filas]
+
+    def contar_espacios_libres(self) -> int:
+        """Retorna la cantidad de espacios libres."""
+        return self._conexion().execute(
+            f"SELECT COUNT(*) FROM espacios INDEXED BY idx_espacios_libres WHERE {_CONDICION_LIBRE}"
+        ).fetchone()[0]
+
+    # Alquileres
+    def leer_alquileres(self) -> list:
+        """Retorna todos los alquileres en orden de registro."""
+        return self._consultar("SELECT datos FROM alquileres ORDER BY rowid")
+
+    def buscar_alquiler(self, id_alquiler: str) -> dict | None:
+        """Retorna un alquiler por su id, o None si no existe."""
+        filas = self._consultar("SELECT datos FROM alquileres WHERE id = ?", (id_alquiler,))
+        return filas[0] if filas else None
+
+    def alquileres_activos(self) -> list:
+        """Retorna los alquileres en estado 'activo'."""
+        return self._consultar("SELECT datos FROM alquileres WHERE estado = 'activo' ORDER BY rowid")
+
+    def alquileres_vencidos(self, ahora: datetime) -> list:
+        """
+        Retorna los alquileres activos cuyo fin es anterior a ahora.
+
+        Notas:
+            - Compara fin_ts en segundos con "<", igual que AlmacenJSON;
+              solo los alquileres sin marcas (sin migrar) se comparan por
+              el texto del fin, al minuto, como lo hace mu.marca
+        """
+        return self._consultar(
+            "SELECT datos FROM alquileres WHERE estado = 'activo' "
+            "AND (json_extract(datos, '$.fin_ts') < ? "
+            "OR (json_extract(datos, '$.fin_ts') IS NULL AND fin <= ?)) ORDER BY fin",
+            (ahora.timestamp(), _fecha_ordenable(ahora.strftime(mu.FORMATO_FECHA)))
+        )
+
+    def alquileres_de_usuario(self, correo: str) -> list:
+        """Retorna los alquileres de un usuario en orden de registro."""
+        return self._consultar("SELECT datos FROM alquileres WHERE usuario = ? ORDER BY rowid", (correo,))
+
+    def alquiler_activo_de(self, correo: str) -> dict | None:
+        """Retorna el alquiler activo de un usuario, o None."""
+        filas = self._consultar(
+            "SELECT datos FROM alquileres WHERE usuario = ? AND estado = 'activo' ORDER BY rowid LIMIT 1",
+            (correo,)
+        )
+        return filas[0] if filas else None
+
+    def alquileres_por_inicio(self, desde: int, hasta: int, descendente: bool = True) -> list:
+        """Retorna los alquileres con inicio en [desde, hasta), ordenados."""
+        return list(self.recorrer_alquileres_por_inicio(desde, hasta, descendente))
+
+    def recorrer_alquileres_por_inicio(self, desde: int, hasta: int, descendente: bool = False):
+        """Recorre los alquileres con inicio en [desde, hasta), ordenados, desde el cursor."""
+        orden = "DESC" if descendente else "ASC"
+        filas = self._conexion().execute(
+            "SELECT datos FROM alquileres WHERE json_extract(datos, '$.inicio_ts') >= ? "
+            f"AND json_extract(datos, '$.inicio_ts') < ? ORDER BY json_extract(datos, '$.inicio_ts') {orden}, rowid {orden}",
+            (desde, hasta)
+        )
+        for datos, in filas:
+            yield json.loads(datos)
+
+    def _guardar_alquiler(self, con, alquiler) -> None:
+        """Inserta o reemplaza un alquiler dentro de una transacción."""
+        con.execute(
+            "INSERT INTO alquileres (id, usuario, estado, espacio_id, fin, placa, datos) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET usuario = excluded.usuario, estado = excluded.estado, "
+            "espacio_id = excluded.espacio_id, fin = excluded.fin, placa = excluded.placa, "
+            "datos = excluded.datos",
+            (alquiler["id"], alquiler["usuario"], alquiler["estado"], str(alquiler["espacio_id"]),
+             _fecha_ordenable(alquiler["fin"]), alquiler.get("placa", ""),
+             json.dumps(alquiler, ensure_ascii=False))
+        )
+
+    def agregar_alquiler(self, alquiler: dict) -> None:
+        """Registra un alquiler nuevo."""
+        with self._transaccion() as con:
+            self._guardar_alquiler(con, alquiler)
+            self._datos_cambiaron()
+
+    def actualizar_alquileres(self, cambios: dict) -> None:
+        """Modifica campos de varios alquileres (id -> campos)."""
+        with self._transaccion() as con:
+            for id_alquiler, campos in cambios.items():
+                fila = con.execute("SELECT datos FROM alquileres WHERE id = ?", (id_alquiler,)).fetchone()
+                if fila:
+                    alquiler = json.loads(fila[0])
+                    alquiler.update(campos)
+                    self._guardar_alquiler(con, alquiler)
+                    self._datos_cambiaron()
+
+    def recorrer_alquileres(self):
+        """
+        Recorre todos los alquileres en orden de registro.
+
+        Notas:
+            - Las filas se leen del cursor a medida que se piden, sin
+              cargar la tabla completa en memoria
+        """
+        for datos, in self._conexion().execute("SELECT datos FROM alquileres ORDER BY rowid"):
+            yield json.loads(datos)
+
+    # Ingresos
+    def sumar_ingreso(self, dia: str, espacio_id, monto: float) -> None:
+        """
+        Suma un monto a los ingresos de un día y un espacio.
+
+        Args:
+            dia (str): Día en formato "YYYY-MM-DD".
+            espacio_id (str | int): Id del espacio.
+            monto (float): Monto a sumar.
+        """
+        with self._transaccion() as con:
+            con.execute(
+                "INSERT INTO ingresos (dia, espacio_id, monto) VALUES (?, ?, ROUND(?, 2)) "
+                "ON CONFLICT(dia, espacio_id) DO UPDATE SET monto = ROUND(monto + excluded.monto, 2)",
+                (dia, str(espacio_id), monto)
+            )
+            self._datos_cambiaron()
+
+    def leer_ingresos(self, desde: str, hasta: str) -> dict:
+        """
+        Retorna los ingresos de un rango de días.
+
+        Args:
+            desde (str): Primer día, "YYYY-MM-DD".
+            hasta (str): Último día (incluido), "YYYY-MM-DD".
+
+        Returns:
+            dict: Día -> {id del espacio: monto}, solo días con ingresos.
+        """
+        dias = {}
+        filas = self._conexion().execute(
+            "SELECT dia, espacio_id, monto FROM ingresos WHERE dia BETWEEN ? AND ? ORDER BY dia", (desde, hasta)
+        )
+        for dia, espacio_id, monto in filas:
+            dias.setdefault(dia, {})[espacio_id] = monto
+        return dias
+
+    def reconstruir_ingresos(self) -> int:
+        """
+        Recalcula los ingresos diarios desde el historial de alquileres.
+
+        Returns:
+            int: Cantidad de días con ingresos.
+        """
+        with self._transaccion() as con:
+            dias = calcular_ingresos(self.recorrer_alquileres())
+            con.execute("DELETE FROM ingresos")
+            con.executemany(
+                "INSERT INTO ingresos (dia, espacio_id, monto) VALUES (?, ?, ?)",
+                [(dia, espacio_id, monto) for dia, por_espacio in dias.items()
+                 for espacio_id, monto in por_espacio.items()]
+            )
+            self._datos_cambiaron()
+        return len(dias)
+
+    # Multas
+    def leer_multas(self) -> list:
+        """Retorna todas las multas en orden de registro."""
+        return self._consultar("SELECT datos FROM multas ORDER BY id")
+
+    def multas_por_fecha(self, desde: int, hasta: int, descendente: bool = True) -> list:
+        """Retorna las multas con fecha en [desde, hasta), ordenadas."""
+        return list(self.recorrer_multas_por_fecha(desde, hasta, descendente))
+
+    def recorrer_multas_por_fecha(self, desde: int, hasta: int, descendente: bool = False):
+        """Recorre las multas con fecha en [desde, hasta), ordenadas, desde el cursor."""
+        orden = "DESC" if descendente else "ASC"
+        filas = self._conexion().execute(
+            "SELECT datos FROM multas WHERE json_extract(datos, '$.fecha_ts') >= ? "
+            f"AND json_extract(datos, '$.fecha_ts') < ? ORDER BY json_extract(datos, '$.fecha_ts') {orden}, id {orden}",
+            (desde, hasta)
+        )
+        for datos, in filas:
+            yield json.loads(datos)
+
+    def guardar_multas(self, multas: list) -> None:
+        """Reemplaza la colección completa de multas."""
+        with self._transaccion() as con:
+            con.execute("DELETE FROM multas")
+            self.agregar_multas(multas)
+            self._datos_cambiaron()
+
+    def agregar_multas(self, multas: list) -> None:
+        """Registra varias multas con una sola transacción."""
+        with self._transaccion() as con:
+            con.executemany(
+                "INSERT INTO multas (correo, espacio, fecha, placa, datos) VALUES (?, ?, ?, ?, ?)",
+                [(m.get("correo", ""), str(m.get("espacio", "")), _fecha_ordenable(m.get("fecha", "")),
+                  m.get("placa", ""), json.dumps(m, ensure_ascii=False)) for m in multas]
+            )
+            if multas:
+                self._datos_cambiaron()
+
+    # Usuarios
+    def leer_usuarios(self) -> list:
+        """Retorna todos los usuarios."""
+        return self._consultar("SELECT datos FROM usuarios ORDER BY rowid")
+
+    def contar_usuarios(self) -> int:
+        """Retorna la cantidad de usuarios registrados."""
+        return self._conexion().execute("SELECT COUNT(*) FROM usuarios").fetchone()[0]
+
+    def buscar_usuario(self, campo: str, valor) -> dict | None:
+        """
+        Busca un usuario por "identificacion", "correo" o "tarjeta".
+
+        Returns:
+            dict | None: Datos del usuario, o None si no existe.
+        """
+        if campo not in mi.CAMPOS_UNICOS_USUARIO:
+            raise ValueError(f"Campo de búsqueda no soportado: {campo}")
+        filas = self._consultar(f"SELECT datos FROM usuarios WHERE {campo} = ? LIMIT 1", (valor,))
+        return filas[0] if filas else None
+
+    def buscar_dueno_placa(self, placa: str) -> dict | None:
+        """
+        Busca el dueño de un vehículo por su placa.
+
+        Returns:
+            dict | None: {"identificacion", "correo"} del dueño, o None.
+        """
+        fila = self._conexion().execute(
+            "SELECT identificacion, correo FROM placas WHERE placa = ?", (mi.normalizar_placa(placa),)
+        ).fetchone()
+        return {"identificacion": fila[0], "correo": fila[1]} if fila else None
+
+    def _guardar_placas(self, con, usuario, estricto: bool = True, anterior: dict = None) -> None:
+        """
+        Reemplaza las placas de un usuario dentro de una transacción.
+
+        Args:
+            con (sqlite3.Connection): Conexión con la transacción abierta.
+            usuario (dict): Datos del usuario.
+            estricto (bool): Si es False, las placas que ya son de otro
+                usuario se omiten en lugar de lanzar ValorDuplicado.
+            anterior (dict, optional): Datos guardados del usuario; las
+                placas que ya tenía se tratan como con estricto=False.
+
+        Raises:
+            ValorDuplicado: Si una placa ya es de otro usuario.
+        """
+        conservadas = set(mi.IndicePlacas.placas_de(anterior)) if anterior is not None else set()
+        con.execute("DELETE FROM placas WHERE identificacion = ?", (usuario["identificacion"],))
+        for placa in mi.IndicePlacas.placas_de(usuario):
+            fila = (placa, usuario["identificacion"], usuario.get("correo") or "")
+            if not estricto or placa in conservadas:
+                con.execute("INSERT OR IGNORE INTO placas (placa, identificacion, correo) VALUES (?, ?, ?)", fila)
+                continue
+            try:
+                con.execute("INSERT INTO placas (placa, identificacion, correo) VALUES (?, ?, ?)", fila)
+            except sqlite3.IntegrityError:
+                raise ValorDuplicado("placa", placa) from None
+
+    def _guardar_usuario(self, con, usuario, estricto: bool = True, anterior: dict = None) -> None:
+        """
+        Inserta o reemplaza un usuario y sus placas dentro de una transacción.
+
+        Args:
+            con (sqlite3.Connection): Conexión con la transacción abierta.
+            usuario (dict): Datos del usuario.
+            estricto (bool): Si es False no se verifica que el correo, la
+                tarjeta y las placas sean únicos (datos importados).
+            anterior (dict, optional): Datos guardados del usuario; solo
+                se verifican los valores que cambian, como en AlmacenJSON.
+
+        Raises:
+            ValorDuplicado: Si el correo, la tarjeta o una placa ya es de
+                otro usuario.
+
+        Notas:
+            - Las consultas usan los índices de correo y tarjeta; como las
+              escrituras van en BEGIN IMMEDIATE, nadie más puede insertar
+              el mismo valor entre la consulta y la escritura
+        """
+        for campo in mi.CAMPOS_UNICOS_USUARIO[1:] if estricto else ():
+            valor = mi.valor_usuario(usuario, campo)
+            if anterior is not None and valor == mi.valor_usuario(anterior, campo):
+                continue
+            if valor and con.execute(
+                f"SELECT 1 FROM usuarios WHERE {campo} = ? AND identificacion != ? LIMIT 1",
+                (valor, usuario["identificacion"])
+            ).fetchone():
+                raise ValorDuplicado(campo, valor)
+        con.execute(
+            "INSERT INTO usuarios (identificacion, correo, tarjeta, datos) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(identificacion) DO UPDATE SET correo = excluded.correo, "
+            "tarjeta = excluded.tarjeta, datos = excluded.datos",
+            (usuario["identificacion"], usuario.get("correo"), mi.valor_usuario(usuario, "tarjeta"),
+             json.dumps(usuario, ensure_ascii=False))
+        )
+        self._guardar_placas(con, usuario, estricto, anterior)
+
+    def agregar_usuario(self, usuario: dict) -> None:
+        """
+        Registra un usuario nuevo.
+
+        Raises:
+            ValorDuplicado: Si su identificación, correo, tarjeta o alguna
+                de sus placas ya está registrada.
+        """
+        with self._transaccion() as con:
+            if con.execute("SELECT 1 FROM usuarios WHERE identificacion = ?", (usuario["identificacion"],)).fetchone():
+                raise ValorDuplicado("identificacion", usuario["identificacion"])
+            self._guardar_usuario(con, usuario)
+            self._datos_cambiaron()
+
+    def reemplazar_usuario(self, identificacion: str, usuario: dict) -> bool:
+        """
+        Reemplaza los datos de un usuario. Retorna False si no existe.
+
+        Raises:
+            ValorDuplicado: Si su identificación, correo, tarjeta o alguna
+                de sus placas es de otro usuario.
+        """
+        with self._transaccion() as con:
+            fila = con.execute("SELECT datos FROM usuarios WHERE identificacion = ?", (identificacion,)).fetchone()
+            if not fila:
+                return False
+            if usuario["identificacion"] != identificacion:
+                if con.execute("SELECT 1 FROM usuarios WHERE identificacion = ?", (usuario["identificacion"],)).fetchone():
+                    raise ValorDuplicado("identificacion", usuario["identificacion"])
+                con.execute("DELETE FROM usuarios WHERE identificacion = ?", (identificacion,))
+                con.execute("DELETE FROM placas WHERE identificacion = ?", (identificacion,))
+            self._guardar_usuario(con, usuario, anterior=json.loads(fila[0]))
+            self._datos_cambiaron()
+            return True
+
+    def eliminar_usuario(self, identificacion: str) -> bool:
+        """Elimina un usuario. Retorna False si no existe."""
+        with self._transaccion() as con:
+            con.execute("DELETE FROM placas WHERE identificacion = ?", (identificacion,))
+            cursor = con.execute("DELETE FROM usuarios WHERE identificacion = ?", (identificacion,))
+            if cursor.rowcount == 0:
+                return False
+            self._datos_cambiaron()
+            return True
+
+# ----------------------------
+# Selección del almacén
+# ----------------------------
+def obtener_almacen():
+    """
+    Retorna el almacén configurado para el proceso.
+
+    Returns:
+        AlmacenJSON | AlmacenSQLite: Almacén según PARQUEOS_ALMACEN.
+    """
+    global _almacen
+    with _lock_almacen:
+        if _almacen is None:
+            _almacen = AlmacenSQLite(SQLITE_PATH) if ALMACEN == "sqlite" else AlmacenJSON()
+        return _almacen
+
+def configurar_almacen(almacen) -> None:
+    """
+    Establece el almacén que usarán todos los módulos.
+
+    Args:
+        almacen (AlmacenJSON | AlmacenSQLite): Almacén a usar.
+    """
+    global _almacen
+    with _lock_almacen:
+        _almacen = almacen
+
+# ----------------------------
+# Migración JSON -> SQLite
+# ----------------------------
+def migrar_json_a_sqlite(db_path: str = SQLITE_PATH, origen: AlmacenJSON = None) -> dict:
+    """
+    Importa los datos de los archivos JSON a una base SQLite.
+
+    Args:
+        db_path (str): Ruta de la base de datos destino.
+        origen (AlmacenJSON, optional): Almacén de origen. Por defecto los
+            archivos de data/.
+
+    Returns:
+        dict: Cantidad de registros importados por colección.
+
+    Notas:
+        - Se puede ejecutar más de una vez: los registros con el mismo id
+          se reemplazan y las multas, que no tienen id, se reimportan completas
+        - Los registros sin marcas de tiempo se sellan al importarlos (ver
+          migrar_marcas_de_tiempo): las consultas por rango de SQLite
+          filtran por inicio_ts y fecha_ts, y sin ellas los datos viejos
+          no aparecerían en los historiales ni en los reportes
+    """
+    origen = origen or AlmacenJSON()
+    destino = AlmacenSQLite(db_path)
+
+    def sellados(registros):
+        return [mu.sellar_fechas(dict(r)) if _sin_marcas(r) else r for r in registros]
+
+    espacios = origen.leer_espacios()
+    espacios = dict(zip(espacios, sellados(espacios.values())))
+    alquileres = sellados(origen.leer_alquileres())
+    multas = sellados(origen.leer_multas())
+    usuarios = origen.leer_usuarios()
+
+    with destino._transaccion() as con:
+        con.execute("DELETE FROM multas")
+        for id_espacio, datos in espacios.items():
+            destino._guardar_espacio(con, id_espacio, datos)
+        for alquiler in alquileres:
+            destino._guardar_alquiler(con, alquiler)
+        for usuario in usuarios:
+            # Los datos viejos pueden traer placas repetidas: queda el primer dueño
+            destino._guardar_usuario(con, usuario, estricto=False)
+    destino.agregar_multas(multas)
+    destino.reconstruir_ingresos()
+
+    return {
+        "espacios": len(espacios),
+        "alquileres": len(alquileres),
+        "multas": len(multas),
+        "usuarios": len(usuarios),
+    }
+
+# ----------------------------
+# Migración a marcas de tiempo
+# ----------------------------
+def _sin_marcas(registro: dict) -> bool:
+    """Indica si a un registro le falta alguna marca de tiempo."""
+    return any(campo in registro and campo + "_ts" not in registro for campo in mu.CAMPOS_FECHA)
+
+def migrar_marcas_de_tiempo(almacen=None) -> dict:
+    """
+    Agrega las marcas de tiempo a los registros que no las tienen.
+
+    Args:
+        almacen (AlmacenJSON | AlmacenSQLite, optional): Almacén a migrar.
+            Por defecto el configurado.
+
+    Returns:
+        dict: Cantidad de registros migrados por colección.
+
+    Notas:
+        - Las fechas en texto se conservan para mostrarlas; las marcas
+          ("<campo>_ts", segundos desde la época) son las que se comparan
+        - Se puede ejecutar más de una vez: solo cambia los registros
+          que todavía no tienen marcas
+        - Conviene ejecutarla con la aplicación cerrada, porque las multas
+          se reescriben completas
+    """
+    almacen = almacen or obtener_almacen()
+
+    alquileres = {}
+    for alquiler in almacen.leer_alquileres():
+        if _sin_marcas(alquiler):
+            alquileres[alquiler["id"]] = mu.sellar_fechas(
+                {campo: alquiler[campo] for campo in mu.CAMPOS_FECHA if campo in alquiler})
+    if alquileres:
+        almacen.actualizar_alquileres(alquileres)
+
+    espacios = {id_espacio: mu.sellar_fechas(datos)
+                for id_espacio, datos in almacen.leer_espacios().items() if _sin_marcas(datos)}
+    if espacios:
+        almacen.actualizar_espacios(espacios)
+
+    multas = almacen.leer_multas()
+    migradas = sum(1 for multa in multas if _sin_marcas(multa))
+    if migradas:
+        almacen.guardar_multas([mu.sellar_fechas(multa) for multa in multas])
+
+    return {"alquileres": len(alquileres), "espacios": len(espacios), "multas": migradas}
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--marcas"]:
+        resultado = migrar_marcas_de_tiempo()
+    elif sys.argv[1:2] == ["--ingresos"]:
+        resultado = {"dias": obtener_almacen().reconstruir_ingresos()}
+    else:
+        resultado = migrar_json_a_sqlite(sys.argv[1] if len(sys.argv) > 1 else SQLITE_PATH)
+    print(f"Migración completada: {resultado}")
@@ -0,0 +1,494 @@
+# src/modulo_bitacora.py
+
+"""
+Módulo de bitácora (journal) para colecciones de registros en JSON.
+
+Este módulo permite modificar un registro de una colección grande sin
+reescribir el archivo completo:
+- Las altas y cambios se anexan como líneas JSON (JSON Lines) a una bitácora
+- El estado actual se obtiene del snapshot JSON más la bitácora
+- Un compactador en segundo plano combina la bitácora con el snapshot
+
+Para un snapshot "data/pc_alquileres.json" la bitácora es
+"data/pc_alquileres.jsonl". Cada línea tiene una de estas formas:
+- {"op": "alta", "registro": {...}}
+- {"op": "cambio", "id": "...", "campos": {...}}
+
+Los registros se identifican por su campo "id" y volver a aplicar una
+línea no cambia el resultado, por lo que un corte entre la escritura del
+snapshot y el vaciado de la bitácora no corrompe los datos.
+
+Se pueden registrar índices en memoria sobre una colección (ver
+registrar_indice): se construyen al materializar el estado y se
+actualizan con cada línea aplicada, venga de este proceso o de otro.
+Al compactar, los índices se guardan junto al snapshot (por ejemplo
+"data/pc_alquileres.idx.json") para que un arranque posterior los cargue
+en lugar de reconstruirlos.
+
+Las escrituras y la compactación toman el bloqueo exclusivo del snapshot
+(ver modulo_utiles.bloquear_archivo) y aumentan su versión; las lecturas
+toman el bloqueo compartido, así que varios procesos pueden usar la misma
+colección.
+"""
+
+import json
+import os
+import threading
+import modulo_utiles as mu
+
+# Cantidad de líneas en bitácora a partir de la cual se compacta
+UMBRAL_COMPACTACION = 500
+
+# Estado materializado por snapshot: ruta absoluta -> dict
+_estados = {}
+# Índices registrados: ruta absoluta -> {nombre: fábrica}
+_fabricas_indices = {}
+# Se toma siempre después del bloqueo del archivo, nunca antes
+_lock = threading.RLock()
+_detener_compactador = threading.Event()
+
+def ruta_bitacora(path: str) -> str:
+    """
+    Obtiene la ruta de la bitácora asociada a un snapshot.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+
+    Returns:
+        str: Ruta del archivo JSON Lines de la bitácora.
+    """
+    return path + "l"
+
+def ruta_indices(path: str) -> str:
+    """
+    Obtiene la ruta del archivo donde se guardan los índices de un snapshot.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+
+    Returns:
+        str: Ruta del archivo de índices.
+    """
+    return os.path.splitext(path)[0] + ".idx.json"
+
+def _firma(path: str) -> tuple | None:
+    """
+    Retorna (mtime_ns, tamaño, inodo) de un archivo, o None si no existe.
+
+    Args:
+        path (str): Ruta del archivo.
+    """
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size, info.st_ino)
+
+def _aplicar(estado: dict, entrada: dict) -> None:
+    """
+    Aplica una línea de la bitácora al estado materializado.
+
+    Args:
+        estado (dict): Estado materializado del snapshot.
+        entrada (dict): Línea de la bitácora ya decodificada.
+    """
+    registros = estado["registros"]
+    posiciones = estado["posiciones"]
+    indices = estado["indices"].values()
+
+    if entrada["op"] == "alta":
+        registro = entrada["registro"]
+        posicion = posiciones.get(registro["id"])
+        if posicion is None:
+            anterior = None
+            posiciones[registro["id"]] = len(registros)
+            registros.append(registro)
+        else:
+            anterior = registros[posicion]
+            registros[posicion] = registro
+        for indice in indices:
+            indice.actualizar(anterior, registro)
+    elif entrada["op"] == "cambio":
+        posicion = posiciones.get(entrada["id"])
+        if posicion is not None:
+            anterior = dict(registros[posicion]) if indices else None
+            registros[posicion].update(entrada["campos"])
+            for indice in indices:
+                indice.actualizar(anterior, registros[posicion])
+
+def _materializar(path: str) -> dict:
+    """
+    Obtiene el estado actual de un snapshot aplicando la bitácora.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+
+    Returns:
+        dict: Estado con las llaves registros, posiciones, indices,
+            offset, lineas, firma_snapshot e inodo_bitacora.
+
+    Notas:
+        - Solo se leen las líneas de bitácora nuevas desde la última llamada
+        - Si el snapshot cambió o la bitácora se vació o se reemplazó (por
+          una compactación de otro proceso) el estado se reconstruye desde cero
+        - Una línea incompleta al final (escritura interrumpida) se ignora
+        - Una línea dañada se descarta con una advertencia
+    """
+    clave = os.path.abspath(path)
+    bitacora = ruta_bitacora(path)
+    firma_snapshot = _firma(path)
+    firma_bitacora = _firma(bitacora)
+    tamano_bitacora = firma_bitacora[1] if firma_bitacora else 0
+    inodo_bitacora = firma_bitacora[2] if firma_bitacora else None
+
+    estado = _estados.get(clave)
+    if (estado is None or estado["firma_snapshot"] != firma_snapshot
+            or tamano_bitacora < estado["offset"]
+            or (estado["offset"] and inodo_bitacora != estado["inodo_bitacora"])):
+        registros = mu.leer_json(path)
+        if not isinstance(registros, list):
+            registros = []
+        estado = {
+            "registros": registros,
+            "posiciones": {r["id"]: i for i, r in enumerate(registros) if "id" in r},
+            "indices": {},
+            "offset": 0,
+            "lineas": 0,
+            "firma_snapshot": firma_snapshot,
+            "inodo_bitacora": inodo_bitacora,
+        }
+        _cargar_indices(path, estado)
+        _estados[clave] = estado
+
+    for nombre, fabrica in _fabricas_indices.get(clave, {}).items():
+        if nombre not in estado["indices"]:
+            estado["indices"][nombre] = fabrica(estado["registros"])
+
+    if tamano_bitacora > estado["offset"]:
+        with open(bitacora, "rb") as archivo:
+            archivo.seek(estado["offset"])
+            nuevo = archivo.read()
+        completo = nuevo[:nuevo.rfind(b"\n") + 1]
+        for linea in completo.splitlines():
+            if not linea.strip():
+                continue
+            try:
+                entrada = json.loads(linea)
+            except json.JSONDecodeError:
+                print(f"Advertencia: línea dañada en {bitacora}")
+                continue
+            _aplicar(estado, entrada)
+            estado["lineas"] += 1
+        estado["offset"] += len(completo)
+        estado["inodo_bitacora"] = inodo_bitacora
+
+    return estado
+
+def _cargar_indices(path: str, estado: dict) -> None:
+    """
+    Carga los índices guardados si corresponden al snapshot actual.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        estado (dict): Estado recién reconstruido, sin bitácora aplicada.
+
+    Notas:
+        - Si el snapshot cambió desde que se guardaron, se ignoran y los
+          índices se construyen desde los registros
+    """
+    fabricas = _fabricas_indices.get(os.path.abspath(path), {})
+    if not fabricas or estado["firma_snapshot"] is None:
+        return
+    guardado = mu.leer_json(ruta_indices(path))
+    if not guardado or guardado.get("firma") != list(estado["firma_snapshot"]):
+        return
+    for nombre, datos in guardado.get("indices", {}).items():
+        desde_exportado = getattr(fabricas.get(nombre), "desde_exportado", None)
+        if desde_exportado is not None:
+            estado["indices"][nombre] = desde_exportado(datos)
+
+def _guardar_indices(path: str, estado: dict) -> None:
+    """
+    Guarda los índices exportables junto al snapshot, si no están al día.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        estado (dict): Estado sin líneas de bitácora pendientes.
+    """
+    exportables = {nombre: indice.exportar() for nombre, indice in estado["indices"].items()
+                   if hasattr(indice, "exportar")}
+    if not exportables or estado["firma_snapshot"] is None:
+        return
+    firma = list(estado["firma_snapshot"])
+    guardado = mu.leer_json(ruta_indices(path))
+    if guardado and guardado.get("firma") == firma and set(guardado.get("indices", {})) == set(exportables):
+        return
+    mu.escribir_json(ruta_indices(path), {"firma": firma, "indices": exportables})
+
+def _anexar(path: str, entradas: list) -> None:
+    """
+    Anexa líneas a la bitácora con un único fsync.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        entradas (list): Líneas de bitácora a escribir.
+
+    Notas:
+        - Si la última línea quedó incompleta por un corte, se cierra antes
+          de anexar para no dañar las líneas nuevas
+        - Se llama con el snapshot bloqueado en exclusiva y aumenta su
+          versión para que otros procesos detecten el cambio
+    """
+    texto = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entradas)
+    with open(ruta_bitacora(path), "a+b") as archivo:
+        if archivo.seek(0, os.SEEK_END) > 0:
+            archivo.seek(-1, os.SEEK_END)
+            if archivo.read(1) != b"\n":
+                texto = "\n" + texto
+        archivo.write(texto.encode("utf-8"))
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    mu.incrementar_version_json(path)
+
+# ----------------------------
+# Lectura
+# ----------------------------
+def leer_registros(path: str) -> list:
+    """
+    Lee todos los registros de una colección con bitácora.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+
+    Returns:
+        list: Copia de los registros en orden de inserción.
+    """
+    with mu.bloquear_archivo(path, exclusivo=False), _lock:
+        return [dict(r) for r in _materializar(path)["registros"]]
+
+def buscar_registro(path: str, id_registro: str) -> dict | None:
+    """
+    Busca un registro por su id sin recorrer la colección.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        id_registro (str): Id del registro.
+
+    Returns:
+        dict | None: Copia del registro, o None si no existe.
+    """
+    with mu.bloquear_archivo(path, exclusivo=False), _lock:
+        estado = _materializar(path)
+        posicion = estado["posiciones"].get(id_registro)
+        return dict(estado["registros"][posicion]) if posicion is not None else None
+
+def invalidar_estado(path: str = None) -> None:
+    """
+    Descarta el estado materializado de un snapshot, o de todos.
+
+    Args:
+        path (str, optional): Ruta del snapshot. Si es None se limpia todo.
+
+    Notas:
+        - Necesario si los archivos se borran y se vuelven a crear por
+          fuera del módulo (por ejemplo, en pruebas)
+    """
+    with _lock:
+        if path is None:
+            _estados.clear()
+        else:
+            _estados.pop(os.path.abspath(path), None)
+
+def registrar_indice(path: str, nombre: str, fabrica) -> None:
+    """
+    Registra un índice en memoria sobre una colección con bitácora.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        nombre (str): Nombre del índice, para consultarlo.
+        fabrica (callable): Recibe la lista de registros y retorna el
+            índice. El índice debe tener un método actualizar(anterior,
+            nuevo), que se llama con cada alta o cambio aplicado
+            (anterior es None en un alta). Si además tiene exportar() y la
+            fábrica tiene desde_exportado(datos), el índice se guarda al
+            compactar y se carga en el siguiente arranque.
+
+    Notas:
+        - Registrar dos veces el mismo nombre no reconstruye el índice
+    """
+    clave = os.path.abspath(path)
+    with _lock:
+        _fabricas_indices.setdefault(clave, {}).setdefault(nombre, fabrica)
+
+def buscar_por_indice(path: str, nombre: str, consulta, en_orden: bool = False) -> list:
+    """
+    Consulta un índice registrado y retorna los registros encontrados.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        nombre (str): Nombre con el que se registró el índice.
+        consulta (callable): Recibe el índice y retorna una lista de ids.
+        en_orden (bool): True para retornar los registros en orden de
+            inserción en lugar del orden de los ids.
+
+    Returns:
+        list: Copias de los registros encontrados.
+    """
+    with mu.bloquear_archivo(path, exclusivo=False), _lock:
+        estado = _materializar(path)
+        posiciones = estado["posiciones"]
+        encontradas = [posiciones[i] for i in consulta(estado["indices"][nombre]) if i in posiciones]
+        if en_orden:
+            encontradas.sort()
+        registros = estado["registros"]
+        return [dict(registros[posicion]) for posicion in encontradas]
+
+def registros_pendientes(path: str) -> int:
+    """
+    Cuenta las líneas de bitácora aún no compactadas.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+
+    Returns:
+        int: Cantidad de líneas en la bitácora.
+    """
+    with mu.bloquear_archivo(path, exclusivo=False), _lock:
+        return _materializar(path)["lineas"]
+
+# ----------------------------
+# Escritura
+# ----------------------------
+def agregar_registro(path: str, registro: dict) -> None:
+    """
+    Agrega un registro nuevo anexándolo a la bitácora.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        registro (dict): Registro a agregar. Debe tener un campo "id".
+    """
+    with mu.bloquear_archivo(path), _lock:
+        _anexar(path, [{"op": "alta", "registro": registro}])
+
+def actualizar_registro(path: str, id_registro: str, campos: dict) -> None:
+    """
+    Modifica campos de un registro anexando el cambio a la bitácora.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        id_registro (str): Id del registro a modificar.
+        campos (dict): Campos con sus nuevos valores.
+    """
+    actualizar_registros(path, {id_registro: campos})
+
+def actualizar_registros(path: str, cambios: dict) -> None:
+    """
+    Modifica varios registros con una sola escritura a la bitácora.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        cambios (dict): Diccionario id -> campos a modificar.
+    """
+    if not cambios:
+        return
+    with mu.bloquear_archivo(path), _lock:
+        _anexar(path, [
+            {"op": "cambio", "id": id_registro, "campos": campos}
+            for id_registro, campos in cambios.items()
+        ])
+
+def aplicar_entradas(path: str, entradas: list) -> None:
+    """
+    Anexa líneas de bitácora ya armadas con una sola escritura.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+        entradas (list): Líneas con el formato {"op": "alta", ...} o
+            {"op": "cambio", ...}.
+
+    Notas:
+        - La usan las transacciones de modulo_almacen para aplicar de una
+          vez todos los cambios de alquileres que prepararon
+    """
+    if not entradas:
+        return
+    with mu.bloquear_archivo(path), _lock:
+        _anexar(path, entradas)
+
+# ----------------------------
+# Compactación
+# ----------------------------
+def compactar(path: str) -> int:
+    """
+    Combina la bitácora con el snapshot y vacía la bitácora.
+
+    Args:
+        path (str): Ruta del snapshot JSON.
+
+    Returns:
+        int: Cantidad de líneas de bitácora que se compactaron.
+
+    Notas:
+        - El snapshot se escribe de forma atómica antes de vaciar la bitácora
+        - Si el proceso se interrumpe entre ambos pasos, la bitácora se vuelve
+          a aplicar sobre el snapshot nuevo sin duplicar registros
+        - Otros procesos no pueden anexar mientras se compacta, así que
+          ninguna línea se pierde al vaciar la bitácora
+        - Después guarda los índices registrados junto al snapshot, aunque
+          no haya líneas que compactar, si los guardados no están al día
+    """
+    with mu.bloquear_archivo(path), _lock:
+        estado = _materializar(path)
+        lineas = estado["lineas"]
+        if lineas == 0:
+            _guardar_indices(path, estado)
+            return 0
+
+        # Con el archivo bloqueado, escribir_json escribe de inmediato
+        mu.escribir_json(path, estado["registros"])
+        with open(ruta_bitacora(path), "w", encoding="utf-8") as archivo:
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+        estado["firma_snapshot"] = _firma(path)
+        estado["offset"] = 0
+        estado["lineas"] = 0
+        _guardar_indices(path, estado)
+        return lineas
+
+def iniciar_compactador(paths: list, intervalo: float = 30, umbral: int = UMBRAL_COMPACTACION) -> threading.Thread:
+    """
+    Inicia un hilo que compacta periódicamente las bitácoras.
+
+    Args:
+        paths (list): Rutas de los snapshots a vigilar.
+        intervalo (float): Segundos entre revisiones.
+        umbral (int): Líneas de bitácora a partir de las cuales se compacta.
+
+    Returns:
+        threading.Thread: Hilo del compactador (daemon).
+    """
+    _detener_compactador.clear()
+
+    def ciclo():
+        # Al iniciar se compacta todo y se guardan los índices al día
+        for path in paths:
+            try:
+                compactar(path)
+            except Exception as e:
+                print(f"Error al compactar {path}: {e}")
+        while not _detener_compactador.wait(intervalo):
+            for path in paths:
+                try:
+                    if registros_pendientes(path) >= umbral:
+                        compactar(path)
+                except Exception as e:
+                    print(f"Error al compactar {path}: {e}")
+
+    hilo = threading.Thread(target=ciclo, name="compactador-bitacora", daemon=True)
+    hilo.start()
+    return hilo
+
+def detener_compactador() -> None:
+    """Detiene el hilo compactador iniciado con iniciar_compactador."""
+    _detener_compactador.set()
@@ -0,0 +1,623 @@
+# src/modulo_indices.py
+
+"""
+Índices en memoria sobre las colecciones de alquileres y espacios.
+
+Los índices de alquileres se registran en modulo_bitacora (ver
+registrar_indice) y se mantienen al día con cada alta o cambio de la
+bitácora, de modo que las consultas frecuentes no recorren todo el
+historial:
+- IndiceVencimientos: montículo (min-heap) de alquileres activos ordenado
+  por hora de fin, para encontrar los vencidos sin revisar los demás
+- IndiceActivosPorUsuario: alquileres activos de cada usuario, para
+  encontrar el alquiler activo de alguien sin recorrer el historial
+- IndiceAlquileresPorUsuario: todos los alquileres de cada usuario, para
+  armar su historial sin recorrer el de los demás
+- IndicePorInicio: alquileres ordenados por hora de inicio, para
+  consultar un rango de fechas con búsqueda binaria
+
+Estos índices se pueden exportar a datos JSON (exportar) y volver a
+crear desde ellos (desde_exportado), así modulo_bitacora los guarda junto
+al snapshot y no los reconstruye en cada arranque.
+
+Las multas usan IndicePorFecha, ordenado por su fecha, que mantiene
+AlmacenJSON con cada escritura de multas.
+
+Para los espacios, IndiceEspaciosLibres guarda el conjunto ordenado de
+espacios libres; lo mantiene AlmacenJSON con cada escritura de espacios.
+
+Para los usuarios, AlmacenJSON mantiene con cada escritura de usuarios:
+- IndiceUsuarios: índices hash únicos por identificación, correo y
+  número de tarjeta, para buscar un usuario sin recorrer la colección
+- IndicePlacas: cada placa (normalizada) con la identificación y el
+  correo de su dueño; se guarda junto al archivo de usuarios
+"""
+
+import bisect
+import copy
+import heapq
+import modulo_utiles as mu
+
+def _marca_fin(alquiler: dict) -> int | None:
+    """
+    Obtiene el campo "fin" de un alquiler en segundos desde la época.
+
+    Args:
+        alquiler (dict): Datos del alquiler.
+
+    Returns:
+        int | None: Marca de tiempo, o None si el alquiler no tiene una
+            fecha de fin válida.
+    """
+    return mu.marca(alquiler, "fin")
+
+# ----------------------------
+# Vencimientos
+# ----------------------------
+class IndiceVencimientos:
+    """
+    Montículo de alquileres activos ordenado por hora de fin.
+
+    Cada entrada del montículo es (fin, id). Cuando un alquiler se extiende
+    o se finaliza no se busca su entrada vieja: queda en el montículo y se
+    descarta cuando llega a la cima (eliminación perezosa). El diccionario
+    _fin guarda la hora de fin vigente de cada alquiler activo y sirve para
+    reconocer las entradas viejas.
+
+    Attributes:
+        _monticulo (list): Entradas (fin, id) con la propiedad de heap
+        _fin (dict): Id del alquiler activo -> hora de fin vigente
+    """
+
+    def __init__(self, alquileres: list):
+        self._fin = {}
+        for alquiler in alquileres:
+            if alquiler.get("estado") == "activo":
+                fin = _marca_fin(alquiler)
+                if fin is not None:
+                    self._fin[alquiler["id"]] = fin
+        self._monticulo = [(fin, id_alquiler) for id_alquiler, fin in self._fin.items()]
+        heapq.heapify(self._monticulo)
+
+    @classmethod
+    def desde_exportado(cls, datos: dict) -> "IndiceVencimientos":
+        """Crea el índice desde lo retornado por exportar()."""
+        indice = cls([])
+        indice._fin = dict(datos["fin"])
+        indice._monticulo = [(fin, id_alquiler) for id_alquiler, fin in indice._fin.items()]
+        heapq.heapify(indice._monticulo)
+        return indice
+
+    def exportar(self) -> dict:
+        """Retorna el contenido del índice como datos JSON."""
+        return {"fin": self._fin}
+
+    def actualizar(self, anterior: dict | None, nuevo: dict) -> None:
+        """
+        Refleja el alta o el cambio de un alquiler.
+
+        Args:
+            anterior (dict | None): Datos antes del cambio, None en un alta.
+            nuevo (dict): Datos después del cambio.
+        """
+        id_alquiler = nuevo["id"]
+        if nuevo.get("estado") != "activo":
+            self._fin.pop(id_alquiler, None)
+            return
+        if (anterior is not None and anterior.get("estado") == "activo"
+                and anterior.get("fin") == nuevo.get("fin")
+                and anterior.get("fin_ts") == nuevo.get("fin_ts") and id_alquiler in self._fin):
+            return
+        fin = _marca_fin(nuevo)
+        if fin is None:
+            self._fin.pop(id_alquiler, None)
+            return
+        self._fin[id_alquiler] = fin
+        heapq.heappush(self._monticulo, (fin, id_alquiler))
+
+    def vencidos(self, ahora: float) -> list:
+        """
+        Retorna los ids de los alquileres activos que terminaron antes de ahora.
+
+        Args:
+            ahora (float): Marca de tiempo de referencia.
+
+        Returns:
+            list: Ids ordenados por hora de fin.
+
+        Notas:
+            - Solo se visitan las entradas vencidas: O(k log n) para k
+              vencimientos entre n entradas
+            - Los vencidos vigentes vuelven al montículo; siguen ahí hasta
+              que el alquiler se finalice, así que la consulta se puede
+              repetir si la transacción que los procesa no se confirma
+        """
+        vigentes = []
+        vistos = set()
+        while self._monticulo and self._monticulo[0][0] < ahora:
+            fin, id_alquiler = heapq.heappop(self._monticulo)
+            if self._fin.get(id_alquiler) == fin and id_alquiler not in vistos:
+                vistos.add(id_alquiler)
+                vigentes.append((fin, id_alquiler))
+        for entrada in vigentes:
+            heapq.heappush(self._monticulo, entrada)
+        return [id_alquiler for _, id_alquiler in vigentes]
+
+    def __len__(self) -> int:
+        return len(self._fin)
+
+# ----------------------------
+# Alquileres activos por usuario
+# ----------------------------
+class IndiceActivosPorUsuario:
+    """
+    Alquileres activos agrupados por el correo del usuario.
+
+    Attributes:
+        _por_usuario (dict): Correo -> dict con los ids de sus alquileres
+            activos como llaves, en el orden en que se activaron
+    """
+
+    def __init__(self, alquileres: list):
+        self._por_usuario = {}
+        for alquiler in alquileres:
+            if alquiler.get("estado") == "activo":
+                self._por_usuario.setdefault(alquiler["usuario"], {})[alquiler["id"]] = None
+
+    @classmethod
+    def desde_exportado(cls, datos: dict) -> "IndiceActivosPorUsuario":
+        """Crea el índice desde lo retornado por exportar()."""
+        indice = cls([])
+        indice._por_usuario = {usuario: dict.fromkeys(ids) for usuario, ids in datos.items()}
+        return indice
+
+    def exportar(self) -> dict:
+        """Retorna el contenido del índice como datos JSON."""
+        return {usuario: list(ids) for usuario, ids in self._por_usuario.items()}
+
+    def actualizar(self, anterior: dict | None, nuevo: dict) -> None:
+        """
+        Refleja el alta o el cambio de un alquiler.
+
+        Args:
+            anterior (dict | None): Datos antes del cambio, None en un alta.
+            nuevo (dict): Datos después del cambio.
+        """
+        id_alquiler = nuevo["id"]
+        if anterior is not None and anterior.get("estado") == "activo":
+            ids = self._por_usuario.get(anterior["usuario"], {})
+            if anterior["usuario"] != nuevo["usuario"] or nuevo.get("estado") != "activo":
+                ids.pop(id_alquiler, None)
+                if not ids:
+                    self._por_usuario.pop(anterior["usuario"], None)
+        if nuevo.get("estado") == "activo":
+            self._por_usuario.setdefault(nuevo["usuario"], {}).setdefault(id_alquiler)
+
+    def activos_de(self, usuario: str) -> list:
+        """
+        Retorna los ids de los alquileres activos de un usuario.
+
+        Args:
+            usuario (str): Correo del usuario.
+
+        Returns:
+            list: Ids en el orden en que se activaron.
+        """
+        return list(self._por_usuario.get(usuario, ()))
+
+    def todos(self) -> list:
+        """Retorna los ids de todos los alquileres activos."""
+        return [id_alquiler for ids in self._por_usuario.values() for id_alquiler in ids]
+
+class IndiceAlquileresPorUsuario:
+    """
+    Todos los alquileres (activos o no) agrupados por el correo del usuario.
+
+    Attributes:
+        _por_usuario (dict): Correo -> dict con los ids de sus alquileres
+            como llaves, en orden de registro
+    """
+
+    def __init__(self, alquileres: list):
+        self._por_usuario = {}
+        for alquiler in alquileres:
+            self._por_usuario.setdefault(alquiler["usuario"], {})[alquiler["id"]] = None
+
+    @classmethod
+    def desde_exportado(cls, datos: dict) -> "IndiceAlquileresPorUsuario":
+        """Crea el índice desde lo retornado por exportar()."""
+        indice = cls([])
+        indice._por_usuario = {usuario: dict.fromkeys(ids) for usuario, ids in datos.items()}
+        return indice
+
+    def exportar(self) -> dict:
+        """Retorna el contenido del índice como datos JSON."""
+        return {usuario: list(ids) for usuario, ids in self._por_usuario.items()}
+
+    def actualizar(self, anterior: dict | None, nuevo: dict) -> None:
+        """
+        Refleja el alta o el cambio de un alquiler.
+
+        Args:
+            anterior (dict | None): Datos antes del cambio, None en un alta.
+            nuevo (dict): Datos después del cambio.
+        """
+        id_alquiler = nuevo["id"]
+        if anterior is not None and anterior["usuario"] != nuevo["usuario"]:
+            ids = self._por_usuario.get(anterior["usuario"], {})
+            ids.pop(id_alquiler, None)
+            if not ids:
+                self._por_usuario.pop(anterior["usuario"], None)
+        self._por_usuario.setdefault(nuevo["usuario"], {}).setdefault(id_alquiler)
+
+    def de(self, usuario: str) -> list:
+        """
+        Retorna los ids de los alquileres de un usuario.
+
+        Args:
+            usuario (str): Correo del usuario.
+
+        Returns:
+            list: Ids en orden de registro.
+        """
+        return list(self._por_usuario.get(usuario, ()))
+
+# ----------------------------
+# Orden cronológico
+# ----------------------------
+class IndiceCronologico:
+    """
+    Arreglo ordenado de (marca de tiempo, clave) sobre un campo de fecha.
+
+    Una consulta por rango son dos búsquedas binarias y una porción
+    contigua del arreglo, que ya sale ordenada. La clave es el id del
+    registro, o su posición en la colección si se armó con por_posicion.
+
+    Attributes:
+        CAMPO (str): Campo de fecha de los registros ("inicio", "fecha")
+        _claves (list): Pares (marca, clave) en orden ascendente
+    """
+
+    CAMPO = None
+
+    def __init__(self, registros: list):
+        self._claves = sorted((marca, registro["id"]) for registro in registros
+                              if (marca := mu.marca(registro, self.CAMPO)) is not None)
+
+    @classmethod
+    def por_posicion(cls, registros: list) -> "IndiceCronologico":
+        """Crea el índice usando como clave la posición de cada registro."""
+        indice = cls([])
+        indice._claves = sorted((marca, posicion) for posicion, registro in enumerate(registros)
+                                if (marca := mu.marca(registro, cls.CAMPO)) is not None)
+        return indice
+
+    @classmethod
+    def desde_exportado(cls, datos: dict) -> "IndiceCronologico":
+        """Crea el índice desde lo retornado por exportar()."""
+        indice = cls([])
+        indice._claves = [tuple(par) for par in datos["claves"]]
+        return indice
+
+    def exportar(self) -> dict:
+        """Retorna el contenido del índice como datos JSON."""
+        return {"claves": self._claves}
+
+    def agregar(self, marca: int, clave) -> None:
+        """Agrega una clave en su lugar: O(log n) más el corrimiento."""
+        bisect.insort(self._claves, (marca, clave))
+
+    def quitar(self, marca: int, clave) -> None:
+        """Quita una clave, si está."""
+        i = bisect.bisect_left(self._claves, (marca, clave))
+        if i < len(self._claves) and self._claves[i] == (marca, clave):
+            del self._claves[i]
+
+    def actualizar(self, anterior: dict | None, nuevo: dict) -> None:
+        """
+        Refleja el alta o el cambio de un registro identificado por id.
+
+        Args:
+            anterior (dict | None): Datos antes del cambio, None en un alta.
+            nuevo (dict): Datos después del cambio.
+        """
+        marca_anterior = mu.marca(anterior, self.CAMPO) if anterior is not None else None
+        marca_nueva = mu.marca(nuevo, self.CAMPO)
+        if anterior is not None and marca_anterior == marca_nueva:
+            return
+        if marca_anterior is not None:
+            self.quitar(marca_anterior, nuevo["id"])
+        if marca_nueva is not None:
+            self.agregar(marca_nueva, nuevo["id"])
+
+    def rango(self, desde: int, hasta: int, descendente: bool = False,
+              limite: int = None, despues: tuple = None) -> list:
+        """
+        Retorna las claves con marca en [desde, hasta).
+
+        Args:
+            desde (int): Marca inicial, incluida.
+            hasta (int): Marca final, excluida.
+            descendente (bool): True para las más recientes primero.
+            limite (int): Cantidad máxima de claves, None para todas.
+            despues (tuple): Par (marca, clave) de la última clave ya
+                recibida; la consulta sigue a partir de ella, en el orden
+                pedido. Sirve para recorrer el rango por páginas.
+
+        Returns:
+            list: Claves ordenadas por marca.
+        """
+        inicio = bisect.bisect_left(self._claves, (desde,))
+        fin = bisect.bisect_left(self._claves, (hasta,))
+        if despues is not None:
+            if descendente:
+                fin = min(fin, bisect.bisect_left(self._claves, tuple(despues)))
+            else:
+                inicio = max(inicio, bisect.bisect_right(self._claves, tuple(despues)))
+        if limite is not None:
+            if descendente:
+                inicio = max(inicio, fin - limite)
+            else:
+                fin = min(fin, inicio + limite)
+        claves = [clave for _, clave in self._claves[inicio:fin]]
+        if descendente:
+            claves.reverse()
+        return claves
+
+    def __len__(self) -> int:
+        return len(self._claves)
+
+class IndicePorInicio(IndiceCronologico):
+    """Alquileres ordenados por hora de inicio."""
+    CAMPO = "inicio"
+
+class IndicePorFecha(IndiceCronologico):
+    """Multas ordenadas por fecha."""
+    CAMPO = "fecha"
+
+# ----------------------------
+# Espacios libres
+# ----------------------------
+def _espacio_libre(datos: dict) -> bool:
+    """Un espacio está libre si está habilitado y no tiene usuario."""
+    return datos.get("habilitado") == "S" and datos.get("usuario") == ""
+
+class IndiceEspaciosLibres:
+    """
+    Conjunto ordenado de los ids (enteros) de los espacios libres.
+
+    Attributes:
+        _ordenados (list): Ids libres en orden ascendente
+        _libres (set): Los mismos ids, para saber en O(1) si uno está libre
+    """
+
+    def __init__(self, espacios: dict):
+        self._libres = {int(id_espacio) for id_espacio, datos in espacios.items()
+                        if _espacio_libre(datos)}
+        self._ordenados = sorted(self._libres)
+
+    def actualizar(self, id_espacio, datos: dict) -> None:
+        """
+        Refleja el nuevo estado de un espacio.
+
+        Args:
+            id_espacio (str | int): Id del espacio.
+            datos (dict): Datos del espacio después del cambio.
+
+        Notas:
+            - O(log n) para encontrar la posición más el corrimiento de
+              la lista, que es una copia de memoria contigua
+        """
+        id_espacio = int(id_espacio)
+        libre = _espacio_libre(datos)
+        if libre and id_espacio not in self._libres:
+            self._libres.add(id_espacio)
+            bisect.insort(self._ordenados, id_espacio)
+        elif not libre and id_espacio in self._libres:
+            self._libres.discard(id_espacio)
+            del self._ordenados[bisect.bisect_left(self._ordenados, id_espacio)]
+
+    def primeros(self, limite: int | None = None) -> list:
+        """
+        Retorna los ids libres en orden ascendente.
+
+        Args:
+            limite (int, optional): Cantidad máxima de ids. None para todos.
+        """
+        return self._ordenados[:limite] if limite is not None else list(self._ordenados)
+
+    def __len__(self) -> int:
+        return len(self._ordenados)
+
+    def __contains__(self, id_espacio) -> bool:
+        return int(id_espacio) in self._libres
+
+# ----------------------------
+# Usuarios
+# ----------------------------
+CAMPOS_UNICOS_USUARIO = ("identificacion", "correo", "tarjeta")
+
+def valor_usuario(usuario: dict, campo: str):
+    """
+    Obtiene el valor de un campo buscable de un usuario.
+
+    Args:
+        usuario (dict): Datos del usuario.
+        campo (str): "identificacion", "correo" o "tarjeta".
+
+    Returns:
+        El valor del campo; para "tarjeta" es el número de la tarjeta.
+    """
+    if campo == "tarjeta":
+        return (usuario.get("tarjeta") or {}).get("numero")
+    return usuario.get(campo)
+
+class IndiceUsuarios:
+    """
+    Usuarios por identificación, con índices únicos por correo y tarjeta.
+
+    Guarda una copia de cada usuario, así que buscar no necesita leer el
+    archivo de usuarios. No se exporta: se arma desde los usuarios.
+
+    Attributes:
+        _por_id (dict): Identificación -> datos del usuario
+        _por_campo (dict): "correo" / "tarjeta" -> {valor: identificacion}
+    """
+
+    def __init__(self, usuarios: list):
+        self._por_id = {}
+        self._por_campo = {campo: {} for campo in CAMPOS_UNICOS_USUARIO[1:]}
+        for usuario in usuarios:
+            # Si los datos ya traen duplicados, se conserva el primero
+            if usuario["identificacion"] not in self._por_id:
+                self._por_id[usuario["identificacion"]] = copy.deepcopy(usuario)
+                for campo, valores in self._por_campo.items():
+                    valor = valor_usuario(usuario, campo)
+                    if valor:
+                        valores.setdefault(valor, usuario["identificacion"])
+
+    def buscar(self, campo: str, valor) -> dict | None:
+        """
+        Busca un usuario por "identificacion", "correo" o "tarjeta".
+
+        Returns:
+            dict | None: Copia de los datos del usuario, o None.
+
+        Raises:
+            ValueError: Si el campo no es buscable.
+        """
+        if campo not in CAMPOS_UNICOS_USUARIO:
+            raise ValueError(f"Campo de búsqueda no soportado: {campo}")
+        identificacion = valor if campo == "identificacion" else self._por_campo[campo].get(valor)
+        usuario = self._por_id.get(identificacion)
+        return copy.deepcopy(usuario) if usuario is not None else None
+
+    def duplicados(self, usuario: dict, identificacion: str = None, anterior: dict = None) -> list:
+        """
+        Retorna los campos únicos del usuario que ya usa otro usuario.
+
+        Args:
+            usuario (dict): Datos del usuario a guardar.
+            identificacion (str, optional): Identificación actual del
+                usuario, None si es un usuario nuevo.
+            anterior (dict, optional): Datos guardados del usuario; los
+                valores que no cambian no se verifican, porque en datos
+                anteriores a los índices pueden estar repetidos.
+
+        Returns:
+            list: Pares (campo, valor) repetidos.
+        """
+        duplicados = []
+        if usuario["identificacion"] != identificacion and usuario["identificacion"] in self._por_id:
+            duplicados.append(("identificacion", usuario["identificacion"]))
+        for campo, valores in self._por_campo.items():
+            valor = valor_usuario(usuario, campo)
+            if anterior is not None and valor == valor_usuario(anterior, campo):
+                continue
+            if valor and valores.get(valor, identificacion) not in (identificacion, usuario["identificacion"]):
+                duplicados.append((campo, valor))
+        return duplicados
+
+    def quitar(self, usuario: dict) -> None:
+        """Quita un usuario."""
+        guardado = self._por_id.pop(usuario["identificacion"], None)
+        if guardado is None:
+            return
+        for campo, valores in self._por_campo.items():
+            valor = valor_usuario(guardado, campo)
+            if valores.get(valor) == guardado["identificacion"]:
+                del valores[valor]
+
+    def agregar(self, usuario: dict) -> None:
+        """Agrega un usuario; un valor repetido sigue siendo del primero."""
+        self._por_id[usuario["identificacion"]] = copy.deepcopy(usuario)
+        for campo, valores in self._por_campo.items():
+            valor = valor_usuario(usuario, campo)
+            if valor:
+                valores.setdefault(valor, usuario["identificacion"])
+
+    def __len__(self) -> int:
+        return len(self._por_id)
+
+# ----------------------------
+# Placas
+# ----------------------------
+def normalizar_placa(placa: str) -> str:
+    """
+    Normaliza una placa para compararla: sin espacios y en mayúsculas.
+
+    Args:
+        placa (str): Placa tal como se escribió.
+
+    Returns:
+        str: Placa normalizada.
+    """
+    return "".join(str(placa).split()).upper()
+
+class IndicePlacas:
+    """
+    Placa normalizada -> [identificación, correo] del dueño del vehículo.
+
+    Attributes:
+        _placas (dict): Placa normalizada -> [identificacion, correo]
+    """
+
+    def __init__(self, usuarios: list):
+        self._placas = {}
+        for usuario in usuarios:
+            for placa in self.placas_de(usuario):
+                # Si los datos ya traen duplicados, se conserva el primero
+                self._placas.setdefault(placa, [usuario["identificacion"], usuario.get("correo", "")])
+
+    @classmethod
+    def desde_exportado(cls, datos: dict) -> "IndicePlacas":
+        """Crea el índice desde lo retornado por exportar()."""
+        indice = cls([])
+        indice._placas = {placa: list(dueno) for placa, dueno in datos.items()}
+        return indice
+
+    def exportar(self) -> dict:
+        """Retorna el contenido del índice como datos JSON."""
+        return self._placas
+
+    @staticmethod
+    def placas_de(usuario: dict) -> list:
+        """Retorna las placas normalizadas de los vehículos de un usuario."""
+        return [normalizar_placa(v["placa"]) for v in usuario.get("vehiculos", []) if v.get("placa")]
+
+    def dueno(self, placa: str) -> tuple | None:
+        """
+        Retorna (identificacion, correo) del dueño de una placa, o None.
+
+        Args:
+            placa (str): Placa en cualquier formato.
+        """
+        dueno = self._placas.get(normalizar_placa(placa))
+        return tuple(dueno) if dueno else None
+
+    def duplicadas(self, usuario: dict, identificacion: str = None, anterior: dict = None) -> list:
+        """
+        Retorna las placas del usuario que ya pertenecen a otro usuario.
+
+        Args:
+            usuario (dict): Datos del usuario a guardar.
+            identificacion (str, optional): Identificación actual del
+                usuario, si se está cambiando por la de usuario.
+            anterior (dict, optional): Datos guardados del usuario; las
+                placas que ya tenía no se verifican.
+        """
+        propios = {usuario["identificacion"], identificacion}
+        conservadas = set(self.placas_de(anterior)) if anterior is not None else set()
+        return [placa for placa in self.placas_de(usuario)
+                if placa not in conservadas and placa in self._placas and self._placas[placa][0] not in propios]
+
+    def quitar(self, usuario: dict) -> None:
+        """Quita las placas de un usuario."""
+        for placa in self.placas_de(usuario):
+            if self._placas.get(placa, [None])[0] == usuario["identificacion"]:
+                del self._placas[placa]
+
+    def agregar(self, usuario: dict) -> None:
+        """Agrega las placas de un usuario; una placa repetida sigue siendo del primero."""
+        for placa in self.placas_de(usuario):
+            self._placas.setdefault(placa, [usuario["identificacion"], usuario.get("correo", "")])
@@ -6,20 +6,21 @@ Módulo para la gestión de multas del sistema de parqueos.
 Este módulo maneja todas las operaciones relacionadas con las multas:
 - Registro de nuevas multas
 - Búsqueda de usuarios por placa
-- Generación y envío de reportes PDF
+- Generación y envío de reportes PDF (en memoria, sin archivos en reportes/)
 
-El módulo utiliza archivos JSON para almacenar:
-- Registro de multas (pc_multas.json)
-- Información de usuarios (pc_usuarios.json)
+Las multas y los usuarios se guardan en el almacén configurado
+(ver modulo_almacen), por defecto pc_multas.json y pc_usuarios.json.
 """
 
 from datetime import datetime
-import modulo_utiles as mu
+import io
+import uuid
+import modulo_almacen as ma
 import modulo_reportes as mr
+import modulo_utiles as mu
 
-# Rutas de los archivos de datos
-MULTAS_PATH = "data/pc_multas.json"
-USUARIOS_PATH = "data/pc_usuarios.json"
+# True para conservar en reportes/ una copia del PDF de cada multa
+GUARDAR_PDF_MULTAS = False
 
 def registrar_multa(espacio_id, placa, detalle):
     """
@@ -33,34 +34,43 @@ def registrar_multa(espacio_id, placa, detalle):
     Returns:
         tuple: (multa, enviado) donde:
             - multa (dict): Datos de la multa registrada
-            - enviado (bool): True si se envió el correo, False en caso contrario
+            - enviado (bool): True si el correo quedó en la bandeja de
+              salida, False si la placa no tiene un correo asociado
             
     Proceso:
         1. Crea el registro de la multa con fecha y hora actual
         2. Busca el correo del propietario del vehículo
-        3. Genera un PDF con los detalles de la multa
-        4. Envía el PDF por correo si se encontró el correo del propietario
+        3. Genera en memoria un PDF con los detalles de la multa
+        4. Encola el PDF por correo si se encontró el correo del propietario;
+           el despachador de modulo_utiles lo envía en segundo plano
+           
+    Notas:
+        - El PDF solo se guarda en reportes/ si GUARDAR_PDF_MULTAS es True
     """
     # Crear registro de multa
     ahora = datetime.now()
     multa = {
-        "fecha": ahora.strftime("%d/%m/%Y %H:%M"),
+        "id": str(uuid.uuid4()),
+        "fecha": ahora.strftime(mu.FORMATO_FECHA),
         "espacio": espacio_id,
         "placa": placa,
         "detalle": detalle,
         "correo": obtener_correo_por_placa(placa)
     }
+    mu.sellar_fechas(multa)
 
     # Guardar multa
-    multas = mu.leer_json(MULTAS_PATH)
-    multas.append(multa)
-    mu.escribir_json(MULTAS_PATH, multas)
+    ma.obtener_almacen().agregar_multas([multa])
 
-    # Generar y enviar reporte
-    path_pdf = mr.generar_pdf(multa["correo"] or placa, f"Multa registrada:\n{detalle}")
+    # Generar y encolar reporte, sin pasar por disco
     enviado = False
-    if multa["correo"]:
-        enviado = mr.enviar_reporte_pdf(multa["correo"], path_pdf)
+    if multa["correo"] or GUARDAR_PDF_MULTAS:
+        buffer = io.BytesIO()
+        nombre = mr.generar_pdf(multa["correo"] or placa, f"Multa registrada:\n{detalle}", destino=buffer)
+        if GUARDAR_PDF_MULTAS:
+            mr.guardar_pdf(nombre, buffer.getvalue())
+        if multa["correo"]:
+            enviado = mr.encolar_reporte_pdf(multa["correo"], buffer.getvalue(), nombre) is not None
 
     return multa, enviado
 
@@ -76,11 +86,8 @@ def obtener_correo_por_placa(placa):
         
     Notas:
         - La búsqueda es case-insensitive (no distingue mayúsculas/minúsculas)
-        - Busca en la lista de vehículos de todos los usuarios
+        - Se consulta el índice de placas del almacén, sin recorrer los
+          vehículos de todos los usuarios
     """
-    usuarios = mu.leer_json(USUARIOS_PATH)
-    for u in usuarios:
-        for veh in u.get("vehiculos", []):
-            if veh["placa"].upper() == placa.upper():
-                return u["correo"]
-    return ""
+    dueno = ma.obtener_almacen().buscar_dueno_placa(placa)
+    return dueno["correo"] if dueno else ""
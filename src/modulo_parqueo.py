@@ -10,25 +10,64 @@ Este módulo maneja todas las operaciones relacionadas con los espacios de parqu
 - Verificación de multas
 - Gestión de estados de espacios
 
-El módulo utiliza archivos JSON para almacenar:
-- Información de espacios (pc_espacios.json)
-- Registro de alquileres (pc_alquileres.json)
-- Configuración del sistema (pc_configuracion.json)
+Los espacios, alquileres y multas se guardan en el almacén configurado
+(ver modulo_almacen): archivos JSON por defecto, con los alquileres en
+bitácora, o una base SQLite. La configuración del sistema se lee siempre
+de pc_configuracion.json.
+
+Varias terminales pueden operar sobre los mismos datos. Las operaciones
+que modifican datos se ejecutan en una transacción optimista: si otra
+terminal cambió los datos leídos antes de confirmar, la operación se
+repite desde el principio con los datos nuevos.
 """
 
 from datetime import datetime, timedelta
+import functools
+import random
+import time
 import uuid
 import modulo_utiles as mu
+import modulo_almacen as ma
 
 # Rutas de los archivos de datos
-ESPACIOS_PATH = "data/pc_espacios.json"
-ALQUILERES_PATH = "data/pc_alquileres.json"
 CONFIG_PATH = "data/pc_configuracion.json"
 
+# Intentos ante conflictos con otras terminales y espera base entre ellos
+REINTENTOS_CONFLICTO = 5
+ESPERA_CONFLICTO = 0.01  # segundos
+
+def _reintentar_si_hay_conflicto(funcion):
+    """
+    Repite una operación cuando otra terminal modificó los mismos datos.
+
+    Args:
+        funcion (callable): Operación que confirma sus cambios con
+            almacen.transaccion().
+
+    Returns:
+        callable: Operación que se reintenta ante mu.ConflictoVersion.
+
+    Notas:
+        - Entre intentos se espera un tiempo aleatorio que crece al doble
+          en cada intento, para que dos terminales no vuelvan a chocar
+        - Los correos se envían después de confirmar, así que un intento
+          fallido no notifica nada
+        - Si el último intento también choca, la excepción se propaga
+    """
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        for intento in range(REINTENTOS_CONFLICTO - 1):
+            try:
+                return funcion(*args, **kwargs)
+            except mu.ConflictoVersion:
+                time.sleep(random.uniform(0, ESPERA_CONFLICTO * 2 ** intento))
+        return funcion(*args, **kwargs)
+    return envoltura
+
 # ----------------------------
 # Buscar espacios disponibles
 # ----------------------------
-def obtener_espacios_disponibles() -> list:
+def obtener_espacios_disponibles(limite: int = None) -> list:
     """
     Obtiene la lista de IDs de espacios disponibles para alquilar.
     
@@ -36,16 +75,31 @@ def obtener_espacios_disponibles() -> list:
     - Está habilitado (habilitado = "S")
     - No tiene usuario asignado (usuario = "")
     
+    Args:
+        limite (int, optional): Cantidad máxima de IDs (los menores). None para todos.
+
+    Returns:
+        list: Lista de IDs de espacios disponibles en orden ascendente
+
+    Notas:
+        - Se responde desde un índice de espacios libres que el almacén
+          mantiene al alquilar y liberar, sin recorrer todos los espacios
+    """
+    return ma.obtener_almacen().espacios_libres(limite)
+
+def contar_espacios_disponibles() -> int:
+    """
+    Cuenta los espacios disponibles para alquilar sin recorrerlos.
+
     Returns:
-        list: Lista de IDs de espacios disponibles
+        int: Cantidad de espacios habilitados y sin usuario
     """
-    espacios = mu.leer_json(ESPACIOS_PATH)
-    return [int(id_espacio) for id_espacio, datos in espacios.items() 
-            if datos["habilitado"] == "S" and datos["usuario"] == ""]
+    return ma.obtener_almacen().contar_espacios_libres()
 
 # ----------------------------
 # Alquilar espacio
 # ----------------------------
+@_reintentar_si_hay_conflicto
 def alquilar_espacio(correo_usuario: str, id_espacio: int, minutos: int, placa: str) -> bool:
     """
     Alquila un espacio de parqueo para un usuario.
@@ -64,52 +118,52 @@ def alquilar_espacio(correo_usuario: str, id_espacio: int, minutos: int, placa:
         - El espacio debe estar habilitado y libre
         - El tiempo mínimo debe cumplir con la configuración
     """
-    espacios = mu.leer_json(ESPACIOS_PATH)
-    alquileres = mu.leer_json(ALQUILERES_PATH)
     config = mu.leer_json(CONFIG_PATH)
 
-    # Validar existencia y disponibilidad del espacio
-    id_espacio_str = str(id_espacio)
-    if id_espacio_str not in espacios:
-        return False
-
-    espacio = espacios[id_espacio_str]
-    if espacio["habilitado"] != "S" or espacio["usuario"] != "":
-        return False
-
-    # Validar tiempo mínimo
-    if minutos < config["tiempo_minimo"]:
-        return False
-
-    # Calcular fechas y costo
-    inicio = datetime.now()
-    fin = inicio + timedelta(minutes=minutos)
-    costo = round((minutos / 60) * config["tarifa"], 2)
-
-    # Crear registro de alquiler
-    nuevo = {
-        "id": str(uuid.uuid4()),
-        "espacio_id": id_espacio,
-        "usuario": correo_usuario,
-        "inicio": inicio.strftime("%d/%m/%Y %H:%M"),
-        "fin": fin.strftime("%d/%m/%Y %H:%M"),
-        "estado": "activo",
-        "costo_total": costo,
-        "placa": placa
-    }
-
-    alquileres.append(nuevo)
-    
-    # Actualizar estado del espacio
-    espacio["usuario"] = correo_usuario
-    espacio["placa"] = placa
-    espacio["inicio"] = inicio.strftime("%d/%m/%Y %H:%M")
-    espacio["tiempo"] = minutos
-    espacio["fin"] = fin.strftime("%d/%m/%Y %H:%M")
-
-    # Guardar cambios
-    mu.escribir_json(ALQUILERES_PATH, alquileres)
-    mu.escribir_json(ESPACIOS_PATH, espacios)
+    with ma.obtener_almacen().transaccion() as tx:
+        # Validar existencia y disponibilidad del espacio
+        id_espacio_str = str(id_espacio)
+        espacio = tx.buscar_espacio(id_espacio_str)
+        if espacio is None:
+            return False
+
+        if espacio["habilitado"] != "S" or espacio["usuario"] != "":
+            return False
+
+        # Validar tiempo mínimo
+        if minutos < config["tiempo_minimo"]:
+            return False
+
+        # Calcular fechas y costo
+        inicio = datetime.now()
+        fin = inicio + timedelta(minutes=minutos)
+        costo = round((minutos / 60) * config["tarifa"], 2)
+
+        # Crear registro de alquiler
+        nuevo = {
+            "id": str(uuid.uuid4()),
+            "espacio_id": id_espacio,
+            "usuario": correo_usuario,
+            "inicio": inicio.strftime(mu.FORMATO_FECHA),
+            "fin": fin.strftime(mu.FORMATO_FECHA),
+            "estado": "activo",
+            "costo_total": costo,
+            "placa": placa
+        }
+        mu.sellar_fechas(nuevo)
+
+        # Actualizar estado del espacio
+        espacio["usuario"] = correo_usuario
+        espacio["placa"] = placa
+        espacio["inicio"] = nuevo["inicio"]
+        espacio["tiempo"] = minutos
+        espacio["fin"] = nuevo["fin"]
+        mu.sellar_fechas(espacio)
+
+        # Guardar cambios (alquiler, espacio e ingresos se confirman juntos)
+        tx.agregar_alquiler(nuevo)
+        tx.actualizar_espacios({id_espacio_str: espacio})
+        tx.sumar_ingreso(mu.dia_de_marca(nuevo["inicio_ts"]), id_espacio_str, costo)
 
     # Notificar al usuario
     cuerpo = (
@@ -121,13 +175,14 @@ def alquilar_espacio(correo_usuario: str, id_espacio: int, minutos: int, placa:
         f"Costo total: ₡{costo}\n\n"
         f"Gracias por usar el sistema de parqueos."
     )
-    mu.enviar_correo(destino=correo_usuario, asunto="Confirmación de alquiler", cuerpo=cuerpo)
+    mu.encolar_correo(destino=correo_usuario, asunto="Confirmación de alquiler", cuerpo=cuerpo)
 
     return True
 
 # ----------------------------
 # Agregar tiempo
 # ----------------------------
+@_reintentar_si_hay_conflicto
 def agregar_tiempo_alquiler(id_alquiler: str, minutos_extra: int) -> bool:
     """
     Extiende el tiempo de un alquiler activo.
@@ -143,35 +198,46 @@ def agregar_tiempo_alquiler(id_alquiler: str, minutos_extra: int) -> bool:
         - El alquiler debe existir y estar activo
         - El espacio asociado debe existir
     """
-    alquileres = mu.leer_json(ALQUILERES_PATH)
-    espacios = mu.leer_json(ESPACIOS_PATH)
     config = mu.leer_json(CONFIG_PATH)
 
-    # Buscar alquiler activo
-    alquiler = next((a for a in alquileres if a["id"] == id_alquiler and a["estado"] == "activo"), None)
-    if not alquiler:
-        return False
-
-    # Calcular nuevo tiempo final y costo adicional
-    fin_actual = datetime.strptime(alquiler["fin"], "%d/%m/%Y %H:%M")
-    nuevo_fin = fin_actual + timedelta(minutes=minutos_extra)
-    costo_extra = round((minutos_extra / 60) * config["tarifa"], 2)
-
-    # Actualizar alquiler
-    alquiler["fin"] = nuevo_fin.strftime("%d/%m/%Y %H:%M")
-    alquiler["costo_total"] += costo_extra
-
-    # Actualizar espacio
-    espacio = espacios[str(alquiler["espacio_id"])]
-    espacio["tiempo"] += minutos_extra
-    espacio["fin"] = nuevo_fin.strftime("%d/%m/%Y %H:%M")
-
-    # Guardar cambios
-    mu.escribir_json(ALQUILERES_PATH, alquileres)
-    mu.escribir_json(ESPACIOS_PATH, espacios)
+    with ma.obtener_almacen().transaccion() as tx:
+        # Buscar alquiler activo
+        alquiler = tx.buscar_alquiler(id_alquiler)
+        if not alquiler or alquiler["estado"] != "activo":
+            return False
+
+        espacio_id = str(alquiler["espacio_id"])
+        espacio = tx.buscar_espacio(espacio_id)
+        if espacio is None:
+            return False
+
+        # Calcular nuevo tiempo final y costo adicional
+        fin_actual = datetime.fromtimestamp(mu.marca(alquiler, "fin"))
+        nuevo_fin = fin_actual + timedelta(minutes=minutos_extra)
+        costo_extra = round((minutos_extra / 60) * config["tarifa"], 2)
+
+        # Actualizar alquiler
+        alquiler["fin"] = nuevo_fin.strftime(mu.FORMATO_FECHA)
+        alquiler["costo_total"] += costo_extra
+        mu.sellar_fechas(alquiler)
+
+        # Actualizar espacio
+        espacio["tiempo"] += minutos_extra
+        espacio["fin"] = alquiler["fin"]
+        mu.sellar_fechas(espacio)
+
+        # Guardar cambios (alquiler, espacio e ingresos se confirman juntos);
+        # el costo extra se suma al día en que inició el alquiler
+        tx.actualizar_alquileres({id_alquiler: {
+            "fin": alquiler["fin"],
+            "fin_ts": alquiler["fin_ts"],
+            "costo_total": alquiler["costo_total"]
+        }})
+        tx.actualizar_espacios({espacio_id: espacio})
+        tx.sumar_ingreso(mu.dia_de_marca(alquiler["inicio_ts"]), espacio_id, costo_extra)
 
     # Notificar al usuario
-    mu.enviar_correo(
+    mu.encolar_correo(
         destino=alquiler["usuario"],
         asunto="Tiempo de parqueo extendido",
         cuerpo=(
@@ -186,6 +252,7 @@ def agregar_tiempo_alquiler(id_alquiler: str, minutos_extra: int) -> bool:
 # ----------------------------
 # Desaparcar (liberar)
 # ----------------------------
+@_reintentar_si_hay_conflicto
 def liberar_espacio(id_alquiler: str) -> bool:
     """
     Libera un espacio de parqueo, finalizando el alquiler activo.
@@ -200,32 +267,28 @@ def liberar_espacio(id_alquiler: str) -> bool:
         - El alquiler debe existir y estar activo
         - El espacio asociado debe existir
     """
-    alquileres = mu.leer_json(ALQUILERES_PATH)
-    espacios = mu.leer_json(ESPACIOS_PATH)
-
-    # Buscar alquiler activo
-    alquiler = next((a for a in alquileres if a["id"] == id_alquiler and a["estado"] == "activo"), None)
-    if not alquiler:
-        return False
-
-    espacio_id = str(alquiler["espacio_id"])
-    if espacio_id not in espacios:
-        return False
-
-    # Finalizar alquiler
-    alquiler["estado"] = "finalizado"
-    
-    # Liberar espacio
-    espacio = espacios[espacio_id]
-    espacio["usuario"] = ""
-    espacio["placa"] = ""
-    espacio["inicio"] = ""
-    espacio["tiempo"] = 0
-    espacio["fin"] = ""
-
-    # Guardar cambios
-    mu.escribir_json(ALQUILERES_PATH, alquileres)
-    mu.escribir_json(ESPACIOS_PATH, espacios)
+    with ma.obtener_almacen().transaccion() as tx:
+        # Buscar alquiler activo
+        alquiler = tx.buscar_alquiler(id_alquiler)
+        if not alquiler or alquiler["estado"] != "activo":
+            return False
+
+        espacio_id = str(alquiler["espacio_id"])
+        espacio = tx.buscar_espacio(espacio_id)
+        if espacio is None:
+            return False
+
+        # Liberar espacio
+        espacio["usuario"] = ""
+        espacio["placa"] = ""
+        espacio["inicio"] = ""
+        espacio["tiempo"] = 0
+        espacio["fin"] = ""
+        mu.sellar_fechas(espacio)
+
+        # Guardar cambios (finalizar alquiler y liberar espacio)
+        tx.actualizar_alquileres({id_alquiler: {"estado": "finalizado"}})
+        tx.actualizar_espacios({espacio_id: espacio})
     return True
 
 # ----------------------------
@@ -241,8 +304,7 @@ def obtener_alquiler_activo(correo_usuario: str) -> dict | None:
     Returns:
         dict | None: Diccionario con la información del alquiler activo, o None si no hay alquiler activo
     """
-    alquileres = mu.leer_json(ALQUILERES_PATH)
-    return next((a for a in alquileres if a["usuario"] == correo_usuario and a["estado"] == "activo"), None)
+    return ma.obtener_almacen().alquiler_activo_de(correo_usuario)
 
 def verificar_estado_espacio(id_espacio: int) -> str:
     """
@@ -257,12 +319,10 @@ def verificar_estado_espacio(id_espacio: int) -> str:
             - 'ocupado': Espacio actualmente en uso
             - 'no_existe': Espacio no existe o no está habilitado
     """
-    espacios = mu.leer_json(ESPACIOS_PATH)
-    id_espacio_str = str(id_espacio)
-    if id_espacio_str not in espacios:
+    espacio = ma.obtener_almacen().buscar_espacio(str(id_espacio))
+    if espacio is None:
         return "no_existe"
     
-    espacio = espacios[id_espacio_str]
     if espacio["habilitado"] != "S":
         return "no_existe"
     return "ocupado" if espacio["usuario"] else "libre"
@@ -270,65 +330,99 @@ def verificar_estado_espacio(id_espacio: int) -> str:
 # ----------------------------
 # Verificar multas por tiempo excedido
 # ----------------------------
+@_reintentar_si_hay_conflicto
 def verificar_multas():
     """
     Verifica y procesa multas por tiempo excedido en alquileres activos.
     
     Este método:
-    1. Revisa todos los alquileres activos
-    2. Identifica aquellos que han excedido su tiempo
-    3. Genera multas automáticamente
-    4. Libera los espacios correspondientes
-    5. Notifica a los usuarios afectados
+    1. Obtiene los alquileres activos cuyo tiempo ya terminó
+    2. Los finaliza y genera multas automáticamente
+    3. Libera los espacios correspondientes
+    4. Notifica a los usuarios afectados, con un correo de resumen por
+       usuario (ver resumenes_de_multas)
     
     Las multas se generan cuando:
     - El tiempo actual es mayor al tiempo final del alquiler
     - El alquiler aún está marcado como activo
-    """
-    alquileres = mu.leer_json(ALQUILERES_PATH)
-    espacios = mu.leer_json(ESPACIOS_PATH)
-    multas = mu.leer_json("data/pc_multas.json")
 
+    Los alquileres vencidos se obtienen de un índice ordenado por hora de
+    fin, así que el costo depende de cuántos vencieron y no del historial.
+    Los correos se encolan en la bandeja de salida (ver
+    mu.encolar_correos), así que la revisión no espera al servidor SMTP.
+    """
     ahora = datetime.now()
-    cambios = False
-
-    for alquiler in alquileres:
-        if alquiler["estado"] == "activo":
-            fin = datetime.strptime(alquiler["fin"], "%d/%m/%Y %H:%M")
-            if ahora > fin:
-                # Finalizar alquiler
-                alquiler["estado"] = "finalizado"
-
-                # Liberar espacio
-                espacio_id = str(alquiler["espacio_id"])
-                if espacio_id in espacios:
-                    espacio = espacios[espacio_id]
-                    espacio["usuario"] = ""
-                    espacio["placa"] = ""
-                    espacio["inicio"] = ""
-                    espacio["tiempo"] = 0
-                    espacio["fin"] = ""
-
-                # Generar multa
-                multa = {
-                    "correo": alquiler["usuario"],
-                    "espacio": alquiler["espacio_id"],
-                    "fecha": ahora.strftime("%d/%m/%Y %H:%M"),
-                    "placa": alquiler.get("placa", "N/D"),
-                    "detalle": "Tiempo de parqueo excedido sin desaparcar"
-                }
-                multas.append(multa)
-                cambios = True
-
-                # Notificar al usuario
-                mu.enviar_correo(
-                    destino=alquiler["usuario"],
-                    asunto="Multa por exceder tiempo",
-                    cuerpo=f"Se registró una multa por no desaparcar a tiempo en el espacio {alquiler['espacio_id']}."
-                )
-
-    # Guardar cambios si hubo multas
-    if cambios:
-        mu.escribir_json(ALQUILERES_PATH, alquileres)
-        mu.escribir_json(ESPACIOS_PATH, espacios)
-        mu.escribir_json("data/pc_multas.json", multas)
+    multas = []
+
+    with ma.obtener_almacen().transaccion() as tx:
+        finalizados = {}
+        liberados = {}
+
+        # Solo se revisan los alquileres vencidos (índice por hora de fin)
+        for alquiler in tx.alquileres_vencidos(ahora):
+            # Finalizar alquiler
+            finalizados[alquiler["id"]] = {"estado": "finalizado"}
+
+            # Liberar espacio
+            espacio_id = str(alquiler["espacio_id"])
+            espacio = liberados.get(espacio_id) or tx.buscar_espacio(espacio_id)
+            if espacio is not None:
+                espacio["usuario"] = ""
+                espacio["placa"] = ""
+                espacio["inicio"] = ""
+                espacio["tiempo"] = 0
+                espacio["fin"] = ""
+                mu.sellar_fechas(espacio)
+                liberados[espacio_id] = espacio
+
+            # Generar multa
+            multa = {
+                "id": str(uuid.uuid4()),
+                "correo": alquiler["usuario"],
+                "espacio": alquiler["espacio_id"],
+                "fecha": ahora.strftime(mu.FORMATO_FECHA),
+                "placa": alquiler.get("placa", "N/D"),
+                "detalle": "Tiempo de parqueo excedido sin desaparcar"
+            }
+            mu.sellar_fechas(multa)
+            multas.append(multa)
+
+        # Finalizar alquileres, liberar espacios y registrar multas juntos
+        if finalizados:
+            tx.actualizar_alquileres(finalizados)
+            tx.actualizar_espacios(liberados)
+            tx.agregar_multas(multas)
+
+    # Notificar solo después de confirmar los cambios: un resumen por
+    # usuario y todos los resúmenes encolados en una sola escritura
+    mu.encolar_correos(resumenes_de_multas(multas))
+
+def resumenes_de_multas(multas):
+    """
+    Agrupa las multas por usuario en un correo de resumen para cada uno.
+    
+    Args:
+        multas (list): Multas generadas en una revisión
+        
+    Returns:
+        list: Tuplas (destino, asunto, cuerpo) para mu.encolar_correos, en
+            el orden en que aparece cada usuario
+            
+    Notas:
+        - Un usuario con un solo alquiler vencido recibe el mismo mensaje
+          de siempre; con varios, un solo correo que los lista todos
+    """
+    por_usuario = {}
+    for multa in multas:
+        if multa["correo"]:
+            por_usuario.setdefault(multa["correo"], []).append(multa)
+
+    resumenes = []
+    for correo, propias in por_usuario.items():
+        if len(propias) == 1:
+            cuerpo = f"Se registró una multa por no desaparcar a tiempo en el espacio {propias[0]['espacio']}."
+        else:
+            detalle = "\n".join(f"- Espacio {m['espacio']} (placa {m['placa']}), {m['fecha']}" for m in propias)
+            cuerpo = f"Se registraron {len(propias)} multas por no desaparcar a tiempo:\n{detalle}"
+        resumenes.append((correo, "Multa por exceder tiempo", cuerpo))
+    return resumenes
@@ -4,63 +4,167 @@ Módulo para la generación y envío de reportes en formato PDF.
 Este módulo maneja todas las operaciones relacionadas con reportes:
 - Generación de PDFs con contenido personalizado
 - Envío de reportes por correo electrónico
-- Generación de historiales de uso de espacios
+- Generación de historiales de uso de espacios, uno a uno o en lote
+  con varios procesos (generar_historiales_en_lote, reemitir_multas_en_lote)
 - Formateo de tablas y contenido
+- Reportes administrativos por rango de fechas (generar_reporte)
+- Exportación de reportes a CSV o NDJSON, opcionalmente comprimidos
+- Caché de resultados de reportes, en memoria y en disco
 
 El módulo utiliza la biblioteca ReportLab para la generación de PDFs
-y requiere acceso a los archivos JSON de datos del sistema.
+y obtiene los datos del almacén configurado (ver modulo_almacen).
+ReportLab se importa con el primer PDF (ver contexto_pdf), así que las
+aplicaciones que no imprimen nada no pagan su carga.
 """
 
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 import modulo_utiles as mu
+import modulo_almacen as ma
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
 import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 from datetime import datetime
 
-# Rutas de los archivos de datos
-ALQUILERES_PATH = "data/pc_alquileres.json"
-MULTAS_PATH = "data/pc_multas.json"
-ESPACIOS_PATH = "data/pc_espacios.json"
+# Directorio de salida de los reportes
 REPORTE_DIR = "reportes"
 
-def generar_pdf(destinatario, contenido):
+# Caché de reportes: clave serializada -> filas, del menos al más usado
+CACHE_REPORTES_DIR = os.path.join(REPORTE_DIR, "cache")
+MAX_FILAS_CACHE = 100_000      # filas en memoria entre todos los reportes
+MAX_FILAS_POR_REPORTE = 10_000  # reportes más grandes no se guardan
+MAX_ARCHIVOS_CACHE = 256        # reportes guardados en disco
+_cache_reportes = OrderedDict()
+_estadisticas_cache_reportes = {"memoria": 0, "disco": 0, "fallos": 0}
+_lock_cache_reportes = threading.Lock()
+
+# ----------------------------
+# Contexto de dibujo de PDF
+# ----------------------------
+class _ContextoPDF:
+    """
+    Clases y estilos de ReportLab compartidos por todos los PDFs del proceso.
+
+    Attributes:
+        A4 (tuple): Tamaño de página
+        SimpleDocTemplate, Paragraph, Spacer, Table: Clases de platypus
+        estilos (StyleSheet1): Hoja de estilos de ejemplo de ReportLab
+        estilo_tabla (TableStyle): Estilo de las tablas de historial
+
+    Notas:
+        - Los estilos solo se leen al dibujar, así que pueden compartirse
+          entre reportes y entre hilos
+        - Los PDFs usan las fuentes estándar (Helvetica), cuyas métricas
+          ReportLab guarda al usarlas por primera vez; no hay fuentes que
+          registrar
+    """
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+        self.A4 = A4
+        self.SimpleDocTemplate = SimpleDocTemplate
+        self.Paragraph = Paragraph
+        self.Spacer = Spacer
+        self.Table = Table
+        self.estilos = getSampleStyleSheet()
+        self.estilo_tabla = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),  # Encabezado gris
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),  # Texto blanco en encabezado
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Centrar todo el contenido
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),  # Líneas de la tabla
+            ('FONTSIZE', (0, 0), (-1, -1), 10),  # Tamaño de fuente
+        ])
+
+_contexto_pdf = None
+_lock_contexto_pdf = threading.Lock()
+
+def contexto_pdf() -> _ContextoPDF:
+    """Retorna el contexto de dibujo de PDF, importando ReportLab la primera vez."""
+    global _contexto_pdf
+    if _contexto_pdf is None:
+        with _lock_contexto_pdf:
+            if _contexto_pdf is None:
+                _contexto_pdf = _ContextoPDF()
+    return _contexto_pdf
+
+def generar_pdf(destinatario, contenido, destino=None):
     """
     Genera un PDF con contenido de texto plano.
     
     Args:
         destinatario (str): Identificador del destinatario (usado en el nombre del archivo)
         contenido (str): Contenido del PDF en formato texto plano
+        destino (file, optional): Archivo binario abierto (p. ej. io.BytesIO)
+            donde escribir el PDF en lugar de crear un archivo en REPORTE_DIR
         
     Returns:
-        str: Ruta del archivo PDF generado
+        str: Ruta del archivo PDF generado o, si se pasó destino, el nombre
+            que tendría (útil como nombre del adjunto)
         
     Notas:
-        - El archivo se guarda en el directorio REPORTE_DIR
+        - Sin destino, el archivo se guarda en el directorio REPORTE_DIR
         - El nombre del archivo incluye el destinatario y un timestamp
         - Cada línea del contenido se convierte en un párrafo separado
+        - Con destino no se toca el disco; guardar_pdf guarda después los
+          bytes si hace falta
     """
-    # Crear directorio si no existe
-    if not os.path.exists(REPORTE_DIR):
-        os.makedirs(REPORTE_DIR)
-
     # Generar nombre único para el archivo
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    archivo = f"{REPORTE_DIR}/reporte_{destinatario.replace('@', '_')}_{timestamp}.pdf"
+    nombre = f"reporte_{destinatario.replace('@', '_')}_{timestamp}.pdf"
+
+    if destino is None:
+        # Crear directorio si no existe
+        if not os.path.exists(REPORTE_DIR):
+            os.makedirs(REPORTE_DIR)
+        archivo = f"{REPORTE_DIR}/{nombre}"
+    else:
+        archivo = destino
 
+    _dibujar_texto(contenido, archivo)
+    return nombre if destino is not None else archivo
+
+def _dibujar_texto(contenido, destino):
+    """Dibuja un PDF con un párrafo por línea de texto en destino (ruta o archivo)."""
     # Configurar documento
-    doc = SimpleDocTemplate(archivo, pagesize=A4)
-    styles = getSampleStyleSheet()
+    ctx = contexto_pdf()
+    doc = ctx.SimpleDocTemplate(destino, pagesize=ctx.A4)
     elementos = []
 
     # Convertir cada línea en un párrafo
     for linea in contenido.splitlines():
-        elementos.append(Paragraph(linea, styles['Normal']))
-        elementos.append(Spacer(1, 4))
+        elementos.append(ctx.Paragraph(linea, ctx.estilos['Normal']))
+        elementos.append(ctx.Spacer(1, 4))
 
     # Generar PDF
     doc.build(elementos)
+
+def guardar_pdf(nombre, contenido_pdf):
+    """
+    Guarda en REPORTE_DIR un PDF generado en memoria.
+    
+    Args:
+        nombre (str): Nombre del archivo (ver generar_pdf)
+        contenido_pdf (bytes): Contenido del PDF
+        
+    Returns:
+        str: Ruta del archivo guardado
+    """
+    if not os.path.exists(REPORTE_DIR):
+        os.makedirs(REPORTE_DIR)
+    archivo = f"{REPORTE_DIR}/{nombre}"
+    with open(archivo, "wb") as f:
+        f.write(contenido_pdf)
     return archivo
 
 def enviar_reporte_pdf(destinatario, path_pdf):
@@ -96,6 +200,34 @@ def enviar_reporte_pdf(destinatario, path_pdf):
         print(f"Error al enviar PDF: {e}")
         return False
 
+def encolar_reporte_pdf(destinatario, contenido_pdf, nombre):
+    """
+    Deja un PDF generado en memoria en la bandeja de salida de correos.
+    
+    Args:
+        destinatario (str): Correo electrónico del destinatario
+        contenido_pdf (bytes): Contenido del PDF (ver generar_pdf con destino)
+        nombre (str): Nombre del archivo adjunto
+        
+    Returns:
+        str | None: Id del correo encolado (ver mu.estado_correo), o None
+            si no se pudo escribir la bandeja de salida
+        
+    Notas:
+        - Mismo mensaje que enviar_reporte_pdf, pero retorna sin esperar
+          al servidor SMTP y sin leer el PDF de disco
+    """
+    try:
+        return mu.encolar_correo(
+            destino=destinatario,
+            asunto="Reporte de usuario",
+            cuerpo="Adjunto encontrarás tu reporte solicitado.",
+            adjuntos=[(nombre, contenido_pdf)]
+        )
+    except OSError as e:
+        print(f"Error al encolar PDF: {e}")
+        return None
+
 def generar_historial_espacios_usados(usuario):
     """
     Genera un PDF con el historial de espacios usados por un usuario.
@@ -118,31 +250,35 @@ def generar_historial_espacios_usados(usuario):
         os.makedirs(REPORTE_DIR)
 
     # Obtener alquileres del usuario
-    datos = mu.leer_json(ALQUILERES_PATH)
-    alquileres_usuario = [a for a in datos if a["usuario"] == usuario["correo"]]
+    alquileres_usuario = ma.obtener_almacen().alquileres_de_usuario(usuario["correo"])
 
     if not alquileres_usuario:
         return False, "No hay registros de espacios usados para este usuario."
 
-    # Configurar documento
     archivo_pdf = f"{REPORTE_DIR}/historial_espacios_{usuario['identificacion']}.pdf"
-    doc = SimpleDocTemplate(archivo_pdf, pagesize=A4)
-    styles = getSampleStyleSheet()
+    _escribir_pdf(_dibujar_historial, (usuario, alquileres_usuario), archivo_pdf)
+    return True, archivo_pdf
+
+def _dibujar_historial(usuario, alquileres, destino):
+    """Dibuja el historial de espacios usados de un usuario en destino (ruta o archivo)."""
+    # Configurar documento
+    ctx = contexto_pdf()
+    doc = ctx.SimpleDocTemplate(destino, pagesize=ctx.A4)
     elementos = []
 
     # Agregar encabezado
-    titulo = Paragraph("Historial de Espacios Usados", styles['Heading1'])
-    usuario_info = Paragraph(
+    titulo = ctx.Paragraph("Historial de Espacios Usados", ctx.estilos['Heading1'])
+    usuario_info = ctx.Paragraph(
         f"Usuario: {usuario['nombre']} {usuario['apellidos']}<br/>"
-        f"Correo: {usuario['correo']}", styles['Normal'])
+        f"Correo: {usuario['correo']}", ctx.estilos['Normal'])
 
     elementos.append(titulo)
     elementos.append(usuario_info)
-    elementos.append(Spacer(1, 12))
+    elementos.append(ctx.Spacer(1, 12))
 
     # Crear tabla de datos
     tabla_datos = [["Espacio", "Inicio", "Fin", "Estado", "Costo"]]
-    for a in alquileres_usuario:
+    for a in alquileres:
         fila = [
             a["espacio_id"],
             a["inicio"],
@@ -153,15 +289,641 @@ def generar_historial_espacios_usados(usuario):
         tabla_datos.append(fila)
 
     # Configurar estilo de la tabla
-    tabla = Table(tabla_datos, hAlign='LEFT')
-    tabla.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),  # Encabezado gris
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),  # Texto blanco en encabezado
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Centrar todo el contenido
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),  # Líneas de la tabla
-        ('FONTSIZE', (0, 0), (-1, -1), 10),  # Tamaño de fuente
-    ]))
+    tabla = ctx.Table(tabla_datos, hAlign='LEFT')
+    tabla.setStyle(ctx.estilo_tabla)
 
     elementos.append(tabla)
     doc.build(elementos)
-    return True, archivo_pdf
+
+def _dibujar_aviso_multa(multa, destino):
+    """Dibuja el aviso de una multa en destino (ruta o archivo)."""
+    _dibujar_texto(
+        "Multa registrada:\n"
+        f"Fecha: {multa['fecha']}\n"
+        f"Espacio: {multa['espacio']}\n"
+        f"Placa: {multa['placa']}\n"
+        f"{multa['detalle']}",
+        destino
+    )
+
+# ----------------------------
+# Generación de PDFs en lote
+# ----------------------------
+# Los PDFs se dibujan en procesos aparte (ReportLab es Python puro y no
+# libera el GIL). El proceso principal lee el almacén y manda a cada
+# proceso solo los datos de un PDF; los procesos no abren el almacén.
+PDFS_EN_VUELO_POR_PROCESO = 4  # PDFs enviados por proceso antes de esperar resultados
+
+def _escribir_pdf(dibujar, argumentos, ruta):
+    """
+    Dibuja un PDF en memoria y lo escribe de forma atómica.
+
+    Args:
+        dibujar (callable): Función de dibujo (_dibujar_*), que recibe los
+            argumentos y el archivo de destino.
+        argumentos (tuple): Argumentos de la función de dibujo.
+        ruta (str): Archivo de destino.
+
+    Returns:
+        str: Ruta del archivo escrito.
+
+    Notas:
+        - Se escribe con mu.archivo_atomico, así que un lector nunca ve un
+          PDF a medio escribir y el archivo sobrevive a un corte de energía
+    """
+    buffer = io.BytesIO()
+    dibujar(*argumentos, buffer)
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with mu.archivo_atomico(ruta, "wb") as archivo:
+        archivo.write(buffer.getbuffer())
+    return ruta
+
+def _generar_en_lote(tareas, procesos: int = None, progreso=None) -> dict:
+    """
+    Escribe PDFs repartiendo el dibujo entre varios procesos.
+
+    Args:
+        tareas (iterable): Tuplas (clave, dibujar, argumentos, ruta); se
+            consumen a medida que hay procesos libres.
+        procesos (int): Procesos de trabajo; None para uno por núcleo. Con
+            1 se dibuja en el proceso actual.
+        progreso (callable): Función que recibe la cantidad de PDFs
+            terminados (con o sin error) después de cada uno.
+
+    Returns:
+        dict: Clave -> ruta de cada PDF escrito. Los que fallan se
+            informan con print y se omiten.
+
+    Notas:
+        - Como máximo hay PDFS_EN_VUELO_POR_PROCESO tareas por proceso
+          esperando, así que la memoria no depende del tamaño del lote
+        - Los procesos se crean con "spawn": no heredan los hilos ni los
+          bloqueos del proceso principal
+    """
+    procesos = procesos or os.cpu_count() or 1
+    escritos = {}
+    terminados = 0
+
+    def terminar(clave, resultado):
+        nonlocal terminados
+        try:
+            escritos[clave] = resultado()
+        except Exception as e:
+            print(f"Error al generar el PDF de {clave}: {e}")
+        terminados += 1
+        if progreso:
+            progreso(terminados)
+
+    if procesos == 1:
+        for clave, dibujar, argumentos, ruta in tareas:
+            terminar(clave, lambda: _escribir_pdf(dibujar, argumentos, ruta))
+        return escritos
+
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pendientes = {}
+        for clave, dibujar, argumentos, ruta in tareas:
+            pendientes[pool.submit(_escribir_pdf, dibujar, argumentos, ruta)] = clave
+            if len(pendientes) >= procesos * PDFS_EN_VUELO_POR_PROCESO:
+                listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    terminar(pendientes.pop(futuro), futuro.result)
+        for futuro in as_completed(pendientes):
+            terminar(pendientes[futuro], futuro.result)
+    return escritos
+
+def generar_historiales_en_lote(usuarios: list = None, directorio: str = None,
+                                procesos: int = None, progreso=None) -> dict:
+    """
+    Genera el historial de espacios usados de muchos usuarios a la vez.
+
+    Args:
+        usuarios (list): Usuarios a incluir; None para todos.
+        directorio (str): Carpeta de los PDFs; None para REPORTE_DIR.
+        procesos (int): Procesos de trabajo (ver _generar_en_lote).
+        progreso (callable): Recibe la cantidad de PDFs terminados.
+
+    Returns:
+        dict: Correo -> ruta del PDF. Los usuarios sin alquileres se omiten.
+
+    Notas:
+        - Mismo PDF y nombre de archivo que generar_historial_espacios_usados
+        - Los alquileres de cada usuario se buscan (por índice) recién
+          cuando hay un proceso libre para su PDF, así que en memoria solo
+          están los de los PDFs en vuelo y no el historial completo
+    """
+    almacen = ma.obtener_almacen()
+    usuarios = almacen.leer_usuarios() if usuarios is None else usuarios
+    directorio = directorio or REPORTE_DIR
+
+    def tareas():
+        for usuario in usuarios:
+            alquileres = almacen.alquileres_de_usuario(usuario["correo"])
+            if alquileres:
+                yield (usuario["correo"], _dibujar_historial, (usuario, alquileres),
+                       os.path.join(directorio, f"historial_espacios_{usuario['identificacion']}.pdf"))
+
+    return _generar_en_lote(tareas(), procesos, progreso)
+
+def reemitir_multas_en_lote(fecha_inicio: str, fecha_fin: str, directorio: str = None,
+                            procesos: int = None, progreso=None) -> dict:
+    """
+    Genera el aviso en PDF de las multas de un rango de días.
+
+    Args:
+        fecha_inicio (str): Primer día, "DD/MM/YYYY".
+        fecha_fin (str): Último día (incluido), "DD/MM/YYYY".
+        directorio (str): Carpeta de los PDFs; None para REPORTE_DIR.
+        procesos (int): Procesos de trabajo (ver _generar_en_lote).
+        progreso (callable): Recibe la cantidad de PDFs terminados.
+
+    Returns:
+        dict: Id de la multa -> ruta del PDF ("multa_<id>.pdf").
+
+    Raises:
+        ValueError: Si las fechas no son válidas.
+
+    Notas:
+        - Las multas se recorren por fecha desde el almacén, por páginas,
+          a medida que hay procesos libres, sin copiar el rango completo
+    """
+    desde, hasta = mu.rango_de_marcas(fecha_inicio, fecha_fin)
+    directorio = directorio or REPORTE_DIR
+    tareas = (
+        (multa["id"], _dibujar_aviso_multa, (multa,), os.path.join(directorio, f"multa_{multa['id']}.pdf"))
+        for multa in ma.obtener_almacen().recorrer_multas_por_fecha(desde, hasta)
+    )
+    return _generar_en_lote(tareas, procesos, progreso)
+
+# ----------------------------
+# Motor de reportes
+# ----------------------------
+# Cada reporte es una cadena de generadores: una fuente que recorre el
+# almacén en orden de fecha, etapas de filtro y agrupación, y una
+# proyección a las columnas de la tabla. Las filas se producen a medida
+# que se piden; la memoria depende de la cantidad de grupos, no del
+# tamaño del rango de fechas.
+
+def filtrar(filas, condicion):
+    """
+    Etapa de filtro.
+
+    Args:
+        filas (iterable): Registros de la etapa anterior.
+        condicion (callable): Recibe un registro y retorna True para conservarlo.
+
+    Returns:
+        generator: Registros que cumplen la condición.
+    """
+    return (fila for fila in filas if condicion(fila))
+
+def contar() -> tuple:
+    """Agregado que cuenta los registros del grupo."""
+    return 0, lambda total, fila: total + 1
+
+def sumar(valor) -> tuple:
+    """
+    Agregado que suma un valor de cada registro del grupo.
+
+    Args:
+        valor (callable): Recibe un registro y retorna el número a sumar.
+    """
+    return 0, lambda total, fila: total + valor(fila)
+
+def _acumular(clave_columna: str, clave, grupo, agregados: dict) -> dict:
+    """Aplica los agregados a los registros de un grupo."""
+    totales = {nombre: inicial for nombre, (inicial, _) in agregados.items()}
+    for fila in grupo:
+        for nombre, (_, acumular) in agregados.items():
+            totales[nombre] = acumular(totales[nombre], fila)
+    return {clave_columna: clave, **totales}
+
+def agrupar(filas, columna: str, clave, agregados: dict, ordenadas: bool = False):
+    """
+    Etapa de agrupación con agregados.
+
+    Args:
+        filas (iterable): Registros de la etapa anterior.
+        columna (str): Nombre de la columna con el valor de la clave.
+        clave (callable): Recibe un registro y retorna su grupo.
+        agregados (dict): Columna -> (valor inicial, función (total, registro) -> total),
+            por ejemplo contar() o sumar(...).
+        ordenadas (bool): True si los registros llegan ordenados por
+            clave; cada grupo se entrega apenas termina.
+
+    Yields:
+        dict: Una fila por grupo, ordenadas por clave.
+
+    Notas:
+        - Con ordenadas=False se acumula un total por grupo y las filas
+          salen al terminar la entrada
+    """
+    if ordenadas:
+        for valor, grupo in itertools.groupby(filas, key=clave):
+            yield _acumular(columna, valor, grupo, agregados)
+        return
+
+    grupos = {}
+    for fila in filas:
+        valor = clave(fila)
+        totales = grupos.get(valor)
+        if totales is None:
+            totales = grupos[valor] = {nombre: inicial for nombre, (inicial, _) in agregados.items()}
+        for nombre, (_, acumular) in agregados.items():
+            totales[nombre] = acumular(totales[nombre], fila)
+    for valor in sorted(grupos):
+        yield {columna: valor, **grupos[valor]}
+
+def proyectar(filas, columnas: dict):
+    """
+    Etapa final: convierte cada registro en una fila de la tabla.
+
+    Args:
+        filas (iterable): Registros o grupos de la etapa anterior.
+        columnas (dict): Encabezado -> función que recibe el registro y
+            retorna el valor de la celda.
+
+    Yields:
+        dict: Encabezado -> valor, en el orden de columnas.
+    """
+    for fila in filas:
+        yield {encabezado: valor(fila) for encabezado, valor in columnas.items()}
+
+def _minutos(alquiler: dict) -> int:
+    """Duración de un alquiler en minutos."""
+    inicio, fin = mu.marca(alquiler, "inicio"), mu.marca(alquiler, "fin")
+    return (fin - inicio) // 60 if inicio is not None and fin is not None else 0
+
+def _reporte_ingresos(almacen, desde: int, hasta: int):
+    """
+    Ingresos por día, del acumulado diario del almacén (ver leer_ingresos).
+
+    Notas:
+        - Es la misma fuente que el reporte de ingresos de la ventana de
+          administradores, así que los totales coinciden; no recorre los
+          alquileres del rango
+        - Espacios cuenta los espacios que tuvieron ingresos ese día
+        - Los montos salen siempre como float: SQLite los guarda como REAL
+          y el archivo JSON conserva los enteros tal cual
+    """
+    ingresos = almacen.leer_ingresos(mu.dia_de_marca(desde), mu.dia_de_marca(hasta - 1))
+    return proyectar(sorted(ingresos.items()), {
+        "Día": lambda d: d[0],
+        "Espacios": lambda d: len(d[1]),
+        "Ingresos (₡)": lambda d: float(round(sum(d[1].values()), 2)),
+    })
+
+def _reporte_uso(almacen, desde: int, hasta: int):
+    """Uso por espacio: un grupo por espacio alquilado en el rango."""
+    alquileres = almacen.recorrer_alquileres_por_inicio(desde, hasta)
+    espacios = agrupar(alquileres, "espacio", lambda a: int(a["espacio_id"]), {
+        "usos": contar(),
+        "minutos": sumar(_minutos),
+        "ingresos": sumar(lambda a: a.get("costo_total", 0)),
+    })
+    return proyectar(espacios, {
+        "Espacio": lambda e: e["espacio"],
+        "Usos": lambda e: e["usos"],
+        "Minutos": lambda e: e["minutos"],
+        "Ingresos (₡)": lambda e: round(e["ingresos"], 2),
+    })
+
+def _reporte_multas(almacen, desde: int, hasta: int):
+    """Detalle de multas en orden de fecha."""
+    return proyectar(almacen.recorrer_multas_por_fecha(desde, hasta), {
+        "Fecha": lambda m: m.get("fecha", ""),
+        "Espacio": lambda m: m.get("espacio", ""),
+        "Placa": lambda m: m.get("placa", ""),
+        "Correo": lambda m: m.get("correo", ""),
+        "Detalle": lambda m: m.get("detalle", ""),
+    })
+
+def _reporte_usuarios(almacen, desde: int, hasta: int):
+    """Actividad por usuario: alquileres y multas del rango, con su nombre."""
+    alquileres = agrupar(almacen.recorrer_alquileres_por_inicio(desde, hasta), "correo",
+                         lambda a: a["usuario"], {
+                             "alquileres": contar(),
+                             "gastado": sumar(lambda a: a.get("costo_total", 0)),
+                         })
+    multas = {grupo["correo"]: grupo["multas"] for grupo in agrupar(
+        filtrar(almacen.recorrer_multas_por_fecha(desde, hasta), lambda m: m.get("correo")),
+        "correo", lambda m: m["correo"], {"multas": contar()}
+    )}
+
+    def nombre(correo: str) -> str:
+        usuario = almacen.buscar_usuario("correo", correo)
+        return f"{usuario.get('nombre', '')} {usuario.get('apellidos', '')}".strip() if usuario else ""
+
+    def con_multas(filas):
+        for fila in filas:
+            fila["multas"] = multas.pop(fila["correo"], 0)
+            yield fila
+        # Usuarios con multas pero sin alquileres en el rango
+        for correo in sorted(multas):
+            yield {"correo": correo, "alquileres": 0, "gastado": 0, "multas": multas[correo]}
+
+    return proyectar(con_multas(alquileres), {
+        "Correo": lambda u: u["correo"],
+        "Nombre": lambda u: nombre(u["correo"]),
+        "Alquileres": lambda u: u["alquileres"],
+        "Gastado (₡)": lambda u: round(u["gastado"], 2),
+        "Multas": lambda u: u["multas"],
+    })
+
+# Tipo de reporte (como aparece en la interfaz) -> generador de filas
+REPORTES = {
+    "Ingresos": _reporte_ingresos,
+    "Uso": _reporte_uso,
+    "Multas": _reporte_multas,
+    "Usuarios": _reporte_usuarios,
+}
+
+def generar_reporte(tipo: str, fecha_inicio: str, fecha_fin: str, filtros: dict = None):
+    """
+    Genera un reporte administrativo sobre un rango de días.
+
+    Args:
+        tipo (str): "Ingresos", "Uso", "Multas" o "Usuarios".
+        fecha_inicio (str): Primer día, "DD/MM/YYYY".
+        fecha_fin (str): Último día (incluido), "DD/MM/YYYY".
+        filtros (dict): Columna -> valor; solo se conservan las filas con
+            esos valores.
+
+    Returns:
+        generator: Filas del reporte (encabezado -> valor), producidas a
+            medida que se piden.
+
+    Raises:
+        ValueError: Si el tipo no existe o las fechas no son válidas.
+
+    Notas:
+        - Los datos se leen del almacén mientras se consumen las filas
+        - Si el mismo reporte ya se generó con la misma versión de los
+          datos (ver almacen.version_datos), se responde desde la caché
+    """
+    if tipo not in REPORTES:
+        raise ValueError(f"Tipo de reporte desconocido: {tipo}")
+    desde, hasta = mu.rango_de_marcas(fecha_inicio, fecha_fin)
+    filtros = filtros or {}
+    almacen = ma.obtener_almacen()
+
+    # La versión se lee antes de consultar: una escritura posterior la
+    # aumenta y el resultado guardado deja de usarse
+    clave = json.dumps([_origen(almacen), almacen.version_datos(), tipo, desde, hasta,
+                        sorted(filtros.items())], ensure_ascii=False)
+    guardadas = _buscar_en_cache(clave)
+    if guardadas is not None:
+        return (dict(fila) for fila in guardadas)
+
+    filas = REPORTES[tipo](almacen, desde, hasta)
+    if filtros:
+        filas = filtrar(filas, lambda fila: all(fila.get(c) == v for c, v in filtros.items()))
+    return _guardar_al_terminar(clave, filas)
+
+# ----------------------------
+# Caché de reportes
+# ----------------------------
+def _origen(almacen) -> str:
+    """Identifica los datos de un almacén: su base SQLite o su carpeta de archivos."""
+    return os.path.abspath(getattr(almacen, "db_path", None) or almacen.alquileres_path)
+
+def _ruta_en_disco(clave: str) -> str:
+    """Archivo de la caché en disco para una clave."""
+    return os.path.join(CACHE_REPORTES_DIR, hashlib.sha256(clave.encode("utf-8")).hexdigest() + ".json")
+
+def _buscar_en_cache(clave: str) -> list | None:
+    """
+    Busca un reporte en la caché en memoria y luego en la de disco.
+
+    Args:
+        clave (str): Clave del reporte, con la versión de los datos.
+
+    Returns:
+        list | None: Filas guardadas, o None si no están.
+    """
+    with _lock_cache_reportes:
+        filas = _cache_reportes.get(clave)
+        if filas is not None:
+            _cache_reportes.move_to_end(clave)
+            _estadisticas_cache_reportes["memoria"] += 1
+            return filas
+
+    ruta = _ruta_en_disco(clave)
+    try:
+        with open(ruta, "r", encoding="utf-8") as archivo:
+            guardado = json.load(archivo)
+        os.utime(ruta)
+    except (OSError, json.JSONDecodeError):
+        guardado = None
+    if not guardado or guardado.get("clave") != clave:
+        with _lock_cache_reportes:
+            _estadisticas_cache_reportes["fallos"] += 1
+        return None
+
+    with _lock_cache_reportes:
+        _estadisticas_cache_reportes["disco"] += 1
+    _guardar_en_memoria(clave, guardado["filas"])
+    return guardado["filas"]
+
+def _guardar_en_memoria(clave: str, filas: list) -> None:
+    """Guarda un reporte en memoria, descartando los menos usados si no cabe."""
+    with _lock_cache_reportes:
+        _cache_reportes[clave] = filas
+        _cache_reportes.move_to_end(clave)
+        total = sum(len(guardadas) for guardadas in _cache_reportes.values())
+        while total > MAX_FILAS_CACHE and len(_cache_reportes) > 1:
+            _, descartadas = _cache_reportes.popitem(last=False)
+            total -= len(descartadas)
+
+def _guardar_en_disco(clave: str, filas: list) -> None:
+    """
+    Guarda un reporte en la caché en disco.
+
+    Notas:
+        - Se escribe en un temporal y se renombra, así otro proceso nunca
+          lee un archivo a medias
+        - Si hay más de MAX_ARCHIVOS_CACHE se borran los de uso más antiguo
+        - Un error de disco solo deja el reporte sin guardar
+    """
+    try:
+        os.makedirs(CACHE_REPORTES_DIR, exist_ok=True)
+        fd, temporal = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=CACHE_REPORTES_DIR)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as archivo:
+                json.dump({"clave": clave, "filas": filas}, archivo, ensure_ascii=False)
+            os.replace(temporal, _ruta_en_disco(clave))
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+        archivos = [entrada for entrada in os.scandir(CACHE_REPORTES_DIR)
+                    if entrada.name.endswith(".json")]
+        if len(archivos) > MAX_ARCHIVOS_CACHE:
+            archivos.sort(key=lambda entrada: entrada.stat().st_mtime_ns)
+            for entrada in archivos[:len(archivos) - MAX_ARCHIVOS_CACHE]:
+                os.remove(entrada.path)
+    except OSError as e:
+        print(f"Aviso: no se pudo guardar el reporte en la caché: {e}")
+
+def _guardar_al_terminar(clave: str, filas):
+    """
+    Entrega las filas de un reporte y lo guarda en la caché al terminar.
+
+    Notas:
+        - Si el reporte supera MAX_FILAS_POR_REPORTE deja de copiarse, así
+          un reporte enorme no ocupa memoria extra
+        - Un reporte que no se consume completo no se guarda
+    """
+    guardadas = []
+    for fila in filas:
+        if guardadas is not None:
+            guardadas.append(dict(fila))
+            if len(guardadas) > MAX_FILAS_POR_REPORTE:
+                guardadas = None
+        yield fila
+    if guardadas is not None:
+        _guardar_en_memoria(clave, guardadas)
+        _guardar_en_disco(clave, guardadas)
+
+def invalidar_cache_reportes(disco: bool = False) -> None:
+    """
+    Descarta los reportes guardados en memoria.
+
+    Args:
+        disco (bool): True para borrar también los de disco.
+    """
+    with _lock_cache_reportes:
+        _cache_reportes.clear()
+    if disco and os.path.isdir(CACHE_REPORTES_DIR):
+        for entrada in os.scandir(CACHE_REPORTES_DIR):
+            os.remove(entrada.path)
+
+def estadisticas_cache_reportes() -> dict:
+    """
+    Retorna los contadores de la caché de reportes.
+
+    Returns:
+        dict: Diccionario con:
+            - memoria (int): Reportes respondidos desde memoria
+            - disco (int): Reportes respondidos desde disco
+            - fallos (int): Reportes que se generaron desde el almacén
+            - entradas (int): Reportes en memoria
+    """
+    with _lock_cache_reportes:
+        return {**_estadisticas_cache_reportes, "entradas": len(_cache_reportes)}
+
+def reiniciar_estadisticas_cache_reportes() -> None:
+    """Pone en cero los contadores de la caché de reportes."""
+    with _lock_cache_reportes:
+        for contador in _estadisticas_cache_reportes:
+            _estadisticas_cache_reportes[contador] = 0
+
+# ----------------------------
+# Exportación
+# ----------------------------
+# Filas que se escriben entre dos avisos de progreso
+FILAS_POR_BLOQUE = 1000
+
+def formato_de_ruta(ruta: str) -> tuple:
+    """
+    Deduce el formato de exportación de la extensión de un archivo.
+
+    Args:
+        ruta (str): Ruta del archivo, por ejemplo "ingresos.csv.gz".
+
+    Returns:
+        tuple: (formato, comprimir), con formato "csv" o "ndjson".
+
+    Raises:
+        ValueError: Si la extensión no corresponde a un formato conocido.
+    """
+    base, extension = os.path.splitext(ruta.lower())
+    comprimir = extension == ".gz"
+    if comprimir:
+        extension = os.path.splitext(base)[1]
+    if extension == ".csv":
+        return "csv", comprimir
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson", comprimir
+    raise ValueError(f"Formato de exportación desconocido: {ruta}")
+
+def exportar_por_bloques(filas, ruta: str, formato: str = None, comprimir: bool = None):
+    """
+    Escribe las filas de un reporte en un archivo, por bloques.
+
+    Args:
+        filas (iterable): Filas del reporte (encabezado -> valor).
+        ruta (str): Archivo de destino.
+        formato (str): "csv" o "ndjson"; None para deducirlo de la ruta.
+        comprimir (bool): True para comprimir con gzip; None para deducirlo de la ruta.
+
+    Yields:
+        int: Filas escritas hasta el momento, después de cada bloque de
+            FILAS_POR_BLOQUE.
+
+    Raises:
+        ValueError: Si el formato no es válido.
+
+    Notas:
+        - Solo hay un bloque de filas en memoria a la vez
+        - Se escribe en un temporal que reemplaza al destino al terminar;
+          si la exportación falla o se abandona, el destino no cambia
+    """
+    if formato is None or comprimir is None:
+        formato_ruta, comprimir_ruta = formato_de_ruta(ruta)
+        formato = formato or formato_ruta
+        comprimir = comprimir_ruta if comprimir is None else comprimir
+    if formato not in ("csv", "ndjson"):
+        raise ValueError(f"Formato de exportación desconocido: {formato}")
+
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    fd, temporal = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directorio)
+    os.close(fd)
+    try:
+        abrir = gzip.open if comprimir else open
+        with abrir(temporal, "wt", encoding="utf-8", newline="") as archivo:
+            filas = iter(filas)
+            escritor = None
+            escritas = 0
+            while bloque := list(itertools.islice(filas, FILAS_POR_BLOQUE)):
+                if formato == "csv":
+                    if escritor is None:
+                        escritor = csv.DictWriter(archivo, fieldnames=list(bloque[0].keys()))
+                        escritor.writeheader()
+                    escritor.writerows(bloque)
+                else:
+                    archivo.writelines(json.dumps(fila, ensure_ascii=False) + "\n" for fila in bloque)
+                escritas += len(bloque)
+                yield escritas
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+def exportar_reporte(tipo: str, fecha_inicio: str, fecha_fin: str, ruta: str,
+                     formato: str = None, comprimir: bool = None, progreso=None, filtros: dict = None) -> int:
+    """
+    Genera un reporte y lo exporta a un archivo sin cargarlo completo.
+
+    Args:
+        tipo (str): Tipo de reporte, como en generar_reporte.
+        fecha_inicio (str): Primer día, "DD/MM/YYYY".
+        fecha_fin (str): Último día (incluido), "DD/MM/YYYY".
+        ruta (str): Archivo de destino (.csv, .ndjson, con .gz opcional).
+        formato (str): "csv" o "ndjson"; None para deducirlo de la ruta.
+        comprimir (bool): True para comprimir con gzip; None para deducirlo de la ruta.
+        progreso (callable): Recibe las filas escritas después de cada bloque.
+        filtros (dict): Columna -> valor, como en generar_reporte.
+
+    Returns:
+        int: Cantidad de filas exportadas.
+
+    Raises:
+        ValueError: Si el tipo, las fechas o el formato no son válidos.
+    """
+    escritas = 0
+    filas = generar_reporte(tipo, fecha_inicio, fecha_fin, filtros)
+    for escritas in exportar_por_bloques(filas, ruta, formato, comprimir):
+        if progreso:
+            progreso(escritas)
+    return escritas
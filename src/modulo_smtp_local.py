@@ -0,0 +1,190 @@
+# src/modulo_smtp_local.py
+
+"""
+Servidor SMTP local para pruebas y benchmarks del envío de correos.
+
+Implementa el mínimo de SMTP que usa smtplib (EHLO, AUTH, MAIL, RCPT,
+DATA, NOOP, RSET y QUIT), acepta cualquier clave y guarda los mensajes
+en memoria en lugar de entregarlos. Cuenta las conexiones, los logins y
+los mensajes recibidos, así que permite verificar sin red que el
+transporte reutiliza las conexiones y que la bandeja de salida entrega
+todo lo encolado.
+
+Uso dentro de un proceso:
+    with ServidorSMTPLocal() as servidor:
+        mu.configurar_transporte(mu.TransporteSMTP(*servidor.direccion, tls=False))
+        ...
+
+Uso como proceso aparte, para probar las aplicaciones de escritorio:
+    python src/modulo_smtp_local.py --puerto 2525
+    PARQUEOS_SMTP_SERVIDOR=127.0.0.1 PARQUEOS_SMTP_PUERTO=2525 PARQUEOS_SMTP_TLS=0 \\
+        python src/Usuarios_de_los_parqueos.py
+"""
+
+import argparse
+import socket
+import socketserver
+import threading
+import time
+
+class _SesionSMTP(socketserver.StreamRequestHandler):
+    """Atiende una conexión SMTP."""
+
+    def responder(self, texto: str) -> None:
+        if self.server.demora:
+            time.sleep(self.server.demora)
+        self.wfile.write(texto.encode("ascii") + b"\r\n")
+
+    def leer_datos(self) -> bytes | None:
+        """Lee el mensaje hasta la línea con un punto; None si se corta."""
+        lineas = []
+        while (linea := self.rfile.readline()) != b".\r\n":
+            if not linea:
+                return None
+            lineas.append(linea)
+        return b"".join(lineas)
+
+    def handle(self):
+        servidor = self.server
+        with servidor.lock:
+            servidor.conexiones += 1
+            servidor.sockets.append(self.connection)
+        try:
+            self.responder("220 parqueos ESMTP")
+            while linea := self.rfile.readline():
+                verbo = linea.decode("ascii", "replace").split(" ", 1)[0].strip().upper()
+                if verbo == "EHLO":
+                    self.responder("250-parqueos")
+                    self.responder("250 AUTH PLAIN LOGIN")
+                elif verbo == "AUTH":
+                    with servidor.lock:
+                        servidor.logins += 1
+                    self.responder("235 OK")
+                elif verbo == "DATA":
+                    self.responder("354 Fin con .")
+                    datos = self.leer_datos()
+                    if datos is None:
+                        # El cliente se desconectó antes del punto final
+                        return
+                    servidor._recibir(datos)
+                    self.responder("250 OK")
+                elif verbo == "QUIT":
+                    self.responder("221 Adios")
+                    return
+                else:
+                    self.responder("250 OK")
+        except OSError:
+            # El cliente o cortar_conexiones cerró el socket
+            pass
+        finally:
+            with servidor.lock:
+                servidor.sockets.remove(self.connection)
+
+class ServidorSMTPLocal(socketserver.ThreadingTCPServer):
+    """
+    Servidor SMTP en un hilo del proceso que guarda los mensajes recibidos.
+
+    Attributes:
+        direccion (tuple): (host, puerto) en que escucha
+        demora (float): Segundos que espera antes de cada respuesta, para
+            simular la latencia de un servidor real
+        guardar (bool): True para guardar el contenido de los mensajes;
+            con False solo se cuentan
+        conexiones (int): Conexiones aceptadas
+        logins (int): Autenticaciones recibidas
+        recibidos (int): Mensajes recibidos
+        mensajes (list): Contenido (bytes) de cada mensaje, si guardar
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", puerto: int = 0, demora: float = 0, guardar: bool = True):
+        super().__init__((host, puerto), _SesionSMTP)
+        self.demora = demora
+        self.guardar = guardar
+        self.lock = threading.Lock()
+        self._llegada = threading.Condition(self.lock)
+        self.sockets = []
+        self._hilo = None
+        self.reiniciar_contadores()
+
+    @property
+    def direccion(self) -> tuple:
+        return self.server_address[:2]
+
+    def reiniciar_contadores(self) -> None:
+        """Pone en cero los contadores y descarta los mensajes guardados."""
+        with self.lock:
+            self.conexiones = self.logins = self.recibidos = 0
+            self.mensajes = []
+
+    def _recibir(self, datos: bytes) -> None:
+        with self._llegada:
+            self.recibidos += 1
+            if self.guardar:
+                self.mensajes.append(datos)
+            self._llegada.notify_all()
+
+    def esperar_mensajes(self, cantidad: int, timeout: float = 10) -> bool:
+        """
+        Espera a que lleguen mensajes.
+
+        Args:
+            cantidad (int): Mensajes recibidos (en total) que se esperan.
+            timeout (float): Segundos máximos de espera.
+
+        Returns:
+            bool: True si llegaron, False si venció el tiempo.
+        """
+        with self._llegada:
+            return self._llegada.wait_for(lambda: self.recibidos >= cantidad, timeout)
+
+    def cortar_conexiones(self) -> None:
+        """Cierra del lado del servidor todas las conexiones abiertas."""
+        with self.lock:
+            for conexion in self.sockets:
+                try:
+                    conexion.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def iniciar(self) -> "ServidorSMTPLocal":
+        """Atiende conexiones en un hilo daemon y retorna el servidor."""
+        self._hilo = threading.Thread(target=self.serve_forever, args=(0.05,),
+                                      name="smtp-local", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        """Deja de atender conexiones y libera el puerto."""
+        if self._hilo is not None:
+            self.shutdown()
+            self._hilo.join()
+            self._hilo = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=2525)
+    parser.add_argument("--demora", type=float, default=0, help="segundos antes de cada respuesta")
+    args = parser.parse_args()
+
+    with ServidorSMTPLocal(args.host, args.puerto, args.demora, guardar=False) as servidor:
+        print(f"Servidor SMTP local en {args.host}:{servidor.direccion[1]} (Ctrl+C para salir)")
+        try:
+            while True:
+                time.sleep(5)
+                print(f"{servidor.conexiones} conexiones, {servidor.logins} logins, "
+                      f"{servidor.recibidos} mensajes")
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
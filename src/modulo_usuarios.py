@@ -10,15 +10,14 @@ Este módulo maneja todas las operaciones relacionadas con los usuarios:
 - Gestión de contraseñas
 - Recuperación de acceso
 
-El módulo utiliza un archivo JSON para almacenar la información de usuarios (pc_usuarios.json).
+Los usuarios se guardan en el almacén configurado (ver modulo_almacen),
+por defecto el archivo JSON pc_usuarios.json.
 Las contraseñas se almacenan de forma segura usando bcrypt para el hashing.
 """
 
 import bcrypt
 import modulo_utiles as mu
-
-# Ruta del archivo de usuarios
-USUARIOS_PATH = "data/pc_usuarios.json"
+import modulo_almacen as ma
 
 # ---------------------------
 # Registrar un nuevo usuario
@@ -40,27 +39,32 @@ def registrar_usuario_completo(datos):
         
     Validaciones:
         - La identificación no debe estar registrada
+        - El correo no debe estar registrado
         - El número de tarjeta no debe estar registrado
+        - Las placas de sus vehículos no deben ser de otro usuario
         - La contraseña debe cumplir con los requisitos de seguridad
     """
-    usuarios = mu.leer_json(USUARIOS_PATH)
-
-    # Validar identificación única
-    if any(u["identificacion"] == datos["identificacion"] for u in usuarios):
-        return False
+    almacen = ma.obtener_almacen()
 
-    # Validar tarjeta única
-    if any(u["tarjeta"]["numero"] == datos["tarjeta"]["numero"] for u in usuarios):
-        return False
+    # Validar identificación, correo y tarjeta únicos antes de hashear la
+    # contraseña; son búsquedas en los índices del almacén
+    for campo, valor in (("identificacion", datos["identificacion"]),
+                         ("correo", datos["correo"]),
+                         ("tarjeta", datos["tarjeta"]["numero"])):
+        if almacen.buscar_usuario(campo, valor):
+            return False
 
     # Hashear contraseña y agregar datos adicionales
     datos["contrasena"] = bcrypt.hashpw(datos["contrasena"].encode(), bcrypt.gensalt()).decode()
     datos["fecha_registro"] = mu.fecha_hora_actual()
     datos["rol"] = "usuario"
 
-    # Guardar usuario
-    usuarios.append(datos)
-    mu.escribir_json(USUARIOS_PATH, usuarios)
+    # Guardar usuario; el almacén vuelve a verificar los valores únicos
+    # (y las placas) con el archivo bloqueado
+    try:
+        almacen.agregar_usuario(datos)
+    except ma.ValorDuplicado:
+        return False
     return True
 
 def validar_contrasena(contrasena: str) -> bool:
@@ -102,8 +106,8 @@ def autenticar_usuario(identificacion, contrasena: str) -> dict:
             - mensaje (str): Mensaje descriptivo del resultado
     """
     try:
-        usuarios = mu.leer_json(USUARIOS_PATH)
-        if not usuarios:  # Si la lista está vacía
+        almacen = ma.obtener_almacen()
+        if almacen.contar_usuarios() == 0:
             return {
                 "success": False,
                 "usuario": None,
@@ -111,7 +115,7 @@ def autenticar_usuario(identificacion, contrasena: str) -> dict:
             }
             
         # Buscar usuario por identificación
-        usuario = next((u for u in usuarios if u["identificacion"] == identificacion), None)
+        usuario = almacen.buscar_usuario("identificacion", identificacion)
         
         if not usuario:
             return {
@@ -158,26 +162,27 @@ def actualizar_usuario(identificacion, nuevos_datos):
         - Mantiene la contraseña actual
         - Mantiene la fecha de registro
         - Mantiene el rol del usuario
+        - Falla si alguna placa de sus vehículos es de otro usuario
         - Envía correo de confirmación al usuario
     """
-    usuarios = mu.leer_json(USUARIOS_PATH)
+    almacen = ma.obtener_almacen()
+    u = almacen.buscar_usuario("identificacion", identificacion)
     actualizado = False
 
     # Buscar y actualizar usuario
-    for i, u in enumerate(usuarios):
-        if u["identificacion"] == identificacion:
-            # Mantener datos sensibles
-            nuevos_datos["contrasena"] = u["contrasena"]
-            nuevos_datos["fecha_registro"] = u["fecha_registro"]
-            nuevos_datos["rol"] = u["rol"]
-            usuarios[i] = nuevos_datos
-            actualizado = True
-            break
+    if u:
+        # Mantener datos sensibles
+        nuevos_datos["contrasena"] = u["contrasena"]
+        nuevos_datos["fecha_registro"] = u["fecha_registro"]
+        nuevos_datos["rol"] = u["rol"]
+        try:
+            actualizado = almacen.reemplazar_usuario(identificacion, nuevos_datos)
+        except ma.ValorDuplicado:
+            actualizado = False
 
     if actualizado:
-        # Guardar cambios y notificar
-        mu.escribir_json(USUARIOS_PATH, usuarios)
-        mu.enviar_correo(
+        # Notificar
+        mu.encolar_correo(
             destino=nuevos_datos["correo"],
             asunto="Actualización de perfil",
             cuerpo=f"Hola {nuevos_datos['nombre']}, tus datos han sido actualizados correctamente."
@@ -185,6 +190,24 @@ def actualizar_usuario(identificacion, nuevos_datos):
         return True
     return False
 
+# ---------------------------
+# Placas
+# ---------------------------
+def placa_registrada(placa, identificacion=None):
+    """
+    Indica si una placa ya está registrada por otro usuario.
+
+    Args:
+        placa (str): Placa a verificar
+        identificacion (str, optional): Usuario que la quiere registrar;
+            sus propias placas no cuentan como registradas
+
+    Returns:
+        bool: True si la placa es de otro usuario, False en caso contrario
+    """
+    dueno = ma.obtener_almacen().buscar_dueno_placa(placa)
+    return dueno is not None and dueno["identificacion"] != identificacion
+
 # ---------------------------
 # Eliminar usuario
 # ---------------------------
@@ -198,12 +221,7 @@ def eliminar_usuario(identificacion):
     Returns:
         bool: True si la eliminación fue exitosa, False en caso contrario
     """
-    usuarios = mu.leer_json(USUARIOS_PATH)
-    nuevos = [u for u in usuarios if u["identificacion"] != identificacion]
-    if len(nuevos) < len(usuarios):
-        mu.escribir_json(USUARIOS_PATH, nuevos)
-        return True
-    return False
+    return ma.obtener_almacen().eliminar_usuario(identificacion)
 
 # ---------------------------
 # Consultar usuario
@@ -218,8 +236,7 @@ def consultar_usuario(identificacion):
     Returns:
         dict | None: Datos del usuario si existe, None en caso contrario
     """
-    usuarios = mu.leer_json(USUARIOS_PATH)
-    return next((u for u in usuarios if u["identificacion"] == identificacion), None)
+    return ma.obtener_almacen().buscar_usuario("identificacion", identificacion)
 
 # ---------------------------
 # Enviar recuperación
@@ -238,8 +255,7 @@ def enviar_recordatorio_contrasena(correo):
         - No envía la contraseña actual por seguridad
         - Instruye al usuario a contactar al administrador
     """
-    usuarios = mu.leer_json(USUARIOS_PATH)
-    usuario = next((u for u in usuarios if u["correo"] == correo), None)
+    usuario = ma.obtener_almacen().buscar_usuario("correo", correo)
 
     if usuario:
         mensaje = f"""Hola {usuario['nombre']},
@@ -269,13 +285,16 @@ def actualizar_contrasena(identificacion, nueva):
         - La nueva contraseña se hashea antes de guardar
         - Se elimina el flag de contraseña temporal si existe
     """
-    usuarios = mu.leer_json(USUARIOS_PATH)
-    for u in usuarios:
-        if u["identificacion"] == identificacion:
-            u["contrasena"] = bcrypt.hashpw(nueva.encode(), bcrypt.gensalt()).decode()
-            u.pop("temporal", None)  # Eliminar flag de temporal si existe
-            mu.escribir_json(USUARIOS_PATH, usuarios)
-            return True
+    almacen = ma.obtener_almacen()
+    u = almacen.buscar_usuario("identificacion", identificacion)
+    if u:
+        u["contrasena"] = bcrypt.hashpw(nueva.encode(), bcrypt.gensalt()).decode()
+        u.pop("temporal", None)  # Eliminar flag de temporal si existe
+        try:
+            return almacen.reemplazar_usuario(identificacion, u)
+        except ma.ValorDuplicado:
+            # Datos anteriores a la validación de únicos
+            return False
     return False
 
 # ---------------------------
@@ -295,24 +314,28 @@ def establecer_clave_temporal(correo, nueva_temporal):
     Notas:
         - La contraseña temporal se hashea antes de guardar
         - Se marca como temporal para forzar su cambio
-        - Se envía por correo al usuario
+        - Se envía por correo al usuario, solo si se pudo guardar
     """
-    usuarios = mu.leer_json(USUARIOS_PATH)
-    for u in usuarios:
-        if u["correo"] == correo:
-            # Actualizar contraseña y marcar como temporal
-            u["contrasena"] = bcrypt.hashpw(nueva_temporal.encode(), bcrypt.gensalt()).decode()
-            u["temporal"] = True
-            
-            # Guardar cambios
-            mu.escribir_json(USUARIOS_PATH, usuarios)
+    almacen = ma.obtener_almacen()
+    u = almacen.buscar_usuario("correo", correo)
+    if u:
+        # Actualizar contraseña y marcar como temporal
+        u["contrasena"] = bcrypt.hashpw(nueva_temporal.encode(), bcrypt.gensalt()).decode()
+        u["temporal"] = True
+        
+        # Guardar cambios; sin guardar, la clave enviada no serviría
+        try:
+            if not almacen.reemplazar_usuario(u["identificacion"], u):
+                return False
+        except ma.ValorDuplicado:
+            return False
 
-            # Notificar al usuario
-            cuerpo = (
-                f"Hola {u['nombre']},\n\n"
-                f"Tu nueva contraseña temporal es: {nueva_temporal}\n"
-                "Esta contraseña es de un solo uso. Debes iniciar sesión y cambiarla inmediatamente."
-            )
-            mu.enviar_correo(u["correo"], "Contraseña temporal", cuerpo)
-            return True
+        # Notificar al usuario
+        cuerpo = (
+            f"Hola {u['nombre']},\n\n"
+            f"Tu nueva contraseña temporal es: {nueva_temporal}\n"
+            "Esta contraseña es de un solo uso. Debes iniciar sesión y cambiarla inmediatamente."
+        )
+        mu.enviar_correo(u["correo"], "Contraseña temporal", cuerpo)
+        return True
     return False
\ No newline at end of file
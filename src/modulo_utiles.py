@@ -10,22 +10,81 @@ Este módulo proporciona funciones de utilidad para:
 - Envío de correos electrónicos
 - Actualización automática de estados de parqueo
 
-El módulo utiliza SMTP para el envío de correos y maneja archivos JSON
-para el almacenamiento de datos del sistema.
+El módulo utiliza SMTP para el envío de correos, reutilizando las
+conexiones autenticadas (ver TransporteSMTP). Las notificaciones de las
+aplicaciones pasan por una bandeja de salida en disco (encolar_correo)
+que un hilo despachador envía con reintentos, así que una operación no
+espera al servidor SMTP. Maneja además archivos JSON
+para el almacenamiento de datos del sistema. Las lecturas de JSON pasan
+por una caché de proceso validada con los metadatos del archivo, de modo
+que un archivo sin cambios no se vuelve a parsear. Las escrituras son
+atómicas (archivo temporal, fsync y rename) y pueden agruparse para que
+varias escrituras seguidas al mismo archivo cuesten un solo fsync.
+
+Varios procesos (las tres aplicaciones de escritorio) pueden trabajar
+sobre la misma carpeta data/: cada archivo tiene un archivo de bloqueo
+(fcntl) que además guarda un número de versión, de modo que una escritura
+puede condicionarse a que nadie haya modificado el archivo desde que se
+leyó (compare-and-swap).
 """
 
+import atexit
 import json
+import pickle
 import re
 import smtplib
-from datetime import datetime
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager, ExitStack
+from datetime import date, datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 import os
 
-# Rutas de los archivos de datos
-ESPACIOS_PATH = "data/pc_espacios.json"
-ALQUILERES_PATH = "data/pc_alquileres.json"
+try:
+    import fcntl
+except ImportError:  # Windows: solo se coordinan los hilos del proceso
+    fcntl = None
+
+# Caché de lecturas JSON: ruta absoluta -> (firma del archivo, datos serializados)
+_cache_json = {}
+_estadisticas_cache = {"aciertos": 0, "fallos": 0}
+_lock_cache = threading.Lock()
+
+# Commit grupal: ruta absoluta -> (ruta original, datos serializados)
+_escrituras_pendientes = {}
+_estadisticas_escritura = {"logicas": 0, "fisicas": 0}
+_lock_escritura = threading.Lock()
+_ventana_grupal = None  # segundos; None = cada escritura es física
+_temporizador_grupal = None
+
+# Bloqueos entre procesos: ruta absoluta -> estado del bloqueo del proceso
+_bloqueos = {}
+_lock_bloqueos = threading.Lock()
+ANCHO_VERSION = 20
+
+class ConflictoVersion(Exception):
+    """El archivo cambió en otro proceso después de haberse leído."""
+
+def _firma_archivo(path: str) -> tuple:
+    """
+    Obtiene la firma con la que se valida una entrada de la caché.
+
+    Args:
+        path (str): Ruta del archivo.
+
+    Returns:
+        tuple: (mtime_ns, tamaño, inodo) del archivo.
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe.
+    """
+    info = os.stat(path)
+    return (info.st_mtime_ns, info.st_size, info.st_ino)
 
 def leer_json(path: str) -> dict | list:
     """
@@ -41,13 +100,78 @@ def leer_json(path: str) -> dict | list:
         - Si el archivo no existe, retorna un diccionario vacío para archivos .json
         - Si el archivo no existe, retorna una lista vacía para otros casos
         - Maneja errores de decodificación JSON
+        - Si el archivo no cambió desde la última lectura (mtime, tamaño e
+          inodo iguales) se responde desde la caché sin volver a parsearlo
+        - Cada llamada retorna una copia independiente, así que el llamador
+          puede modificarla sin afectar la caché
+        - Si hay una escritura agrupada pendiente para el archivo, se retorna
+          ese contenido aunque todavía no esté en disco
     """
+    clave = os.path.abspath(path)
+    with _lock_escritura:
+        pendiente = _escrituras_pendientes.get(clave)
+    if pendiente:
+        return pickle.loads(pendiente[1])
+
+    try:
+        firma = _firma_archivo(path)
+    except FileNotFoundError:
+        with _lock_cache:
+            _cache_json.pop(clave, None)
+        return {} if path.endswith('.json') else []
+
+    with _lock_cache:
+        entrada = _cache_json.get(clave)
+        if entrada and entrada[0] == firma:
+            _estadisticas_cache["aciertos"] += 1
+            return pickle.loads(entrada[1])
+        _estadisticas_cache["fallos"] += 1
+
     try:
         with open(path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
+            datos = json.load(file)
+    except FileNotFoundError:
+        return {} if path.endswith('.json') else []
+    except json.JSONDecodeError as e:
+        print(f"Advertencia: archivo JSON corrupto {path}: {e}")
         return {} if path.endswith('.json') else []
 
+    with _lock_cache:
+        _cache_json[clave] = (firma, pickle.dumps(datos, pickle.HIGHEST_PROTOCOL))
+    return datos
+
+def invalidar_cache_json(path: str = None) -> None:
+    """
+    Descarta la entrada de caché de un archivo, o toda la caché.
+
+    Args:
+        path (str, optional): Ruta del archivo. Si es None se limpia todo.
+    """
+    with _lock_cache:
+        if path is None:
+            _cache_json.clear()
+        else:
+            _cache_json.pop(os.path.abspath(path), None)
+
+def estadisticas_cache_json() -> dict:
+    """
+    Retorna los contadores de la caché de lecturas JSON.
+
+    Returns:
+        dict: Diccionario con:
+            - aciertos (int): Lecturas respondidas sin parsear
+            - fallos (int): Lecturas que tuvieron que parsear el archivo
+            - entradas (int): Archivos actualmente en caché
+    """
+    with _lock_cache:
+        return {**_estadisticas_cache, "entradas": len(_cache_json)}
+
+def reiniciar_estadisticas_cache_json() -> None:
+    """Pone en cero los contadores de aciertos y fallos de la caché."""
+    with _lock_cache:
+        _estadisticas_cache["aciertos"] = 0
+        _estadisticas_cache["fallos"] = 0
+
 def escribir_json(path: str, data: dict | list) -> None:
     """
     Escribe datos en un archivo JSON en formato legible.
@@ -60,9 +184,393 @@ def escribir_json(path: str, data: dict | list) -> None:
         - Los datos se escriben con indentación para mejor legibilidad
         - Se usa codificación UTF-8 para soportar caracteres especiales
         - Se desactiva ensure_ascii para permitir caracteres no ASCII
+        - La escritura es atómica: un fallo a la mitad deja el archivo anterior
+        - Con el commit grupal activo, la escritura se difiere y se combina
+          con las demás escrituras al mismo archivo dentro de la ventana,
+          salvo que el hilo tenga el archivo bloqueado con bloquear_archivo:
+          en ese caso se escribe de inmediato para que los demás procesos
+          la vean al liberar el bloqueo
+        - Invalida la entrada de caché del archivo
+    """
+    global _temporizador_grupal
+    with _lock_escritura:
+        _estadisticas_escritura["logicas"] += 1
+        if _ventana_grupal is not None and _bloqueo_propio(path):
+            # La escritura inmediata reemplaza a la que estaba pendiente
+            _escrituras_pendientes.pop(os.path.abspath(path), None)
+        elif _ventana_grupal is not None:
+            _escrituras_pendientes[os.path.abspath(path)] = (
+                path, pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+            )
+            if _temporizador_grupal is None:
+                _temporizador_grupal = threading.Timer(_ventana_grupal, vaciar_escrituras_pendientes)
+                _temporizador_grupal.daemon = True
+                _temporizador_grupal.start()
+            return
+
+    _escribir_atomico(path, data)
+
+@contextmanager
+def archivo_atomico(path: str, modo: str = "w"):
+    """
+    Abre un temporal que, al salir del bloque, reemplaza a path de forma atómica.
+
+    Args:
+        path (str): Archivo de destino.
+        modo (str): "w" para texto (UTF-8) o "wb" para bytes.
+
+    Yields:
+        archivo: Archivo temporal abierto para escribir.
+
+    Notas:
+        - El temporal se crea en el mismo directorio para que el rename sea atómico
+        - Se hace fsync del temporal antes del rename y del directorio
+          después, así el cambio sobrevive a un corte de energía
+        - Se conservan los permisos del archivo original si existía
+        - Si el bloque lanza un error el destino queda intacto
+        - No bloquea el archivo; quien lo necesite usa bloquear_archivo
+    """
+    directorio = os.path.dirname(os.path.abspath(path))
+    fd, temporal = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directorio)
+    try:
+        with os.fdopen(fd, modo, **({} if "b" in modo else {"encoding": "utf-8"})) as archivo:
+            yield archivo
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        try:
+            os.chmod(temporal, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            os.chmod(temporal, 0o644)
+        os.replace(temporal, path)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    _sincronizar_directorio(directorio)
+
+def _escribir_atomico(path: str, data: dict | list) -> None:
+    """
+    Escribe un archivo JSON mediante archivo temporal, fsync y rename.
+
+    Args:
+        path (str): Ruta del archivo JSON.
+        data (dict | list): Datos a escribir.
+
+    Notas:
+        - Se escribe con archivo_atomico
+        - Se hace con el archivo bloqueado y aumenta su versión
+    """
+    with bloquear_archivo(path) as fd_bloqueo:
+        with archivo_atomico(path) as file:
+            json.dump(data, file, indent=4, ensure_ascii=False)
+        _incrementar_version(fd_bloqueo)
+    with _lock_escritura:
+        _estadisticas_escritura["fisicas"] += 1
+    invalidar_cache_json(path)
+
+def _sincronizar_directorio(directorio: str) -> None:
+    """
+    Hace fsync del directorio para persistir un rename (solo en POSIX).
+
+    Args:
+        directorio (str): Ruta del directorio.
+    """
+    if os.name != 'posix':
+        return
+    fd = os.open(directorio, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def activar_commit_grupal(ventana: float = 0.05) -> None:
+    """
+    Activa el commit grupal de escribir_json.
+
+    Args:
+        ventana (float): Segundos que se esperan antes de escribir en disco.
+            Todas las escrituras a un mismo archivo dentro de la ventana se
+            combinan en una sola escritura física (un solo fsync).
+
+    Notas:
+        - Las lecturas de un archivo con escritura pendiente ven los datos nuevos
+        - Al terminar el proceso se vacían las escrituras pendientes
+        - Un corte de energía puede perder como máximo la última ventana
+    """
+    global _ventana_grupal
+    with _lock_escritura:
+        _ventana_grupal = ventana
+
+def desactivar_commit_grupal() -> None:
+    """Desactiva el commit grupal y escribe en disco lo que esté pendiente."""
+    global _ventana_grupal
+    with _lock_escritura:
+        _ventana_grupal = None
+    vaciar_escrituras_pendientes()
+
+def vaciar_escrituras_pendientes() -> None:
+    """
+    Escribe en disco todas las escrituras agrupadas pendientes.
+
+    Notas:
+        - Cada archivo se escribe una sola vez con su último contenido
+        - Es seguro llamarla aunque no haya nada pendiente
+        - Pueden correr varios vaciados a la vez (el temporizador y
+          desactivar_commit_grupal o atexit): cada entrada se vuelve a
+          comprobar con el archivo bloqueado y se omite si otro vaciado
+          ya la escribió o si hay una más nueva, para que un contenido
+          viejo nunca pise a uno nuevo
+    """
+    global _temporizador_grupal
+    with _lock_escritura:
+        pendientes = list(_escrituras_pendientes.items())
+        if _temporizador_grupal is not None:
+            _temporizador_grupal.cancel()
+            _temporizador_grupal = None
+
+    for clave, entrada in pendientes:
+        path, datos = entrada
+        with bloquear_archivo(path):
+            with _lock_escritura:
+                if _escrituras_pendientes.get(clave) is not entrada:
+                    continue
+            _escribir_atomico(path, pickle.loads(datos))
+            with _lock_escritura:
+                # Solo se descarta si nadie volvió a escribir durante el vaciado
+                if _escrituras_pendientes.get(clave) is entrada:
+                    del _escrituras_pendientes[clave]
+
+atexit.register(vaciar_escrituras_pendientes)
+
+def estadisticas_escritura_json() -> dict:
+    """
+    Retorna los contadores de escritura de archivos JSON.
+
+    Returns:
+        dict: Diccionario con:
+            - logicas (int): Llamadas a escribir_json
+            - fisicas (int): Escrituras reales en disco (una por fsync)
+            - pendientes (int): Archivos esperando el commit grupal
+    """
+    with _lock_escritura:
+        return {**_estadisticas_escritura, "pendientes": len(_escrituras_pendientes)}
+
+# ----------------------------
+# Bloqueo entre procesos y versiones
+# ----------------------------
+def ruta_bloqueo(path: str) -> str:
+    """
+    Obtiene la ruta del archivo de bloqueo (y versión) de un archivo.
+
+    Args:
+        path (str): Ruta del archivo de datos.
+
+    Returns:
+        str: Ruta del archivo de bloqueo.
+    """
+    return path + ".lock"
+
+def _flock(fd: int, exclusivo: bool) -> None:
+    """Toma el bloqueo fcntl del descriptor, si la plataforma lo permite."""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+
+def _bloqueo_propio(path: str) -> bool:
+    """Indica si el hilo actual tiene bloqueado el archivo en exclusiva."""
+    bloqueo = _bloqueos.get(os.path.abspath(path))
+    return bloqueo is not None and bloqueo["escritor"] == threading.get_ident()
+
+def _soltar_flock(bloqueo: dict) -> None:
+    """Cierra el descriptor del bloqueo, lo que libera el flock."""
+    os.close(bloqueo["fd"])
+    bloqueo["fd"] = None
+
+@contextmanager
+def bloquear_archivo(path: str, exclusivo: bool = True):
+    """
+    Bloquea un archivo frente a otros procesos e hilos.
+
+    Args:
+        path (str): Ruta del archivo de datos.
+        exclusivo (bool): True para escribir, False para un bloqueo
+            compartido de lectura.
+
+    Yields:
+        int: Descriptor del archivo de bloqueo.
+
+    Notas:
+        - Usa flock sobre ruta_bloqueo(path); es un bloqueo consultivo, así
+          que solo coordina a quienes también lo usan
+        - Varios lectores con bloqueo compartido no se esperan entre sí,
+          sean hilos de un mismo proceso o procesos distintos: los hilos
+          comparten un descriptor con el flock compartido y solo el
+          bloqueo exclusivo los excluye
+        - Es reentrante dentro del mismo hilo. Un bloqueo compartido dentro
+          de uno exclusivo no hace nada; pedir uno exclusivo dentro de uno
+          compartido suelta la lectura mientras se espera a los demás
+          lectores y la retoma al terminar, así que conviene evitarlo
+    """
+    clave = os.path.abspath(path)
+    with _lock_bloqueos:
+        bloqueo = _bloqueos.setdefault(clave, {
+            "condicion": threading.Condition(), "fd": None,
+            "lectores": {}, "escritor": None, "nivel_escritor": 0,
+        })
+    condicion, lectores = bloqueo["condicion"], bloqueo["lectores"]
+    hilo = threading.get_ident()
+
+    with condicion:
+        if bloqueo["escritor"] == hilo:
+            bloqueo["nivel_escritor"] += 1
+            escritor, propias = True, None
+        elif not exclusivo:
+            escritor = False
+            if hilo not in lectores:
+                condicion.wait_for(lambda: bloqueo["escritor"] is None)
+                if bloqueo["fd"] is None:
+                    bloqueo["fd"] = os.open(ruta_bloqueo(path), os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        _flock(bloqueo["fd"], False)
+                    except BaseException:
+                        _soltar_flock(bloqueo)
+                        raise
+            lectores[hilo] = lectores.get(hilo, 0) + 1
+        else:
+            # Si el hilo ya leía, deja de contar como lector para no
+            # esperarse a sí mismo (ni a otro hilo que también se convierte)
+            escritor, propias = True, lectores.pop(hilo, 0)
+            condicion.wait_for(lambda: bloqueo["escritor"] is None and not lectores)
+            try:
+                if bloqueo["fd"] is None:
+                    bloqueo["fd"] = os.open(ruta_bloqueo(path), os.O_RDWR | os.O_CREAT, 0o644)
+                _flock(bloqueo["fd"], True)
+            except BaseException:
+                if propias:
+                    lectores[hilo] = propias
+                elif bloqueo["fd"] is not None:
+                    _soltar_flock(bloqueo)
+                condicion.notify_all()
+                raise
+            bloqueo["escritor"], bloqueo["nivel_escritor"] = hilo, 1
+        fd = bloqueo["fd"]
+
+    try:
+        yield fd
+    finally:
+        with condicion:
+            if escritor:
+                bloqueo["nivel_escritor"] -= 1
+                if bloqueo["nivel_escritor"] == 0:
+                    bloqueo["escritor"] = None
+                    if propias:
+                        # Vuelve a la lectura que tenía antes de convertirse
+                        _flock(bloqueo["fd"], False)
+                        lectores[hilo] = propias
+                    else:
+                        _soltar_flock(bloqueo)
+                    condicion.notify_all()
+            else:
+                lectores[hilo] -= 1
+                if not lectores[hilo]:
+                    del lectores[hilo]
+                    if not lectores:
+                        _soltar_flock(bloqueo)
+                        condicion.notify_all()
+
+@contextmanager
+def bloquear_archivos(paths: list):
+    """
+    Bloquea en exclusiva varios archivos siempre en el mismo orden.
+
+    Args:
+        paths (list): Rutas de los archivos de datos.
+
+    Notas:
+        - Se bloquean ordenados por ruta absoluta para que dos procesos
+          que bloquean conjuntos parecidos no se esperen mutuamente
+    """
+    with ExitStack() as pila:
+        for path in sorted(set(paths), key=os.path.abspath):
+            pila.enter_context(bloquear_archivo(path))
+        yield
+
+def _leer_version(fd: int) -> int:
+    """Lee la versión guardada en un archivo de bloqueo (0 si está vacío)."""
+    os.lseek(fd, 0, os.SEEK_SET)
+    datos = os.read(fd, ANCHO_VERSION)
+    return int(datos) if datos.strip() else 0
+
+def _incrementar_version(fd: int) -> int:
+    """Aumenta en uno la versión de un archivo de bloqueo y la retorna."""
+    version = _leer_version(fd) + 1
+    os.lseek(fd, 0, os.SEEK_SET)
+    os.write(fd, str(version).zfill(ANCHO_VERSION).encode("ascii"))
+    return version
+
+def version_json(path: str) -> int:
+    """
+    Retorna la versión actual de un archivo.
+
+    Args:
+        path (str): Ruta del archivo de datos.
+
+    Returns:
+        int: Versión; aumenta con cada escritura física del archivo.
+    """
+    with bloquear_archivo(path, exclusivo=False) as fd:
+        return _leer_version(fd)
+
+def incrementar_version_json(path: str) -> int:
+    """
+    Marca un archivo como modificado sin reescribirlo.
+
+    Args:
+        path (str): Ruta del archivo de datos.
+
+    Returns:
+        int: Versión nueva.
+
+    Notas:
+        - La usa modulo_bitacora al anexar a la bitácora de un snapshot
+    """
+    with bloquear_archivo(path) as fd:
+        return _incrementar_version(fd)
+
+def leer_json_versionado(path: str) -> tuple:
     """
-    with open(path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
+    Lee un archivo JSON junto con su versión.
+
+    Args:
+        path (str): Ruta del archivo JSON.
+
+    Returns:
+        tuple: (datos, version). La versión sirve para escribir_json_versionado.
+    """
+    with bloquear_archivo(path, exclusivo=False) as fd:
+        return leer_json(path), _leer_version(fd)
+
+def escribir_json_versionado(path: str, data: dict | list, version: int) -> int:
+    """
+    Escribe un archivo JSON solo si nadie lo modificó desde que se leyó.
+
+    Args:
+        path (str): Ruta del archivo JSON.
+        data (dict | list): Datos a escribir.
+        version (int): Versión obtenida con leer_json_versionado.
+
+    Returns:
+        int: Versión nueva del archivo.
+
+    Raises:
+        ConflictoVersion: Si el archivo cambió; hay que volver a leerlo,
+            reaplicar el cambio y reintentar.
+    """
+    with bloquear_archivo(path) as fd:
+        actual = _leer_version(fd)
+        if actual != version:
+            raise ConflictoVersion(f"{path}: se leyó la versión {version} y la actual es {actual}")
+        escribir_json(path, data)
+        return _leer_version(fd)
 
 def validar_correo(correo: str) -> bool:
     """
@@ -127,7 +635,373 @@ def fecha_hora_actual() -> str:
         str: Fecha y hora en formato "DD/MM/YYYY HH:MM"
     """
     ahora = datetime.now()
-    return ahora.strftime('%d/%m/%Y %H:%M')
+    return ahora.strftime(FORMATO_FECHA)
+
+# ----------------------------
+# Marcas de tiempo
+# ----------------------------
+# Formato de las fechas que se muestran y se guardan como texto
+FORMATO_FECHA = "%d/%m/%Y %H:%M"
+
+# Campos de fecha de alquileres, espacios y multas; cada uno se guarda
+# también como marca de tiempo en "<campo>_ts"
+CAMPOS_FECHA = ("inicio", "fin", "fecha")
+
+def marca_de_tiempo(fecha: str) -> int | None:
+    """
+    Convierte una fecha "DD/MM/YYYY HH:MM" a segundos desde la época.
+
+    Args:
+        fecha (str): Fecha en el formato del sistema.
+
+    Returns:
+        int | None: Marca de tiempo en hora local, o None si la fecha está
+            vacía o no es válida.
+    """
+    try:
+        return int(datetime.strptime(fecha, FORMATO_FECHA).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+def formatear_marca(marca: int | None) -> str:
+    """
+    Convierte una marca de tiempo al texto "DD/MM/YYYY HH:MM".
+
+    Args:
+        marca (int | None): Segundos desde la época.
+
+    Returns:
+        str: Fecha para mostrar, o cadena vacía si no hay marca.
+    """
+    return datetime.fromtimestamp(marca).strftime(FORMATO_FECHA) if marca is not None else ""
+
+def marca(registro: dict, campo: str) -> int | None:
+    """
+    Obtiene un campo de fecha de un registro como marca de tiempo.
+
+    Args:
+        registro (dict): Alquiler, espacio o multa.
+        campo (str): "inicio", "fin" o "fecha".
+
+    Returns:
+        int | None: Valor de "<campo>_ts"; si el registro no lo tiene
+            (datos sin migrar) se convierte el texto.
+
+    Notas:
+        - Con los datos migrados no se llama a strptime: comparar y
+          filtrar fechas son operaciones con enteros
+    """
+    valor = registro.get(campo + "_ts")
+    if isinstance(valor, int):
+        return valor
+    return marca_de_tiempo(registro.get(campo))
+
+def dia_de_marca(marca: int) -> str:
+    """
+    Retorna el día (hora local) de una marca de tiempo como "YYYY-MM-DD".
+
+    Args:
+        marca (int): Segundos desde la época.
+
+    Returns:
+        str: Día en formato ISO, que sí se ordena cronológicamente.
+    """
+    return date.fromtimestamp(marca).isoformat()
+
+def rango_de_marcas(desde: str, hasta: str) -> tuple:
+    """
+    Convierte un rango de días "DD/MM/YYYY" a marcas de tiempo.
+
+    Args:
+        desde (str): Primer día del rango.
+        hasta (str): Último día del rango (incluido).
+
+    Returns:
+        tuple: (inicio, fin) para filtrar con inicio <= marca < fin.
+
+    Raises:
+        ValueError: Si alguna fecha no tiene el formato DD/MM/YYYY.
+    """
+    inicio = datetime.strptime(desde, "%d/%m/%Y")
+    fin = datetime.strptime(hasta, "%d/%m/%Y") + timedelta(days=1)
+    return int(inicio.timestamp()), int(fin.timestamp())
+
+def sellar_fechas(registro: dict) -> dict:
+    """
+    Agrega a un registro las marcas de tiempo de sus campos de fecha.
+
+    Args:
+        registro (dict): Registro o cambios de un registro; solo se sellan
+            los campos de fecha presentes.
+
+    Returns:
+        dict: El mismo registro, modificado.
+    """
+    for campo in CAMPOS_FECHA:
+        if campo in registro:
+            registro[campo + "_ts"] = marca_de_tiempo(registro[campo])
+    return registro
+
+# ----------------------------
+# Correo
+# ----------------------------
+# Se configuran con variables de entorno, p. ej. para usar el servidor de
+# prueba de modulo_smtp_local. La clave (para Gmail, una clave de
+# aplicación) no tiene valor por defecto: sin ella no se hace login
+SMTP_SERVIDOR = os.environ.get("PARQUEOS_SMTP_SERVIDOR", 'smtp.gmail.com')
+SMTP_PUERTO = int(os.environ.get("PARQUEOS_SMTP_PUERTO", 587))
+SMTP_REMITENTE = os.environ.get("PARQUEOS_SMTP_REMITENTE", 'santivillarley1010@gmail.com')
+SMTP_CLAVE = os.environ.get("PARQUEOS_SMTP_CLAVE") or None
+SMTP_TLS = os.environ.get("PARQUEOS_SMTP_TLS", "1") != "0"
+
+class TransporteSMTP:
+    """
+    Conexiones SMTP autenticadas que se reutilizan entre correos.
+
+    Abrir una conexión cuesta varios viajes al servidor (conexión TCP,
+    STARTTLS y login); el transporte guarda las conexiones ya
+    autenticadas y las reutiliza. Si una conexión guardada se cerró del
+    lado del servidor, se abre otra y se reintenta el envío una vez.
+
+    Dentro de "with transporte.sesion():" todos los envíos del hilo usan la
+    misma conexión, útil para mandar un lote de correos seguidos.
+
+    Attributes:
+        servidor (str): Host del servidor SMTP
+        puerto (int): Puerto del servidor SMTP
+        remitente (str): Dirección que envía los correos
+        clave (str | None): Clave para el login; None para no autenticar
+        tls (bool): True para usar STARTTLS
+        max_conexiones (int): Conexiones libres que se guardan
+        inactividad (float): Segundos tras los que una conexión libre se
+            descarta en lugar de reutilizarla
+        conexiones_abiertas (int): Conexiones abiertas desde el inicio
+    """
+
+    def __init__(self, servidor: str = SMTP_SERVIDOR, puerto: int = SMTP_PUERTO,
+                 remitente: str = SMTP_REMITENTE, clave: str | None = SMTP_CLAVE, tls: bool = SMTP_TLS,
+                 max_conexiones: int = 2, inactividad: float = 60, timeout: float = 30):
+        self.servidor = servidor
+        self.puerto = puerto
+        self.remitente = remitente
+        self.clave = clave
+        self.tls = tls
+        self.max_conexiones = max_conexiones
+        self.inactividad = inactividad
+        self.timeout = timeout
+        self.conexiones_abiertas = 0
+        self._libres = []  # (momento en que se liberó, conexión)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _abrir(self) -> smtplib.SMTP:
+        """Abre una conexión nueva y la autentica."""
+        conexion = smtplib.SMTP(self.servidor, self.puerto, timeout=self.timeout)
+        try:
+            if self.tls:
+                conexion.starttls()
+            if self.clave:
+                conexion.login(self.remitente, self.clave)
+        except BaseException:
+            conexion.close()
+            raise
+        with self._lock:
+            self.conexiones_abiertas += 1
+        return conexion
+
+    @staticmethod
+    def _cerrar(conexion: smtplib.SMTP) -> None:
+        """Cierra una conexión sin lanzar errores."""
+        try:
+            conexion.quit()
+        except OSError:
+            conexion.close()
+
+    def _tomar(self) -> smtplib.SMTP:
+        """Retorna una conexión libre reciente, o abre una nueva."""
+        ahora = time.monotonic()
+        vencidas = []
+        conexion = None
+        with self._lock:
+            while self._libres:
+                liberada, candidata = self._libres.pop()
+                if ahora - liberada < self.inactividad:
+                    conexion = candidata
+                    break
+                vencidas.append(candidata)
+        for vencida in vencidas:
+            self._cerrar(vencida)
+        return conexion or self._abrir()
+
+    def _devolver(self, conexion: smtplib.SMTP) -> None:
+        """Guarda una conexión para reutilizarla, o la cierra si sobran."""
+        with self._lock:
+            if len(self._libres) < self.max_conexiones:
+                self._libres.append((time.monotonic(), conexion))
+                return
+        self._cerrar(conexion)
+
+    def _enviar_por(self, conexion: smtplib.SMTP, mensaje) -> smtplib.SMTP:
+        """
+        Envía un mensaje, reconectando una vez si la conexión se cayó.
+
+        Returns:
+            smtplib.SMTP: Conexión con la que se envió (puede ser nueva).
+
+        Notas:
+            - Si el envío falla, la conexión se cierra antes de propagar
+              el error
+        """
+        try:
+            conexion.send_message(mensaje)
+            return conexion
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            conexion.close()
+        except BaseException:
+            self._cerrar(conexion)
+            raise
+
+        conexion = self._abrir()
+        try:
+            conexion.send_message(mensaje)
+        except BaseException:
+            self._cerrar(conexion)
+            raise
+        return conexion
+
+    def enviar(self, mensaje) -> None:
+        """
+        Envía un mensaje de correo.
+
+        Args:
+            mensaje (email.message.Message): Mensaje con sus encabezados.
+
+        Raises:
+            smtplib.SMTPException | OSError: Si el envío falla también con
+                una conexión nueva.
+        """
+        if "From" not in mensaje:
+            mensaje["From"] = self.remitente
+
+        en_sesion = getattr(self._local, "en_sesion", False)
+        conexion = (self._local.conexion if en_sesion else None) or self._tomar()
+        if en_sesion:
+            self._local.conexion = None
+        conexion = self._enviar_por(conexion, mensaje)
+        if en_sesion:
+            self._local.conexion = conexion
+        else:
+            self._devolver(conexion)
+
+    @contextmanager
+    def sesion(self):
+        """
+        Usa una sola conexión para todos los envíos del bloque en este hilo.
+
+        Notas:
+            - La conexión se toma con el primer envío y se devuelve al salir
+            - Las sesiones anidadas usan la conexión de la exterior
+        """
+        if getattr(self._local, "en_sesion", False):
+            yield self
+            return
+        self._local.en_sesion = True
+        self._local.conexion = None
+        try:
+            yield self
+        finally:
+            conexion = self._local.conexion
+            self._local.en_sesion = False
+            self._local.conexion = None
+            if conexion is not None:
+                self._devolver(conexion)
+
+    def cerrar(self) -> None:
+        """Cierra las conexiones libres."""
+        with self._lock:
+            libres, self._libres = self._libres, []
+        for _, conexion in libres:
+            self._cerrar(conexion)
+
+_transporte = None
+_lock_transporte = threading.Lock()
+
+def obtener_transporte() -> TransporteSMTP:
+    """
+    Retorna el transporte de correo del proceso, creándolo la primera vez.
+
+    Notas:
+        - El predeterminado usa SMTP_SERVIDOR, SMTP_PUERTO, SMTP_REMITENTE,
+          SMTP_CLAVE y SMTP_TLS (variables de entorno PARQUEOS_SMTP_*);
+          configurar_transporte lo reemplaza por cualquier otro
+    """
+    global _transporte
+    with _lock_transporte:
+        if _transporte is None:
+            _transporte = TransporteSMTP()
+            atexit.register(_transporte.cerrar)
+        return _transporte
+
+def _servidor_local(servidor: str) -> bool:
+    """Retorna True si servidor es la misma máquina (p. ej. modulo_smtp_local)."""
+    return servidor in ("localhost", "::1") or servidor.startswith("127.")
+
+def verificar_configuracion_correo() -> bool:
+    """
+    Revisa que el transporte de correo del proceso pueda autenticarse.
+
+    Returns:
+        bool: False si el servidor no es local y no hay clave configurada
+            (PARQUEOS_SMTP_CLAVE); en ese caso se imprime el error.
+
+    Notas:
+        - Un servidor remoto como smtp.gmail.com rechaza cada envío sin
+          login; es mejor avisarlo una vez al iniciar que en cada reintento
+    """
+    transporte = obtener_transporte()
+    if transporte.clave or _servidor_local(transporte.servidor):
+        return True
+    print(f"Error de configuración de correo: {transporte.servidor} requiere "
+          f"autenticación y PARQUEOS_SMTP_CLAVE no está definida; "
+          f"los envíos fallarán al autenticarse")
+    return False
+
+def configurar_transporte(transporte: TransporteSMTP | None) -> None:
+    """
+    Reemplaza el transporte de correo del proceso.
+
+    Args:
+        transporte (TransporteSMTP | None): Transporte a usar; None para
+            volver a crear el predeterminado en el próximo envío.
+    """
+    global _transporte
+    with _lock_transporte:
+        anterior, _transporte = _transporte, transporte
+    if anterior is not None and anterior is not transporte:
+        anterior.cerrar()
+
+def _crear_mensaje(destino: str, asunto: str, cuerpo: str, adjuntos: list = ()) -> MIMEMultipart:
+    """
+    Arma un mensaje de correo.
+
+    Args:
+        destino (str): Dirección del destinatario.
+        asunto (str): Asunto del correo.
+        cuerpo (str): Contenido del mensaje.
+        adjuntos (list): Pares (nombre, contenido en bytes).
+
+    Returns:
+        MIMEMultipart: Mensaje listo para enviar.
+    """
+    msg = MIMEMultipart()
+    msg['To'] = destino
+    msg['Subject'] = asunto
+    msg.attach(MIMEText(cuerpo, 'plain'))
+    for nombre, contenido in adjuntos:
+        parte = MIMEApplication(contenido, Name=nombre)
+        parte['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        msg.attach(parte)
+    return msg
 
 def enviar_correo(destino: str, asunto: str, cuerpo: str, adjunto: str = None) -> bool:
     """
@@ -143,36 +1017,16 @@ def enviar_correo(destino: str, asunto: str, cuerpo: str, adjunto: str = None) -
         bool: True si el correo se envió correctamente, False en caso contrario.
         
     Notas:
-        - Usa SMTP de Gmail con TLS
-        - Requiere credenciales de aplicación de Gmail
+        - Usa el transporte del proceso (ver TransporteSMTP), que reutiliza
+          la conexión autenticada entre correos
         - Soporta archivos adjuntos opcionales
     """
-    remitente = 'santivillarley1010@gmail.com'
-    clave = 'vhev updw cwgj dvkv'  # Usa clave de aplicación para Gmail
-
-    # Configurar mensaje
-    msg = MIMEMultipart()
-    msg['From'] = remitente
-    msg['To'] = destino
-    msg['Subject'] = asunto
-
-    # Agregar cuerpo
-    msg.attach(MIMEText(cuerpo, 'plain'))
-
-    # Agregar adjunto si existe
-    if adjunto:
-        with open(adjunto, "rb") as f:
-            part = MIMEApplication(f.read(), Name=os.path.basename(adjunto))
-            part['Content-Disposition'] = f'attachment; filename="{os.path.basename(adjunto)}"'
-            msg.attach(part)
-
     try:
-        # Enviar correo
-        servidor = smtplib.SMTP('smtp.gmail.com', 587)
-        servidor.starttls()
-        servidor.login(remitente, clave)
-        servidor.send_message(msg)
-        servidor.quit()
+        adjuntos = []
+        if adjunto:
+            with open(adjunto, "rb") as f:
+                adjuntos.append((os.path.basename(adjunto), f.read()))
+        obtener_transporte().enviar(_crear_mensaje(destino, asunto, cuerpo, adjuntos))
         return True
     except Exception as e:
         print(f"Error al enviar correo: {e}")
@@ -196,42 +1050,319 @@ def enviar_correo_con_adjunto_binario(destino: str, asunto: str, cuerpo: str, ad
         - Versión alternativa de enviar_correo para adjuntos binarios
         - Útil para enviar PDFs generados en memoria
     """
-    remitente = 'santivillarley1010@gmail.com'
-    clave = 'vhev updw cwgj dvkv'  # clave de aplicación
-
-    # Configurar mensaje
-    msg = MIMEMultipart()
-    msg['From'] = remitente
-    msg['To'] = destino
-    msg['Subject'] = asunto
-
-    # Agregar cuerpo
-    msg.attach(MIMEText(cuerpo, 'plain'))
-
-    # Agregar adjunto binario
-    if adjunto:
-        parte_adjunto = MIMEApplication(adjunto, Name=nombre_adjunto)
-        parte_adjunto['Content-Disposition'] = f'attachment; filename="{nombre_adjunto}"'
-        msg.attach(parte_adjunto)
-
     try:
-        # Enviar correo
-        servidor = smtplib.SMTP('smtp.gmail.com', 587)
-        servidor.starttls()
-        servidor.login(remitente, clave)
-        servidor.send_message(msg)
-        servidor.quit()
+        adjuntos = [(nombre_adjunto, adjunto)] if adjunto else []
+        obtener_transporte().enviar(_crear_mensaje(destino, asunto, cuerpo, adjuntos))
         return True
     except Exception as e:
         print(f"Error al enviar correo con adjunto binario: {e}")
         return False
 
+# ----------------------------
+# Bandeja de salida de correos
+# ----------------------------
+CORREOS_PATH = "data/pc_correos.json"
+REINTENTOS_CORREO = 6        # intentos antes de dar un correo por fallido
+ESPERA_CORREO = 30           # segundos antes del primer reintento; se duplica en cada uno
+ESPERA_MAXIMA_CORREO = 3600  # tope de la espera entre reintentos
+RESERVA_CORREO = 300         # segundos que un despachador tiene reservado un correo
+LOTE_CORREOS = 50            # correos que reserva un despachador por pasada
+CORREOS_CONSERVADOS = 500    # enviados o fallidos que se conservan para consultar su estado
+
+_despertar_despachador = threading.Event()
+_detener_despachador = threading.Event()
+_hilo_despachador = None
+_lock_despachador = threading.Lock()
+
+def ruta_adjuntos(path: str = CORREOS_PATH) -> str:
+    """Retorna la carpeta con los adjuntos de la bandeja de salida path."""
+    return os.path.splitext(path)[0] + "_adjuntos"
+
+def _guardar_adjuntos(path: str, id_correo: str, adjuntos) -> list:
+    """
+    Guarda los adjuntos de un correo, cada uno en su archivo.
+
+    Args:
+        path (str): Archivo de la bandeja de salida.
+        id_correo (str): Id del correo.
+        adjuntos (list): Pares (nombre, contenido en bytes).
+
+    Returns:
+        list: Nombres de los adjuntos, en orden; el i-ésimo está en el
+            archivo "<id>-<i>" de ruta_adjuntos(path).
+
+    Notas:
+        - Cada archivo se escribe con temporal, fsync y rename; falta
+          sincronizar la carpeta, lo que encolar_correos hace una vez
+    """
+    directorio = ruta_adjuntos(path)
+    os.makedirs(directorio, exist_ok=True)
+    nombres = []
+    for i, (nombre, contenido) in enumerate(adjuntos):
+        destino = os.path.join(directorio, f"{id_correo}-{i}")
+        with open(destino + ".tmp", "wb") as archivo:
+            archivo.write(contenido)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(destino + ".tmp", destino)
+        nombres.append(nombre)
+    return nombres
+
+def _leer_adjuntos(path: str, correo: dict) -> list:
+    """Retorna los adjuntos de un correo como pares (nombre, bytes)."""
+    adjuntos = []
+    for i, nombre in enumerate(correo["adjuntos"]):
+        with open(os.path.join(ruta_adjuntos(path), f"{correo['id']}-{i}"), "rb") as archivo:
+            adjuntos.append((nombre, archivo.read()))
+    return adjuntos
+
+def _borrar_adjuntos(path: str, correo: dict) -> None:
+    """Borra los archivos de los adjuntos de un correo."""
+    for i in range(len(correo["adjuntos"])):
+        try:
+            os.remove(os.path.join(ruta_adjuntos(path), f"{correo['id']}-{i}"))
+        except FileNotFoundError:
+            pass
+
+def encolar_correo(destino: str, asunto: str, cuerpo: str, adjuntos: list = (),
+                   path: str = CORREOS_PATH) -> str:
+    """
+    Guarda un correo en la bandeja de salida para enviarlo en segundo plano.
+
+    Args:
+        destino (str): Dirección del destinatario.
+        asunto (str): Asunto del correo.
+        cuerpo (str): Contenido del mensaje.
+        adjuntos (list): Pares (nombre, contenido en bytes).
+        path (str): Archivo de la bandeja de salida.
+
+    Returns:
+        str: Id del correo, para consultar su estado con estado_correo.
+
+    Notas:
+        - Retorna apenas el correo queda escrito en disco; lo envía el
+          despachador (ver iniciar_despachador), con reintentos
+        - Si la aplicación se cierra antes del envío, el correo se envía
+          la próxima vez que arranque un despachador
+    """
+    return encolar_correos([(destino, asunto, cuerpo, adjuntos)], path)[0]
+
+def encolar_correos(mensajes: list, path: str = CORREOS_PATH) -> list:
+    """
+    Guarda varios correos en la bandeja de salida con una sola escritura.
+
+    Args:
+        mensajes (list): Tuplas (destino, asunto, cuerpo) o
+            (destino, asunto, cuerpo, adjuntos), como en encolar_correo.
+        path (str): Archivo de la bandeja de salida.
+
+    Returns:
+        list: Ids de los correos, en el orden de mensajes.
+
+    Notas:
+        - El archivo se bloquea, lee y escribe una vez para todo el lote,
+          así que encolar N correos cuesta casi lo mismo que encolar uno
+        - Los adjuntos van en archivos aparte (ver ruta_adjuntos) y se
+          escriben antes que la bandeja; en ella solo quedan sus nombres,
+          para que cada escritura de la bandeja no copie los adjuntos de
+          todos los correos pendientes
+    """
+    ahora = time.time()
+    creado = fecha_hora_actual()
+    nuevos = []
+    con_adjuntos = False
+    for destino, asunto, cuerpo, *resto in mensajes:
+        id_correo = str(uuid.uuid4())
+        adjuntos = _guardar_adjuntos(path, id_correo, resto[0]) if resto and resto[0] else []
+        con_adjuntos = con_adjuntos or bool(adjuntos)
+        nuevos.append({
+            "id": id_correo,
+            "destino": destino,
+            "asunto": asunto,
+            "cuerpo": cuerpo,
+            "adjuntos": adjuntos,
+            "estado": "pendiente",
+            "intentos": 0,
+            "proximo_intento": ahora,
+            "creado": creado,
+            "error": "",
+        })
+    if not nuevos:
+        return []
+    if con_adjuntos:
+        _sincronizar_directorio(ruta_adjuntos(path))
+    with bloquear_archivo(path):
+        correos = leer_json(path)
+        for correo in nuevos:
+            correos[correo["id"]] = correo
+        escribir_json(path, correos)
+    _despertar_despachador.set()
+    return [correo["id"] for correo in nuevos]
+
+def estado_correo(id_correo: str, path: str = CORREOS_PATH) -> dict | None:
+    """
+    Consulta el estado de entrega de un correo encolado.
+
+    Args:
+        id_correo (str): Id retornado por encolar_correo.
+        path (str): Archivo de la bandeja de salida.
+
+    Returns:
+        dict | None: Diccionario con estado ("pendiente", "enviando",
+            "enviado" o "fallido"), intentos, error y enviado (fecha), o
+            None si el correo no existe o ya se descartó.
+    """
+    correo = leer_json(path).get(id_correo)
+    if correo is None:
+        return None
+    return {"estado": correo["estado"], "intentos": correo["intentos"],
+            "error": correo["error"], "enviado": correo.get("enviado", "")}
+
+def _podar_correos(correos: dict) -> list:
+    """
+    Descarta los correos terminados más antiguos y el contenido de los enviados.
+
+    Returns:
+        list: Correos cuyos archivos de adjuntos ya se pueden borrar,
+            una vez escrita la bandeja.
+    """
+    terminados = [id_correo for id_correo, correo in correos.items()
+                  if correo["estado"] in ("enviado", "fallido")]
+    descartados = [correos.pop(id_correo) for id_correo in terminados[:max(0, len(terminados) - CORREOS_CONSERVADOS)]]
+    for correo in correos.values():
+        if correo["estado"] == "enviado" and (correo["adjuntos"] or correo["cuerpo"]):
+            # Para consultar su estado no hacen falta
+            descartados.append(dict(correo))
+            correo["adjuntos"] = []
+            correo["cuerpo"] = ""
+    return [correo for correo in descartados if correo["adjuntos"]]
+
+def procesar_correos(path: str = CORREOS_PATH) -> int:
+    """
+    Envía los correos de la bandeja de salida que están listos.
+
+    Args:
+        path (str): Archivo de la bandeja de salida.
+
+    Returns:
+        int: Cantidad de correos enviados en esta pasada.
+
+    Notas:
+        - Los correos se reservan con el archivo bloqueado y se envían sin
+          él, así que varios procesos pueden despachar la misma bandeja
+        - Una reserva vence a los RESERVA_CORREO segundos: si el proceso
+          que la tomó terminó sin enviar, otro despachador la retoma
+        - Tras un error se reintenta con espera exponencial, hasta
+          REINTENTOS_CORREO intentos
+        - Todo el lote se envía con una sola conexión SMTP
+    """
+    ahora = time.time()
+    with bloquear_archivo(path):
+        correos = leer_json(path)
+        listos = [correo for correo in correos.values()
+                  if (correo["estado"] == "pendiente" and correo["proximo_intento"] <= ahora)
+                  or (correo["estado"] == "enviando" and correo["reservado_hasta"] <= ahora)][:LOTE_CORREOS]
+        if not listos:
+            return 0
+        for correo in listos:
+            correo["estado"] = "enviando"
+            correo["reservado_hasta"] = ahora + RESERVA_CORREO
+        escribir_json(path, correos)
+
+    errores = {}
+    transporte = obtener_transporte()
+    with transporte.sesion():
+        for correo in listos:
+            try:
+                adjuntos = _leer_adjuntos(path, correo)
+                transporte.enviar(_crear_mensaje(correo["destino"], correo["asunto"], correo["cuerpo"], adjuntos))
+                errores[correo["id"]] = None
+            except Exception as e:
+                errores[correo["id"]] = str(e) or type(e).__name__
+
+    with bloquear_archivo(path):
+        correos = leer_json(path)
+        for id_correo, error in errores.items():
+            correo = correos.get(id_correo)
+            if correo is None:
+                continue
+            correo.pop("reservado_hasta", None)
+            correo["intentos"] += 1
+            correo["error"] = error or ""
+            if error is None:
+                correo["estado"] = "enviado"
+                correo["enviado"] = fecha_hora_actual()
+            elif correo["intentos"] >= REINTENTOS_CORREO:
+                correo["estado"] = "fallido"
+                print(f"Error al enviar correo a {correo['destino']}: {error}")
+            else:
+                correo["estado"] = "pendiente"
+                espera = min(ESPERA_CORREO * 2 ** (correo["intentos"] - 1), ESPERA_MAXIMA_CORREO)
+                correo["proximo_intento"] = time.time() + espera
+        descartados = _podar_correos(correos)
+        escribir_json(path, correos)
+    for correo in descartados:
+        _borrar_adjuntos(path, correo)
+    return sum(1 for error in errores.values() if error is None)
+
+def iniciar_despachador(intervalo: float = 5, path: str = CORREOS_PATH) -> threading.Thread:
+    """
+    Inicia un hilo que envía los correos de la bandeja de salida.
+
+    Args:
+        intervalo (float): Segundos entre revisiones, si no se encola nada.
+        path (str): Archivo de la bandeja de salida.
+
+    Returns:
+        threading.Thread: Hilo del despachador (daemon).
+
+    Notas:
+        - encolar_correo despierta al despachador, así que un correo nuevo
+          sale sin esperar el intervalo
+        - Hay un solo despachador por proceso: si ya hay uno corriendo se
+          retorna ese mismo hilo y no se inicia otro
+        - Al iniciar se revisa la configuración del correo
+          (verificar_configuracion_correo) y se avisa si falta la clave
+    """
+    global _hilo_despachador, _detener_despachador
+    with _lock_despachador:
+        if _hilo_despachador is not None and _hilo_despachador.is_alive() \
+                and not _detener_despachador.is_set():
+            return _hilo_despachador
+        verificar_configuracion_correo()
+
+        # Cada hilo tiene su propio evento de parada, así un despachador que
+        # se está deteniendo no sigue corriendo si se inicia otro enseguida
+        detener = threading.Event()
+
+        def ciclo():
+            while not detener.is_set():
+                _despertar_despachador.clear()
+                try:
+                    # Mientras haya lotes listos se siguen enviando
+                    while procesar_correos(path) and not detener.is_set():
+                        pass
+                except Exception as e:
+                    print(f"Error al despachar correos: {e}")
+                _despertar_despachador.wait(intervalo)
+
+        _detener_despachador = detener
+        _hilo_despachador = threading.Thread(target=ciclo, name="despachador-correos", daemon=True)
+        _hilo_despachador.start()
+        return _hilo_despachador
+
+def detener_despachador() -> None:
+    """Detiene el hilo despachador iniciado con iniciar_despachador."""
+    with _lock_despachador:
+        _detener_despachador.set()
+    _despertar_despachador.set()
+
 def actualizar_estados_de_parqueo():
     """
     Libera automáticamente espacios vencidos y actualiza alquileres.
     
     Este método:
-    1. Revisa todos los espacios y sus alquileres activos
+    1. Agrupa los alquileres activos por espacio y toma el más reciente
     2. Identifica aquellos que han excedido su tiempo
     3. Actualiza el estado de los alquileres a 'finalizado'
     4. Libera los espacios correspondientes
@@ -239,38 +1370,84 @@ def actualizar_estados_de_parqueo():
     Notas:
         - Se ejecuta periódicamente para mantener el sistema actualizado
         - Solo afecta a alquileres en estado 'activo'
-        - Guarda los cambios en los archivos JSON correspondientes
+        - Guarda los cambios en el almacén configurado (ver modulo_almacen)
+        - Si otra terminal modifica los datos al mismo tiempo, se omite la
+          revisión; la próxima ejecución periódica la repite
     """
-    espacios = leer_json(ESPACIOS_PATH)
-    alquileres = leer_json(ALQUILERES_PATH)
+    import modulo_almacen as ma
+
     ahora = datetime.now()
 
-    cambios = False
+    try:
+        _liberar_vencidos(ma.obtener_almacen(), ahora)
+    except ConflictoVersion:
+        # Otra terminal modificó los datos; la próxima ejecución lo revisa
+        print("Aviso: los estados de parqueo cambiaron en otra terminal, se omite esta revisión")
+
+def alquiler_mas_reciente_por_espacio(alquileres: list) -> dict:
+    """
+    Agrupa los alquileres activos por espacio y elige el de fin más tardío.
+
+    Args:
+        alquileres (list): Alquileres a revisar; los que no están activos
+            se ignoran.
+
+    Returns:
+        dict: Id del espacio (str) -> (fin como marca de tiempo, alquiler).
+
+    Notas:
+        - Una sola pasada: O(A) para A alquileres
+        - Se comparan las marcas de tiempo, porque el texto
+          "DD/MM/YYYY HH:MM" no se ordena cronológicamente
+        - Ante dos alquileres con el mismo fin se conserva el primero
+    """
+    recientes = {}
+    for alquiler in alquileres:
+        if alquiler["estado"] != "activo":
+            continue
+        fin = marca(alquiler, "fin")
+        if fin is None:
+            continue
+        espacio_id = str(alquiler["espacio_id"])
+        actual = recientes.get(espacio_id)
+        if actual is None or fin > actual[0]:
+            recientes[espacio_id] = (fin, alquiler)
+    return recientes
+
+def _liberar_vencidos(almacen, ahora: datetime) -> None:
+    """
+    Finaliza en una transacción los alquileres vencidos y libera sus espacios.
+
+    Args:
+        almacen: Almacén configurado (ver modulo_almacen).
+        ahora (datetime): Momento de referencia.
+    """
+    ahora_ts = ahora.timestamp()
+    with almacen.transaccion() as tx:
+        espacios = tx.leer_espacios()
+        recientes = alquiler_mas_reciente_por_espacio(tx.alquileres_activos())
 
-    for espacio_id, espacio in espacios.items():
-        # Buscar alquiler ACTIVO más reciente para este espacio
-        alquiler = next(
-            (a for a in sorted(alquileres, key=lambda x: x["fin"], reverse=True)
-             if a["espacio_id"] == int(espacio_id) and a["estado"] == "activo"),
-            None
-        )
+        finalizados = {}
+        liberados = {}
 
-        if alquiler:
-            fin_dt = datetime.strptime(alquiler["fin"], "%d/%m/%Y %H:%M")
-            if ahora > fin_dt:
+        for espacio_id, (fin, alquiler) in recientes.items():
+            espacio = espacios.get(espacio_id)
+            if espacio is not None and ahora_ts > fin:
                 # Cambiar estado del alquiler
-                alquiler["estado"] = "finalizado"
+                finalizados[alquiler["id"]] = {"estado": "finalizado"}
                 # Liberar el espacio
                 espacio["usuario"] = ""
                 espacio["placa"] = ""
                 espacio["inicio"] = ""
                 espacio["tiempo"] = 0
                 espacio["fin"] = ""
-                cambios = True
+                sellar_fechas(espacio)
+                liberados[espacio_id] = espacio
 
-    if cambios:
-        escribir_json(ESPACIOS_PATH, espacios)
-        escribir_json(ALQUILERES_PATH, alquileres)
+        # Finalizar alquileres y liberar espacios en una sola transacción
+        if finalizados:
+            tx.actualizar_alquileres(finalizados)
+            tx.actualizar_espacios(liberados)
 
 def convertir_espacios_a_dict():
     """
@@ -0,0 +1,553 @@
+# tests/test_modulo_almacen.py
+
+import sys
+import os
+import json
+import pytest
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import modulo_almacen as ma
+import modulo_bitacora as mb
+import modulo_parqueo as mp
+import modulo_usuarios as mus
+import modulo_utiles as mu
+
+# Archivos temporales para pruebas
+TEST_ESPACIOS = "data/test_alm_espacios.json"
+TEST_ALQUILERES = "data/test_alm_alquileres.json"
+TEST_MULTAS = "data/test_alm_multas.json"
+TEST_USUARIOS = "data/test_alm_usuarios.json"
+TEST_TRANSACCIONES = "data/test_alm_transacciones.jsonl"
+TEST_INGRESOS = "data/test_alm_ingresos.json"
+TEST_DB = "data/test_alm.db"
+TEST_ARCHIVOS = [TEST_ESPACIOS, TEST_ALQUILERES, mb.ruta_bitacora(TEST_ALQUILERES), mb.ruta_indices(TEST_ALQUILERES),
+                 TEST_MULTAS, TEST_USUARIOS, mb.ruta_indices(TEST_USUARIOS), TEST_TRANSACCIONES, TEST_INGRESOS, TEST_DB, TEST_DB + "-wal", TEST_DB + "-shm"]
+
+# Simular envío de correo para no enviar en realidad
+mu.enviar_correo = lambda *args, **kwargs: True
+mu.encolar_correo = lambda *args, **kwargs: "correo"
+
+def limpiar():
+    for f in TEST_ARCHIVOS:
+        if os.path.exists(f):
+            os.remove(f)
+    mb.invalidar_estado()
+
+def crear_almacen_json():
+    return ma.AlmacenJSON(TEST_ESPACIOS, TEST_ALQUILERES, TEST_MULTAS, TEST_USUARIOS, TEST_TRANSACCIONES,
+                          TEST_INGRESOS)
+
+def crear_almacen_sqlite():
+    return ma.AlmacenSQLite(TEST_DB)
+
+@pytest.fixture(params=[crear_almacen_json, crear_almacen_sqlite], ids=["json", "sqlite"])
+def almacen(request):
+    limpiar()
+    almacen = request.param()
+    almacen.guardar_espacios({
+        "1": {"habilitado": "S", "usuario": "", "placa": "", "inicio": "", "tiempo": 0, "fin": ""},
+        "2": {"habilitado": "N", "usuario": "", "placa": "", "inicio": "", "tiempo": 0, "fin": ""}
+    })
+    ma.configurar_almacen(almacen)
+    yield almacen
+    ma.configurar_almacen(None)
+    limpiar()
+
+USUARIO = {
+    "identificacion": "1",
+    "nombre": "Ana",
+    "correo": "ana@correo.com",
+    "tarjeta": {"numero": "4111"},
+    "vehiculos": [{"placa": "ABC123"}]
+}
+
+# ------------------------
+# TESTS
+# ------------------------
+
+def test_espacios(almacen):
+    assert almacen.buscar_espacio("1")["habilitado"] == "S"
+    assert almacen.buscar_espacio("9") is None
+    assert mp.obtener_espacios_disponibles() == [1]
+
+def test_espacios_libres_siguen_alquiler(almacen):
+    almacen.actualizar_espacios({"3": {"habilitado": "S", "usuario": "", "placa": "", "inicio": "", "tiempo": 0, "fin": ""}})
+    assert mp.obtener_espacios_disponibles() == [1, 3]
+    assert mp.contar_espacios_disponibles() == 2
+
+    assert mp.alquilar_espacio("ana@correo.com", 1, 60, "ABC123") is True
+    assert mp.obtener_espacios_disponibles(1) == [3]
+
+    mp.liberar_espacio(mp.obtener_alquiler_activo("ana@correo.com")["id"])
+    assert mp.obtener_espacios_disponibles() == [1, 3]
+
+def test_espacios_libres_ven_escrituras_de_otro_proceso():
+    limpiar()
+    almacen = crear_almacen_json()
+    almacen.guardar_espacios({"1": {"habilitado": "S", "usuario": ""}})
+    assert almacen.espacios_libres() == [1]
+
+    # Otra terminal (otra instancia del almacén) ocupa el espacio
+    otra = crear_almacen_json()
+    otra.actualizar_espacios({"1": {"habilitado": "S", "usuario": "ana@correo.com"}})
+
+    assert almacen.espacios_libres() == []
+    assert almacen.contar_espacios_libres() == 0
+    limpiar()
+
+def test_usuarios(almacen):
+    almacen.agregar_usuario(dict(USUARIO))
+
+    assert almacen.contar_usuarios() == 1
+    assert almacen.buscar_usuario("correo", "ana@correo.com")["nombre"] == "Ana"
+    assert almacen.buscar_usuario("tarjeta", "4111")["identificacion"] == "1"
+    assert almacen.reemplazar_usuario("1", {**USUARIO, "nombre": "Ana María"}) is True
+    assert almacen.buscar_usuario("identificacion", "1")["nombre"] == "Ana María"
+    assert almacen.eliminar_usuario("1") is True
+    assert almacen.eliminar_usuario("1") is False
+
+def test_usuarios_unicos(almacen):
+    almacen.agregar_usuario(dict(USUARIO))
+    otro = {"identificacion": "2", "correo": "beto@correo.com", "tarjeta": {"numero": "4222"}, "vehiculos": []}
+
+    for repetido, campo in (({"identificacion": "1"}, "identificacion"),
+                            ({"correo": "ana@correo.com"}, "correo"),
+                            ({"tarjeta": {"numero": "4111"}}, "tarjeta")):
+        with pytest.raises(ma.ValorDuplicado) as error:
+            almacen.agregar_usuario({**otro, **repetido})
+        assert error.value.campo == campo
+    assert almacen.contar_usuarios() == 1
+
+    almacen.agregar_usuario(dict(otro))
+    with pytest.raises(ma.ValorDuplicado):
+        almacen.reemplazar_usuario("2", {**otro, "correo": "ana@correo.com"})
+
+    # El usuario puede conservar sus propios valores y cambiarlos
+    assert almacen.reemplazar_usuario("1", {**USUARIO, "correo": "ana@nuevo.com"}) is True
+    assert almacen.buscar_usuario("correo", "ana@correo.com") is None
+    assert almacen.buscar_usuario("correo", "ana@nuevo.com")["identificacion"] == "1"
+    almacen.agregar_usuario({**otro, "identificacion": "3", "correo": "ana@correo.com", "tarjeta": {"numero": "4333"}})
+    assert almacen.buscar_usuario("correo", "ana@correo.com")["identificacion"] == "3"
+
+def test_indice_de_usuarios_ve_escrituras_de_otro_proceso():
+    limpiar()
+    almacen = crear_almacen_json()
+    almacen.agregar_usuario(dict(USUARIO))
+    assert almacen.buscar_usuario("tarjeta", "4111")["nombre"] == "Ana"
+
+    crear_almacen_json().reemplazar_usuario("1", {**USUARIO, "nombre": "Ana María", "tarjeta": {"numero": "4999"}})
+
+    assert almacen.buscar_usuario("tarjeta", "4111") is None
+    assert almacen.buscar_usuario("tarjeta", "4999")["nombre"] == "Ana María"
+    limpiar()
+
+def test_contrasenas_con_datos_duplicados_anteriores(almacen, monkeypatch):
+    almacen.agregar_usuario(dict(USUARIO))
+    enviados = []
+    monkeypatch.setattr(mu, "enviar_correo", lambda *args, **kwargs: enviados.append(args) or True)
+
+    # Datos guardados antes de validar únicos: reemplazar el usuario falla
+    def duplicado(*args):
+        raise ma.ValorDuplicado("tarjeta", "4111")
+    monkeypatch.setattr(almacen, "reemplazar_usuario", duplicado)
+    assert mus.actualizar_contrasena("1", "NuevaClave123") is False
+    assert mus.establecer_clave_temporal("ana@correo.com", "Temporal123") is False
+
+    # Si no se guardó, la clave temporal no se envía
+    monkeypatch.setattr(almacen, "reemplazar_usuario", lambda *args: False)
+    assert mus.establecer_clave_temporal("ana@correo.com", "Temporal123") is False
+    assert enviados == []
+
+    monkeypatch.undo()
+    monkeypatch.setattr(mu, "enviar_correo", lambda *args, **kwargs: enviados.append(args) or True)
+    assert mus.establecer_clave_temporal("ana@correo.com", "Temporal123") is True
+    assert almacen.buscar_usuario("correo", "ana@correo.com")["temporal"] is True
+    assert len(enviados) == 1
+
+def test_contrasena_con_tarjeta_y_placa_compartidas(almacen):
+    # Datos anteriores a los índices: la tarjeta y la placa son de los dos
+    mu.escribir_json(TEST_USUARIOS, [
+        {**USUARIO, "contrasena": "x"},
+        {**USUARIO, "identificacion": "2", "correo": "beto@correo.com", "contrasena": "x"},
+    ])
+    almacen = crear_almacen_json()
+    if isinstance(ma.obtener_almacen(), ma.AlmacenSQLite):
+        ma.migrar_json_a_sqlite(TEST_DB, almacen)
+        almacen = crear_almacen_sqlite()
+    ma.configurar_almacen(almacen)
+
+    assert mus.actualizar_contrasena("2", "NuevaClave123") is True
+    assert mus.establecer_clave_temporal("beto@correo.com", "Temporal123") is True
+    assert almacen.buscar_usuario("identificacion", "2")["temporal"] is True
+
+    # La placa sigue siendo del primero, y cambiar a un valor de otro falla
+    assert almacen.buscar_dueno_placa("ABC123")["identificacion"] == "1"
+    with pytest.raises(ma.ValorDuplicado):
+        almacen.reemplazar_usuario("2", {**USUARIO, "identificacion": "2", "correo": "ana@correo.com"})
+
+def test_placas_unicas_y_dueno(almacen):
+    almacen.agregar_usuario(dict(USUARIO))
+    otro = {"identificacion": "2", "correo": "beto@correo.com", "tarjeta": {"numero": "4222"},
+            "vehiculos": [{"placa": "XYZ999"}]}
+    almacen.agregar_usuario(dict(otro))
+
+    assert almacen.buscar_dueno_placa(" abc123 ") == {"identificacion": "1", "correo": "ana@correo.com"}
+    assert almacen.buscar_dueno_placa("NOEXISTE") is None
+
+    with pytest.raises(ma.ValorDuplicado):
+        almacen.reemplazar_usuario("2", {**otro, "vehiculos": [{"placa": "abc123"}]})
+    with pytest.raises(ma.ValorDuplicado):
+        almacen.agregar_usuario({**otro, "identificacion": "3", "vehiculos": [{"placa": "XYZ999"}]})
+    assert almacen.contar_usuarios() == 2
+
+    # Cambiar de placa y de correo mueve la entrada del índice
+    almacen.reemplazar_usuario("1", {**USUARIO, "correo": "ana@nuevo.com", "vehiculos": [{"placa": "DEF456"}]})
+    assert almacen.buscar_dueno_placa("ABC123") is None
+    assert almacen.buscar_dueno_placa("DEF456")["correo"] == "ana@nuevo.com"
+
+    almacen.eliminar_usuario("2")
+    assert almacen.buscar_dueno_placa("XYZ999") is None
+
+def test_indice_de_placas_se_guarda_con_los_usuarios():
+    limpiar()
+    crear_almacen_json().agregar_usuario(dict(USUARIO))
+    assert mu.leer_json(mb.ruta_indices(TEST_USUARIOS))["indices"]["placas"] == {"ABC123": ["1", "ana@correo.com"]}
+
+    # Otra instancia carga el índice guardado; si el archivo de usuarios
+    # cambia por fuera, lo reconstruye
+    assert crear_almacen_json().buscar_dueno_placa("ABC123")["identificacion"] == "1"
+    mu.escribir_json(TEST_USUARIOS, [{**USUARIO, "vehiculos": [{"placa": "GHI789"}]}])
+    nuevo = crear_almacen_json()
+    assert nuevo.buscar_dueno_placa("ABC123") is None
+    assert nuevo.buscar_dueno_placa("GHI789")["identificacion"] == "1"
+    limpiar()
+
+def test_ciclo_de_alquiler(almacen):
+    version = almacen.version_datos()
+    assert mp.alquilar_espacio("ana@correo.com", 1, 60, "ABC123") is True
+    assert mp.alquilar_espacio("otro@correo.com", 1, 60, "XYZ999") is False
+    assert mp.verificar_estado_espacio(1) == "ocupado"
+
+    alquiler = mp.obtener_alquiler_activo("ana@correo.com")
+    assert alquiler["placa"] == "ABC123"
+
+    assert alquiler["inicio_ts"] == mu.marca_de_tiempo(alquiler["inicio"])
+    assert alquiler["fin_ts"] - alquiler["inicio_ts"] == 60 * 60
+
+    assert mp.agregar_tiempo_alquiler(alquiler["id"], 30) is True
+    extendido = almacen.buscar_alquiler(alquiler["id"])
+    assert extendido["costo_total"] > alquiler["costo_total"]
+    assert extendido["fin_ts"] == alquiler["fin_ts"] + 30 * 60
+    assert mu.formatear_marca(extendido["fin_ts"]) == extendido["fin"]
+
+    assert mp.liberar_espacio(alquiler["id"]) is True
+    assert mp.verificar_estado_espacio(1) == "libre"
+    assert mp.obtener_alquiler_activo("ana@correo.com") is None
+    assert [a["estado"] for a in almacen.alquileres_de_usuario("ana@correo.com")] == ["finalizado"]
+
+    # Cada operación confirmada aumenta la versión de los datos; la fallida no
+    assert almacen.version_datos() == version + 3
+
+def test_vencimiento_al_segundo(almacen):
+    # El fin cae a mitad de un minuto: los dos almacenes comparan en segundos
+    fin = mu.marca_de_tiempo("01/01/2024 10:00") + 30
+    almacen.agregar_alquiler({"id": "a", "espacio_id": 1, "usuario": "ana@correo.com", "estado": "activo",
+                              "fin": mu.formatear_marca(fin), "fin_ts": fin, "placa": "ABC123"})
+
+    for segundos, vencidos in ((-30, []), (0, []), (1, ["a"])):
+        ahora = datetime.fromtimestamp(fin + segundos)
+        assert [a["id"] for a in almacen.alquileres_vencidos(ahora)] == vencidos
+        with almacen.transaccion() as tx:
+            assert [a["id"] for a in tx.alquileres_vencidos(ahora)] == vencidos
+
+def test_verificar_multas(almacen, monkeypatch):
+    lotes = []
+    monkeypatch.setattr(mu, "encolar_correos", lambda mensajes, *args, **kwargs: lotes.append(mensajes))
+    almacen.agregar_alquiler({
+        "id": "vencido", "espacio_id": 1, "usuario": "ana@correo.com",
+        "inicio": "01/01/2024 08:00", "fin": "01/01/2024 09:00",
+        "estado": "activo", "costo_total": 10.0, "placa": "ABC123"
+    })
+    almacen.agregar_alquiler({
+        "id": "vigente", "espacio_id": 2, "usuario": "luis@correo.com",
+        "inicio": "01/01/2024 08:00", "fin": "01/01/2999 09:00",
+        "estado": "activo", "costo_total": 10.0, "placa": "XYZ999"
+    })
+    almacen.agregar_alquiler({
+        "id": "vencido2", "espacio_id": 3, "usuario": "ana@correo.com",
+        "inicio": "01/01/2024 08:00", "fin": "01/01/2024 10:00",
+        "estado": "activo", "costo_total": 10.0, "placa": "DEF456"
+    })
+    almacen.actualizar_espacios({"1": {**almacen.buscar_espacio("1"), "usuario": "ana@correo.com"}})
+
+    assert [a["id"] for a in almacen.alquileres_vencidos(datetime.now())] == ["vencido", "vencido2"]
+    mp.verificar_multas()
+
+    assert almacen.alquileres_vencidos(datetime.now()) == []
+    assert almacen.buscar_alquiler("vigente")["estado"] == "activo"
+    assert almacen.buscar_alquiler("vencido")["estado"] == "finalizado"
+    assert almacen.buscar_espacio("1")["usuario"] == ""
+    assert [m["placa"] for m in almacen.leer_multas()] == ["ABC123", "DEF456"]
+
+    # Un solo lote, con un resumen por usuario
+    assert len(lotes) == 1 and [destino for destino, _, _ in lotes[0]] == ["ana@correo.com"]
+    assert "ABC123" in lotes[0][0][2] and "DEF456" in lotes[0][0][2]
+
+def test_transaccion_confirma_todo_junto(almacen):
+    with almacen.transaccion() as tx:
+        tx.agregar_alquiler({"id": "t1", "espacio_id": 1, "usuario": "ana@correo.com",
+                             "fin": "01/01/2024 09:00", "estado": "activo", "placa": "ABC123"})
+        tx.actualizar_espacios({"1": {**tx.buscar_espacio("1"), "usuario": "ana@correo.com"}})
+        tx.agregar_multas([{"id": "m1", "placa": "ABC123"}])
+        assert tx.buscar_alquiler("t1")["estado"] == "activo"
+
+    assert almacen.buscar_alquiler("t1")["placa"] == "ABC123"
+    assert almacen.buscar_espacio("1")["usuario"] == "ana@correo.com"
+    assert [m["placa"] for m in almacen.leer_multas()] == ["ABC123"]
+
+def test_transaccion_se_descarta_con_error(almacen):
+    with pytest.raises(RuntimeError):
+        with almacen.transaccion() as tx:
+            tx.agregar_alquiler({"id": "t1", "espacio_id": 1, "usuario": "ana@correo.com",
+                                 "fin": "01/01/2024 09:00", "estado": "activo", "placa": "ABC123"})
+            tx.actualizar_espacios({"1": {**tx.buscar_espacio("1"), "usuario": "ana@correo.com"}})
+            raise RuntimeError("fallo a mitad")
+
+    assert almacen.buscar_alquiler("t1") is None
+    assert almacen.buscar_espacio("1")["usuario"] == ""
+
+def test_transaccion_detecta_cambio_de_otra_terminal():
+    limpiar()
+    almacen = crear_almacen_json()
+    almacen.guardar_espacios({"1": {"habilitado": "S", "usuario": ""}})
+
+    with pytest.raises(mu.ConflictoVersion):
+        with almacen.transaccion() as tx:
+            espacio = tx.buscar_espacio("1")
+            # Otra terminal ocupa el espacio antes de confirmar
+            almacen.actualizar_espacios({"1": {**espacio, "usuario": "otro@correo.com"}})
+            tx.actualizar_espacios({"1": {**espacio, "usuario": "ana@correo.com"}})
+
+    assert almacen.buscar_espacio("1")["usuario"] == "otro@correo.com"
+    limpiar()
+
+def test_operacion_se_reintenta_tras_conflicto(almacen):
+    intentos = []
+    original = almacen.transaccion
+
+    def transaccion_con_choque():
+        tx = original()
+        if not intentos and isinstance(almacen, ma.AlmacenJSON):
+            confirmar = tx.confirmar
+
+            def confirmar_tras_otra_terminal():
+                # Otra terminal modifica los espacios antes de confirmar
+                almacen.actualizar_espacios({"2": almacen.buscar_espacio("2")})
+                confirmar()
+            tx.confirmar = confirmar_tras_otra_terminal
+        intentos.append(tx)
+        return tx
+
+    almacen.transaccion = transaccion_con_choque
+    assert mp.alquilar_espacio("ana@correo.com", 1, 60, "ABC123") is True
+    assert mp.verificar_estado_espacio(1) == "ocupado"
+    assert len(almacen.alquileres_de_usuario("ana@correo.com")) == 1
+    assert len(intentos) == (2 if isinstance(almacen, ma.AlmacenJSON) else 1)
+
+def test_recuperar_transaccion_interrumpida():
+    limpiar()
+    crear_almacen_json().guardar_espacios({"1": {"habilitado": "S", "usuario": ""}})
+    registro = {
+        "id": "tx",
+        "alquileres": [{"op": "alta", "registro": {"id": "a", "estado": "activo", "usuario": "ana@correo.com"}}],
+        "espacios": {"1": {"habilitado": "S", "usuario": "ana@correo.com"}},
+        "multas": [{"id": "m1", "placa": "ABC123"}],
+    }
+    # Registro confirmado seguido de una línea incompleta (corte al escribir)
+    with open(TEST_TRANSACCIONES, "w", encoding="utf-8") as archivo:
+        archivo.write(json.dumps(registro) + "\n" + '{"id": "otra"')
+
+    almacen = crear_almacen_json()
+    almacen.recuperar()
+
+    assert almacen.buscar_alquiler("a")["usuario"] == "ana@correo.com"
+    assert almacen.buscar_espacio("1")["usuario"] == "ana@correo.com"
+    assert len(almacen.leer_multas()) == 1
+    assert os.path.getsize(TEST_TRANSACCIONES) == 0
+    limpiar()
+
+def test_multas_se_buscan_solo_al_recuperar(monkeypatch):
+    limpiar()
+    almacen = crear_almacen_json()
+    registro = {"id": "tx", "alquileres": [], "espacios": {}, "multas": [{"id": "m1", "placa": "ABC123"}]}
+
+    # En una confirmación normal no se lee el archivo de multas para
+    # buscar sus ids; las nuevas se agregan a las que están en memoria
+    lecturas = []
+    leer_multas = almacen.leer_multas
+    with monkeypatch.context() as m:
+        m.setattr(almacen, "leer_multas", lambda: lecturas.append(1) or leer_multas())
+        almacen._confirmar(registro)
+    assert lecturas == []
+
+    # El mismo registro ya aplicado y todavía en el log (corte antes de
+    # vaciarlo) no duplica la multa
+    with open(TEST_TRANSACCIONES, "w", encoding="utf-8") as archivo:
+        archivo.write(json.dumps(registro) + "\n")
+    assert almacen.recuperar() == 1
+    assert [m["id"] for m in almacen.leer_multas()] == ["m1"]
+    limpiar()
+
+def test_ingresos_diarios(almacen):
+    assert mp.alquilar_espacio("ana@correo.com", 1, 60, "ABC123") is True
+    alquiler = mp.obtener_alquiler_activo("ana@correo.com")
+    assert mp.agregar_tiempo_alquiler(alquiler["id"], 30) is True
+
+    dia = mu.dia_de_marca(alquiler["inicio_ts"])
+    esperado = {dia: {"1": almacen.buscar_alquiler(alquiler["id"])["costo_total"]}}
+    assert almacen.leer_ingresos(dia, dia) == esperado
+    assert almacen.leer_ingresos("1999-01-01", "1999-12-31") == {}
+
+    # Reconstruir desde el historial da el mismo resultado
+    almacen.agregar_alquiler({"id": "viejo", "espacio_id": 2, "usuario": "beto@correo.com", "estado": "finalizado",
+                              "inicio": "31/12/2023 23:00", "fin": "01/01/2024 01:00", "costo_total": 1500})
+    assert almacen.reconstruir_ingresos() == 2
+    assert almacen.leer_ingresos(dia, dia) == esperado
+    assert almacen.leer_ingresos("2023-12-31", "2023-12-31") == {"2023-12-31": {"2": 1500}}
+
+def test_ingresos_no_se_duplican_al_recuperar():
+    limpiar()
+    almacen = crear_almacen_json()
+    with almacen.transaccion() as tx:
+        tx.sumar_ingreso("2024-01-01", 1, 100)
+    with open(TEST_TRANSACCIONES, "w", encoding="utf-8") as archivo:
+        archivo.write(json.dumps({"id": "t1", "alquileres": [], "espacios": {}, "multas": [],
+                                  "ingresos": [["2024-01-01", "1", 50]]}) + "\n")
+
+    assert almacen.recuperar() == 1
+    with open(TEST_TRANSACCIONES, "w", encoding="utf-8") as archivo:
+        archivo.write(json.dumps({"id": "t1", "alquileres": [], "espacios": {}, "multas": [],
+                                  "ingresos": [["2024-01-01", "1", 50]]}) + "\n")
+    assert almacen.recuperar() == 1
+    assert almacen.leer_ingresos("2024-01-01", "2024-01-01") == {"2024-01-01": {"1": 150}}
+    limpiar()
+
+def test_alquiler_antes_del_primer_reporte():
+    # Instalación anterior a los ingresos acumulados: hay historial pero no
+    # archivo de ingresos, y lo primero que ocurre es un alquiler
+    limpiar()
+    almacen = crear_almacen_json()
+    almacen.guardar_espacios({"1": {"habilitado": "S", "usuario": "", "placa": "", "inicio": "", "tiempo": 0, "fin": ""}})
+    almacen.agregar_alquiler(mu.sellar_fechas({"id": "viejo", "espacio_id": 2, "usuario": "beto@correo.com",
+                                               "estado": "finalizado", "inicio": "31/12/2023 23:00",
+                                               "fin": "01/01/2024 01:00", "costo_total": 1500}))
+    assert not os.path.exists(TEST_INGRESOS)
+    ma.configurar_almacen(almacen)
+    try:
+        assert mp.alquilar_espacio("ana@correo.com", 1, 60, "ABC123") is True
+        nuevo = almacen.alquiler_activo_de("ana@correo.com")
+        dia = mu.dia_de_marca(nuevo["inicio_ts"])
+        assert almacen.leer_ingresos("2023-12-31", dia) == {"2023-12-31": {"2": 1500},
+                                                            dia: {"1": nuevo["costo_total"]}}
+    finally:
+        ma.configurar_almacen(None)
+        limpiar()
+
+def test_migrar_marcas_de_tiempo(almacen):
+    almacen.agregar_alquiler({"id": "a", "espacio_id": 1, "usuario": "ana@correo.com", "estado": "finalizado",
+                              "inicio": "31/12/2023 23:00", "fin": "01/01/2024 01:00", "placa": "ABC123"})
+    almacen.actualizar_espacios({"1": {"habilitado": "S", "usuario": "ana@correo.com", "placa": "ABC123",
+                                       "inicio": "31/12/2023 23:00", "tiempo": 120, "fin": "01/01/2024 01:00"}})
+    almacen.agregar_multas([{"id": "m", "placa": "ABC123", "fecha": "01/01/2024 10:00"}])
+
+    assert ma.migrar_marcas_de_tiempo(almacen) == {"alquileres": 1, "espacios": 2, "multas": 1}
+    assert ma.migrar_marcas_de_tiempo(almacen) == {"alquileres": 0, "espacios": 0, "multas": 0}
+
+    alquiler = almacen.buscar_alquiler("a")
+    assert alquiler["fin_ts"] - alquiler["inicio_ts"] == 2 * 60 * 60
+    assert almacen.buscar_espacio("1")["fin_ts"] == alquiler["fin_ts"]
+    assert almacen.buscar_espacio("2")["fin_ts"] is None
+    assert almacen.leer_multas()[0]["fecha_ts"] == mu.marca_de_tiempo("01/01/2024 10:00")
+
+def test_historiales_por_rango_de_fechas(almacen):
+    for id_alquiler, inicio in (("a", "02/01/2024 10:00"), ("b", "01/01/2024 10:00"), ("c", "05/01/2024 10:00")):
+        almacen.agregar_alquiler(mu.sellar_fechas({"id": id_alquiler, "espacio_id": 1, "usuario": "ana@correo.com",
+                                                    "estado": "finalizado", "inicio": inicio, "fin": inicio}))
+    almacen.actualizar_alquileres({"c": mu.sellar_fechas({"inicio": "01/01/2024 08:00"})})
+    almacen.agregar_multas([mu.sellar_fechas({"id": "m1", "fecha": "03/01/2024 10:00"}),
+                            mu.sellar_fechas({"id": "m2", "fecha": "01/01/2024 10:00"})])
+    almacen.agregar_multas([mu.sellar_fechas({"id": "m3", "fecha": "02/01/2024 10:00"})])
+
+    desde, hasta = mu.rango_de_marcas("01/01/2024", "02/01/2024")
+    assert [a["id"] for a in almacen.alquileres_por_inicio(desde, hasta)] == ["a", "b", "c"]
+    assert [a["id"] for a in almacen.alquileres_por_inicio(desde, hasta, descendente=False)] == ["c", "b", "a"]
+    assert [m["id"] for m in almacen.multas_por_fecha(desde, hasta)] == ["m3", "m2"]
+
+    almacen.guardar_multas([mu.sellar_fechas({"id": "m4", "fecha": "01/01/2024 12:00"})])
+    assert [m["id"] for m in almacen.multas_por_fecha(desde, hasta)] == ["m4"]
+
+def test_multas_por_fecha_en_memoria(monkeypatch):
+    limpiar()
+    almacen = crear_almacen_json()
+    almacen.agregar_multas([mu.sellar_fechas({"id": f"m{dia}", "fecha": f"0{dia}/01/2024 10:00"})
+                            for dia in (3, 1, 2)])
+    lecturas = []
+    leer = mu.leer_json_versionado
+    monkeypatch.setattr(mu, "leer_json_versionado", lambda path: lecturas.append(path) or leer(path))
+    monkeypatch.setattr(almacen, "PAGINA_RECORRIDO", 2)
+    desde, hasta = mu.rango_de_marcas("01/01/2024", "05/01/2024")
+
+    # Las multas y su índice quedan en memoria entre consultas y escrituras
+    assert [m["id"] for m in almacen.multas_por_fecha(desde, hasta)] == ["m3", "m2", "m1"]
+    almacen.agregar_multas([mu.sellar_fechas({"id": "m4", "fecha": "04/01/2024 10:00"})])
+    assert [m["id"] for m in almacen.recorrer_multas_por_fecha(desde, hasta)] == ["m1", "m2", "m3", "m4"]
+    assert [m["id"] for m in almacen.recorrer_multas_por_fecha(desde, hasta, True)] == ["m4", "m3", "m2", "m1"]
+    assert lecturas == []
+
+    # Una escritura de otro proceso cambia la versión y se vuelven a leer
+    mu.escribir_json(TEST_MULTAS, [mu.sellar_fechas({"id": "m5", "fecha": "01/01/2024 08:00"})])
+    assert [m["id"] for m in almacen.recorrer_multas_por_fecha(desde, hasta)] == ["m5"]
+    assert lecturas == [TEST_MULTAS]
+    limpiar()
+
+def test_migrar_json_a_sqlite():
+    limpiar()
+    origen = crear_almacen_json()
+    origen.guardar_espacios({"1": {"habilitado": "S", "usuario": ""}})
+    origen.agregar_usuario(dict(USUARIO))
+    origen.agregar_alquiler({"id": "a", "espacio_id": 1, "usuario": "ana@correo.com",
+                             "fin": "01/01/2024 09:00", "estado": "finalizado", "placa": "ABC123"})
+    origen.agregar_multas([{"placa": "ABC123", "fecha": "01/01/2024 10:00"}])
+
+    resultado = ma.migrar_json_a_sqlite(TEST_DB, origen)
+    resultado_repetido = ma.migrar_json_a_sqlite(TEST_DB, origen)
+
+    destino = crear_almacen_sqlite()
+    assert resultado == resultado_repetido == {"espacios": 1, "alquileres": 1, "multas": 1, "usuarios": 1}
+    assert destino.buscar_alquiler("a")["usuario"] == "ana@correo.com"
+    assert len(destino.leer_multas()) == 1
+    assert destino.buscar_dueno_placa("abc123")["correo"] == "ana@correo.com"
+    limpiar()
+
+def test_migrar_json_a_sqlite_sella_los_datos_viejos():
+    # Datos de antes de las marcas de tiempo: solo fechas en texto
+    limpiar()
+    origen = crear_almacen_json()
+    origen.guardar_espacios({"1": {"habilitado": "S", "usuario": "ana@correo.com", "fin": "01/01/2024 09:00"}})
+    origen.agregar_alquiler({"id": "a", "espacio_id": 1, "usuario": "ana@correo.com", "estado": "finalizado",
+                             "inicio": "01/01/2024 08:00", "fin": "01/01/2024 09:00", "costo_total": 140})
+    origen.agregar_multas([{"placa": "ABC123", "fecha": "01/01/2024 10:00"}])
+
+    ma.migrar_json_a_sqlite(TEST_DB, origen)
+    destino = crear_almacen_sqlite()
+    desde, hasta = mu.rango_de_marcas("01/01/2024", "01/01/2024")
+    assert [a["id"] for a in destino.alquileres_por_inicio(desde, hasta)] == ["a"]
+    assert [m["placa"] for m in destino.multas_por_fecha(desde, hasta)] == ["ABC123"]
+    assert destino.buscar_espacio("1")["fin_ts"] == mu.marca_de_tiempo("01/01/2024 09:00")
+    assert ma.migrar_marcas_de_tiempo(destino) == {"alquileres": 0, "espacios": 0, "multas": 0}
+
+    # El origen no se modifica
+    assert "inicio_ts" not in origen.buscar_alquiler("a")
+    limpiar()
@@ -0,0 +1,129 @@
+# tests/test_modulo_bitacora.py
+
+import sys
+import os
+import multiprocessing
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import modulo_bitacora as mb
+import modulo_utiles as mu
+
+# Archivos temporales para pruebas
+TEST_SNAPSHOT = "data/test_bitacora.json"
+TEST_BITACORA = mb.ruta_bitacora(TEST_SNAPSHOT)
+TEST_INDICES = mb.ruta_indices(TEST_SNAPSHOT)
+
+def setup_function():
+    mu.escribir_json(TEST_SNAPSHOT, [{"id": "a", "estado": "activo"}])
+    if os.path.exists(TEST_BITACORA):
+        os.remove(TEST_BITACORA)
+
+def teardown_module(module):
+    for f in [TEST_SNAPSHOT, TEST_BITACORA, TEST_INDICES]:
+        if os.path.exists(f):
+            os.remove(f)
+
+# ------------------------
+# TESTS
+# ------------------------
+
+def test_agregar_registro_no_reescribe_snapshot():
+    antes = os.stat(TEST_SNAPSHOT).st_mtime_ns
+    mb.agregar_registro(TEST_SNAPSHOT, {"id": "b", "estado": "activo"})
+
+    assert os.stat(TEST_SNAPSHOT).st_mtime_ns == antes
+    assert [r["id"] for r in mb.leer_registros(TEST_SNAPSHOT)] == ["a", "b"]
+
+def test_actualizar_registro():
+    mb.actualizar_registro(TEST_SNAPSHOT, "a", {"estado": "finalizado"})
+
+    assert mb.buscar_registro(TEST_SNAPSHOT, "a")["estado"] == "finalizado"
+    assert mb.buscar_registro(TEST_SNAPSHOT, "x") is None
+
+def test_compactar_combina_bitacora():
+    mb.agregar_registro(TEST_SNAPSHOT, {"id": "b", "estado": "activo"})
+    mb.actualizar_registros(TEST_SNAPSHOT, {"a": {"estado": "finalizado"}, "b": {"estado": "finalizado"}})
+
+    assert mb.compactar(TEST_SNAPSHOT) == 3
+    assert os.path.getsize(TEST_BITACORA) == 0
+    assert mb.registros_pendientes(TEST_SNAPSHOT) == 0
+    assert [r["estado"] for r in mu.leer_json(TEST_SNAPSHOT)] == ["finalizado", "finalizado"]
+
+def test_reaplicar_bitacora_no_duplica():
+    mb.agregar_registro(TEST_SNAPSHOT, {"id": "b", "estado": "activo"})
+    registros = mb.leer_registros(TEST_SNAPSHOT)
+
+    # Simula un corte después de escribir el snapshot pero antes de vaciar la bitácora
+    mu.escribir_json(TEST_SNAPSHOT, registros)
+
+    assert [r["id"] for r in mb.leer_registros(TEST_SNAPSHOT)] == ["a", "b"]
+
+def test_linea_incompleta_se_ignora():
+    with open(TEST_BITACORA, "a", encoding="utf-8") as f:
+        f.write('{"op": "alta", "registro": {"id": "c"')
+
+    assert [r["id"] for r in mb.leer_registros(TEST_SNAPSHOT)] == ["a"]
+
+def test_anexar_despues_de_linea_incompleta():
+    with open(TEST_BITACORA, "a", encoding="utf-8") as f:
+        f.write('{"op": "alta", "registro": {"id": "c"')
+    mb.agregar_registro(TEST_SNAPSHOT, {"id": "d", "estado": "activo"})
+
+    assert [r["id"] for r in mb.leer_registros(TEST_SNAPSHOT)] == ["a", "d"]
+
+class IndiceDeIds:
+    """Índice de prueba que cuenta cuántas veces se construye."""
+    construcciones = 0
+
+    def __init__(self, registros):
+        IndiceDeIds.construcciones += 1
+        self.ids = [r["id"] for r in registros]
+
+    @classmethod
+    def desde_exportado(cls, datos):
+        indice = cls.__new__(cls)
+        indice.ids = list(datos)
+        return indice
+
+    def exportar(self):
+        return self.ids
+
+    def actualizar(self, anterior, nuevo):
+        if anterior is None:
+            self.ids.append(nuevo["id"])
+
+def test_indices_se_guardan_al_compactar():
+    mb.registrar_indice(TEST_SNAPSHOT, "ids", IndiceDeIds)
+    mb.agregar_registro(TEST_SNAPSHOT, {"id": "b", "estado": "activo"})
+    assert mb.buscar_por_indice(TEST_SNAPSHOT, "ids", lambda i: i.ids[::-1]) == [
+        {"id": "b", "estado": "activo"}, {"id": "a", "estado": "activo"}]
+    mb.compactar(TEST_SNAPSHOT)
+
+    # Un arranque nuevo carga el índice guardado en lugar de reconstruirlo
+    mb.invalidar_estado()
+    IndiceDeIds.construcciones = 0
+    mb.agregar_registro(TEST_SNAPSHOT, {"id": "c", "estado": "activo"})
+    ids = mb.buscar_por_indice(TEST_SNAPSHOT, "ids", lambda i: i.ids[::-1], en_orden=True)
+
+    assert IndiceDeIds.construcciones == 0
+    assert [r["id"] for r in ids] == ["a", "b", "c"]
+
+def _agregar_muchos(cantidad):
+    for i in range(cantidad):
+        mb.agregar_registro(TEST_SNAPSHOT, {"id": f"p{i}", "estado": "activo"})
+
+@pytest.mark.skipif(mu.fcntl is None, reason="requiere fcntl")
+def test_compactar_no_pierde_lineas_de_otro_proceso():
+    # Otra terminal anexa mientras este proceso compacta una y otra vez
+    proceso = multiprocessing.get_context("fork").Process(target=_agregar_muchos, args=(200,))
+    proceso.start()
+    while proceso.is_alive():
+        mb.compactar(TEST_SNAPSHOT)
+    proceso.join()
+    mb.compactar(TEST_SNAPSHOT)
+
+    mb.invalidar_estado()
+    mu.invalidar_cache_json(TEST_SNAPSHOT)
+    assert len(mu.leer_json(TEST_SNAPSHOT)) == 201
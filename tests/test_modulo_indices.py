@@ -0,0 +1,157 @@
+# tests/test_modulo_indices.py
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import json
+from datetime import datetime
+import modulo_indices as mi
+
+def alquiler(id_alquiler, fin, estado="activo"):
+    return {"id": id_alquiler, "fin": fin, "estado": estado}
+
+AHORA = datetime(2024, 1, 1, 12, 0).timestamp()
+
+# ------------------------
+# TESTS
+# ------------------------
+
+def test_vencidos_en_orden_de_fin():
+    indice = mi.IndiceVencimientos([
+        alquiler("b", "01/01/2024 11:00"),
+        alquiler("a", "01/01/2024 10:00"),
+        alquiler("futuro", "01/01/2024 13:00"),
+        alquiler("viejo", "01/01/2024 09:00", estado="finalizado"),
+    ])
+    assert indice.vencidos(AHORA) == ["a", "b"]
+    # La consulta no consume los vencidos
+    assert indice.vencidos(AHORA) == ["a", "b"]
+
+def test_extender_y_finalizar_actualizan_el_indice():
+    a = alquiler("a", "01/01/2024 10:00")
+    b = alquiler("b", "01/01/2024 11:00")
+    indice = mi.IndiceVencimientos([a, b])
+
+    indice.actualizar(a, {**a, "fin": "01/01/2024 14:00"})
+    indice.actualizar(b, {**b, "estado": "finalizado"})
+    indice.actualizar(None, alquiler("c", "01/01/2024 11:30"))
+
+    assert indice.vencidos(AHORA) == ["c"]
+    assert len(indice) == 2
+
+def test_activos_por_usuario():
+    a = {"id": "a", "usuario": "ana@correo.com", "estado": "activo"}
+    b = {"id": "b", "usuario": "ana@correo.com", "estado": "finalizado"}
+    indice = mi.IndiceActivosPorUsuario([a, b])
+    assert indice.activos_de("ana@correo.com") == ["a"]
+
+    indice.actualizar(a, {**a, "estado": "finalizado"})
+    indice.actualizar(None, {"id": "c", "usuario": "luis@correo.com", "estado": "activo"})
+
+    assert indice.activos_de("ana@correo.com") == []
+    assert indice.todos() == ["c"]
+
+def test_alquileres_por_usuario():
+    a = {"id": "a", "usuario": "ana@correo.com", "estado": "activo"}
+    b = {"id": "b", "usuario": "ana@correo.com", "estado": "finalizado"}
+    indice = mi.IndiceAlquileresPorUsuario([a, b])
+    assert indice.de("ana@correo.com") == ["a", "b"]
+
+    indice.actualizar(a, {**a, "estado": "finalizado"})
+    indice.actualizar(b, {**b, "usuario": "luis@correo.com"})
+    indice.actualizar(None, {"id": "c", "usuario": "ana@correo.com", "estado": "activo"})
+
+    assert indice.de("ana@correo.com") == ["a", "c"]
+    assert indice.de("luis@correo.com") == ["b"]
+    assert indice.de("nadie@correo.com") == []
+
+def test_indices_se_exportan_y_cargan():
+    alquileres = [alquiler("a", "01/01/2024 10:00") | {"usuario": "ana@correo.com"}]
+    for clase in (mi.IndiceVencimientos, mi.IndiceActivosPorUsuario, mi.IndiceAlquileresPorUsuario):
+        original = clase(alquileres)
+        copia = clase.desde_exportado(json.loads(json.dumps(original.exportar())))
+        assert copia.exportar() == original.exportar()
+
+    assert mi.IndiceVencimientos.desde_exportado(
+        mi.IndiceVencimientos(alquileres).exportar()).vencidos(AHORA) == ["a"]
+
+def test_orden_cronologico():
+    a = {"id": "a", "inicio": "02/01/2024 10:00"}
+    b = {"id": "b", "inicio": "01/01/2024 10:00"}
+    c = {"id": "c", "inicio": "03/01/2024 10:00"}
+    indice = mi.IndicePorInicio([a, b, c])
+    desde = datetime(2024, 1, 1).timestamp()
+    hasta = datetime(2024, 1, 3).timestamp()
+    assert indice.rango(desde, hasta) == ["b", "a"]
+    assert indice.rango(desde, hasta, descendente=True) == ["a", "b"]
+
+    indice.actualizar(c, {**c, "inicio": "01/01/2024 12:00"})
+    indice.actualizar(None, {"id": "d", "inicio": "02/01/2024 09:00"})
+    assert indice.rango(desde, hasta) == ["b", "c", "d", "a"]
+
+    copia = mi.IndicePorInicio.desde_exportado(json.loads(json.dumps(indice.exportar())))
+    assert copia.rango(desde, hasta) == indice.rango(desde, hasta)
+
+    multas = [{"fecha": "02/01/2024 10:00"}, {"fecha": "01/01/2024 10:00"}, {"fecha": ""}]
+    assert mi.IndicePorFecha.por_posicion(multas).rango(desde, hasta) == [1, 0]
+
+def test_espacios_libres():
+    indice = mi.IndiceEspaciosLibres({
+        "3": {"habilitado": "S", "usuario": ""},
+        "1": {"habilitado": "S", "usuario": ""},
+        "2": {"habilitado": "N", "usuario": ""},
+        "4": {"habilitado": "S", "usuario": "ana@correo.com"},
+    })
+    assert indice.primeros() == [1, 3]
+
+    indice.actualizar("1", {"habilitado": "S", "usuario": "ana@correo.com"})
+    indice.actualizar(4, {"habilitado": "S", "usuario": ""})
+    indice.actualizar("2", {"habilitado": "S", "usuario": ""})
+
+    assert indice.primeros() == [2, 3, 4]
+    assert indice.primeros(2) == [2, 3]
+    assert len(indice) == 3 and 4 in indice and 1 not in indice
+
+def test_placas():
+    usuarios = [
+        {"identificacion": "1", "correo": "ana@correo.com", "vehiculos": [{"placa": "abc 123"}]},
+        {"identificacion": "2", "correo": "beto@correo.com", "vehiculos": [{"placa": "ABC123"}, {"placa": "XYZ999"}]},
+    ]
+    indice = mi.IndicePlacas(usuarios)
+
+    # Con datos duplicados se queda el primer dueño
+    assert indice.dueno("Abc123") == ("1", "ana@correo.com")
+    assert indice.duplicadas(usuarios[1]) == ["ABC123"]
+    assert indice.duplicadas({"identificacion": "3", "vehiculos": [{"placa": "XYZ999"}]}, "2") == []
+
+    indice.quitar(usuarios[0])
+    indice.agregar({**usuarios[0], "vehiculos": [{"placa": "DEF456"}]})
+    assert indice.dueno("ABC123") is None
+    assert indice.dueno("def456") == ("1", "ana@correo.com")
+    assert mi.IndicePlacas.desde_exportado(json.loads(json.dumps(indice.exportar()))).exportar() == indice.exportar()
+
+def test_usuarios():
+    usuarios = [
+        {"identificacion": "1", "correo": "ana@correo.com", "tarjeta": {"numero": "4111"}},
+        {"identificacion": "2", "correo": "beto@correo.com", "tarjeta": {"numero": "4222"}},
+    ]
+    indice = mi.IndiceUsuarios(usuarios)
+
+    assert indice.buscar("correo", "beto@correo.com")["identificacion"] == "2"
+    assert indice.buscar("tarjeta", "4111")["correo"] == "ana@correo.com"
+    assert indice.buscar("identificacion", "3") is None
+    assert indice.duplicados({"identificacion": "3", "correo": "ana@correo.com", "tarjeta": {"numero": "4222"}}) \
+        == [("correo", "ana@correo.com"), ("tarjeta", "4222")]
+    assert indice.duplicados(usuarios[0], "1") == []
+
+    # Lo retornado es una copia
+    indice.buscar("identificacion", "1")["tarjeta"]["numero"] = "0000"
+    assert indice.buscar("tarjeta", "4111") is not None
+
+    indice.quitar(usuarios[0])
+    indice.agregar({**usuarios[0], "correo": "ana@nuevo.com"})
+    assert indice.buscar("correo", "ana@correo.com") is None
+    assert indice.buscar("correo", "ana@nuevo.com")["identificacion"] == "1"
+    assert len(indice) == 2
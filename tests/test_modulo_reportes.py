@@ -0,0 +1,256 @@
+# tests/test_modulo_reportes.py
+
+import sys
+import os
+import gzip
+import json
+import subprocess
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import modulo_almacen as ma
+import modulo_bitacora as mb
+import modulo_multas as mm
+import modulo_reportes as mr
+import modulo_usuarios as mus
+import modulo_utiles as mu
+
+# Archivos temporales para pruebas
+TEST_ESPACIOS = "data/test_rep_espacios.json"
+TEST_ALQUILERES = "data/test_rep_alquileres.json"
+TEST_MULTAS = "data/test_rep_multas.json"
+TEST_USUARIOS = "data/test_rep_usuarios.json"
+TEST_TRANSACCIONES = "data/test_rep_transacciones.jsonl"
+TEST_INGRESOS = "data/test_rep_ingresos.json"
+TEST_DB = "data/test_rep.db"
+TEST_ARCHIVOS = [TEST_ESPACIOS, TEST_ALQUILERES, mb.ruta_bitacora(TEST_ALQUILERES), mb.ruta_indices(TEST_ALQUILERES),
+                 TEST_MULTAS, TEST_USUARIOS, mb.ruta_indices(TEST_USUARIOS), TEST_TRANSACCIONES, TEST_INGRESOS,
+                 TEST_DB, TEST_DB + "-wal", TEST_DB + "-shm"]
+
+def limpiar():
+    for f in TEST_ARCHIVOS:
+        if os.path.exists(f):
+            os.remove(f)
+    mb.invalidar_estado()
+
+def crear_almacen_json():
+    return ma.AlmacenJSON(TEST_ESPACIOS, TEST_ALQUILERES, TEST_MULTAS, TEST_USUARIOS, TEST_TRANSACCIONES,
+                          TEST_INGRESOS)
+
+def crear_almacen_sqlite():
+    return ma.AlmacenSQLite(TEST_DB)
+
+def alquiler(id_alquiler, espacio_id, usuario, inicio, fin, costo):
+    return mu.sellar_fechas({"id": id_alquiler, "espacio_id": espacio_id, "usuario": usuario,
+                             "estado": "finalizado", "inicio": inicio, "fin": fin, "costo_total": costo})
+
+@pytest.fixture(params=[crear_almacen_json, crear_almacen_sqlite], ids=["json", "sqlite"])
+def almacen(request, tmp_path, monkeypatch):
+    limpiar()
+    monkeypatch.setattr(mr, "CACHE_REPORTES_DIR", str(tmp_path / "cache"))
+    mr.invalidar_cache_reportes()
+    mr.reiniciar_estadisticas_cache_reportes()
+    almacen = request.param()
+    almacen.agregar_usuario({"identificacion": "1", "nombre": "Ana", "apellidos": "Mora",
+                             "correo": "ana@correo.com", "tarjeta": {"numero": "4111"}, "vehiculos": []})
+    for datos in (
+        ("a", 1, "ana@correo.com", "01/01/2024 08:00", "01/01/2024 09:00", 1000),
+        ("b", 2, "beto@correo.com", "01/01/2024 10:00", "01/01/2024 10:30", 500),
+        ("c", 1, "ana@correo.com", "02/01/2024 08:00", "02/01/2024 10:00", 2000),
+        ("fuera", 1, "ana@correo.com", "05/01/2024 08:00", "05/01/2024 09:00", 9999),
+    ):
+        almacen.agregar_alquiler(alquiler(*datos))
+    # Los alquileres se agregaron sin transacción: el acumulado diario se arma del historial
+    almacen.reconstruir_ingresos()
+    almacen.agregar_multas([
+        mu.sellar_fechas({"id": "m1", "fecha": "02/01/2024 11:00", "espacio": 2, "placa": "XYZ789",
+                          "correo": "carla@correo.com", "detalle": "Sin pago"}),
+        mu.sellar_fechas({"id": "m2", "fecha": "01/01/2024 12:00", "espacio": 1, "placa": "ABC123",
+                          "correo": "ana@correo.com", "detalle": "Tiempo excedido"}),
+    ])
+    ma.configurar_almacen(almacen)
+    yield almacen
+    ma.configurar_almacen(None)
+    limpiar()
+
+# ------------------------
+# TESTS
+# ------------------------
+
+def test_etapas():
+    filas = [{"dia": 1, "monto": 10}, {"dia": 1, "monto": 5}, {"dia": 2, "monto": 1}]
+    agregados = {"cantidad": mr.contar(), "total": mr.sumar(lambda f: f["monto"])}
+    esperado = [{"dia": 1, "cantidad": 2, "total": 15}, {"dia": 2, "cantidad": 1, "total": 1}]
+    assert list(mr.agrupar(filas, "dia", lambda f: f["dia"], agregados, ordenadas=True)) == esperado
+    assert list(mr.agrupar(reversed(filas), "dia", lambda f: f["dia"], agregados)) == esperado
+    assert list(mr.filtrar(filas, lambda f: f["dia"] == 2)) == [filas[2]]
+
+def test_reportes(almacen):
+    reporte = mr.generar_reporte("Ingresos", "01/01/2024", "02/01/2024")
+    assert next(reporte) == {"Día": "2024-01-01", "Espacios": 2, "Ingresos (₡)": 1500}
+    assert list(reporte) == [{"Día": "2024-01-02", "Espacios": 1, "Ingresos (₡)": 2000}]
+
+    assert list(mr.generar_reporte("Uso", "01/01/2024", "02/01/2024")) == [
+        {"Espacio": 1, "Usos": 2, "Minutos": 180, "Ingresos (₡)": 3000},
+        {"Espacio": 2, "Usos": 1, "Minutos": 30, "Ingresos (₡)": 500},
+    ]
+    assert [m["Detalle"] for m in mr.generar_reporte("Multas", "01/01/2024", "02/01/2024")] == [
+        "Tiempo excedido", "Sin pago"]
+    assert list(mr.generar_reporte("Usuarios", "01/01/2024", "02/01/2024")) == [
+        {"Correo": "ana@correo.com", "Nombre": "Ana Mora", "Alquileres": 2, "Gastado (₡)": 3000, "Multas": 1},
+        {"Correo": "beto@correo.com", "Nombre": "", "Alquileres": 1, "Gastado (₡)": 500, "Multas": 0},
+        {"Correo": "carla@correo.com", "Nombre": "", "Alquileres": 0, "Gastado (₡)": 0, "Multas": 1},
+    ]
+    assert list(mr.generar_reporte("Ingresos", "01/02/2024", "28/02/2024")) == []
+
+    with pytest.raises(ValueError):
+        mr.generar_reporte("Otro", "01/01/2024", "02/01/2024")
+    with pytest.raises(ValueError):
+        mr.generar_reporte("Uso", "2024-01-01", "02/01/2024")
+
+def test_reporte_de_ingresos_usa_el_acumulado(almacen, monkeypatch):
+    # Un monto sumado solo al acumulado (como una extensión) aparece en el
+    # reporte, y los alquileres no se recorren
+    almacen.sumar_ingreso("2024-01-02", 2, 250)
+    monkeypatch.setattr(almacen, "recorrer_alquileres_por_inicio",
+                        lambda *args: pytest.fail("recorrió los alquileres"))
+    filas = list(mr.generar_reporte("Ingresos", "01/01/2024", "02/01/2024"))
+    assert filas[1] == {"Día": "2024-01-02", "Espacios": 2, "Ingresos (₡)": 2250}
+
+    # Los mismos totales que lee la ventana de administradores
+    ingresos = almacen.leer_ingresos("2024-01-01", "2024-01-02")
+    assert [fila["Ingresos (₡)"] for fila in filas] == [sum(d.values()) for _, d in sorted(ingresos.items())]
+
+def test_recorrido_por_paginas(almacen):
+    if isinstance(almacen, ma.AlmacenJSON):
+        almacen.PAGINA_RECORRIDO = 2
+    desde, hasta = mu.rango_de_marcas("01/01/2024", "31/01/2024")
+    assert [a["id"] for a in almacen.recorrer_alquileres_por_inicio(desde, hasta)] == ["a", "b", "c", "fuera"]
+    assert [a["id"] for a in almacen.recorrer_alquileres_por_inicio(desde, hasta, descendente=True)] == [
+        "fuera", "c", "b", "a"]
+
+def test_exportar_reporte(almacen, tmp_path, monkeypatch):
+    monkeypatch.setattr(mr, "FILAS_POR_BLOQUE", 1)
+    avisos = []
+    ruta = str(tmp_path / "ingresos.csv")
+    assert mr.exportar_reporte("Ingresos", "01/01/2024", "02/01/2024", ruta, progreso=avisos.append) == 2
+    assert avisos == [1, 2]
+    with open(ruta, encoding="utf-8") as archivo:
+        assert archivo.read().splitlines() == ["Día,Espacios,Ingresos (₡)", "2024-01-01,2,1500.0", "2024-01-02,1,2000.0"]
+
+    ruta = str(tmp_path / "multas.ndjson.gz")
+    assert mr.exportar_reporte("Multas", "01/01/2024", "02/01/2024", ruta) == 2
+    with gzip.open(ruta, "rt", encoding="utf-8") as archivo:
+        assert [json.loads(linea)["Placa"] for linea in archivo] == ["ABC123", "XYZ789"]
+
+    # Un error a mitad de la exportación no deja el destino a medio escribir
+    def fallar():
+        yield {"a": 1}
+        raise RuntimeError("falla")
+    with pytest.raises(RuntimeError):
+        for _ in mr.exportar_por_bloques(fallar(), ruta):
+            pass
+    assert sorted(os.listdir(tmp_path)) == ["cache", "ingresos.csv", "multas.ndjson.gz"]
+
+    with pytest.raises(ValueError):
+        mr.exportar_reporte("Ingresos", "01/01/2024", "02/01/2024", str(tmp_path / "ingresos.xlsx"))
+
+def test_cache_de_reportes(almacen):
+    esperado = list(mr.generar_reporte("Uso", "01/01/2024", "02/01/2024"))
+    assert mr.estadisticas_cache_reportes()["fallos"] == 1
+
+    assert list(mr.generar_reporte("Uso", "01/01/2024", "02/01/2024")) == esperado
+    assert mr.estadisticas_cache_reportes()["memoria"] == 1
+    mr.invalidar_cache_reportes()
+    assert list(mr.generar_reporte("Uso", "01/01/2024", "02/01/2024")) == esperado
+    assert mr.estadisticas_cache_reportes()["disco"] == 1
+
+    # Los filtros son parte de la clave
+    assert list(mr.generar_reporte("Uso", "01/01/2024", "02/01/2024", {"Espacio": 2})) == esperado[1:]
+
+    # Cada escritura del almacén aumenta la versión: se vuelve a consultar
+    almacen.agregar_alquiler(alquiler("d", 2, "beto@correo.com", "02/01/2024 12:00", "02/01/2024 13:00", 1000))
+    assert list(mr.generar_reporte("Uso", "01/01/2024", "02/01/2024"))[1]["Usos"] == 2
+
+def test_cache_de_reportes_con_cambios_de_usuarios(almacen):
+    def nombres():
+        return [fila["Nombre"] for fila in mr.generar_reporte("Usuarios", "01/01/2024", "02/01/2024")]
+
+    assert nombres() == ["Ana Mora", "", ""]
+    almacen.agregar_usuario({"identificacion": "2", "nombre": "Beto", "apellidos": "Rojas",
+                             "correo": "beto@correo.com", "tarjeta": {"numero": "4222"}, "vehiculos": []})
+    assert nombres() == ["Ana Mora", "Beto Rojas", ""]
+
+    version = almacen.version_datos()
+    assert mus.eliminar_usuario("1") is True
+    assert almacen.version_datos() > version
+    assert nombres() == ["", "Beto Rojas", ""]
+
+    # Eliminar un usuario que no existe no cambia nada
+    version = almacen.version_datos()
+    assert mus.eliminar_usuario("1") is False
+    assert almacen.version_datos() == version
+
+def test_multa_con_pdf_en_memoria(almacen, tmp_path, monkeypatch):
+    encolados = []
+    monkeypatch.setattr(mu, "encolar_correo", lambda **correo: encolados.append(correo) or "correo")
+    monkeypatch.setattr(mr, "REPORTE_DIR", str(tmp_path / "reportes"))
+    almacen.agregar_usuario({"identificacion": "2", "nombre": "Luis", "apellidos": "Soto", "correo": "luis@correo.com",
+                             "tarjeta": {"numero": "4222"}, "vehiculos": [{"placa": "LUI001"}]})
+
+    multa, enviado = mm.registrar_multa(1, "LUI001", "Sin pago")
+    assert enviado is True and multa["correo"] == "luis@correo.com"
+    (nombre, pdf), = encolados[0]["adjuntos"]
+    assert nombre.startswith("reporte_luis_correo.com_") and pdf.startswith(b"%PDF")
+    assert not os.path.exists(mr.REPORTE_DIR)
+
+    # Sin correo del propietario no hay nada que generar; con
+    # GUARDAR_PDF_MULTAS se conserva una copia en disco
+    assert mm.registrar_multa(1, "NADIE1", "Sin pago")[1] is False
+    assert not os.path.exists(mr.REPORTE_DIR)
+    monkeypatch.setattr(mm, "GUARDAR_PDF_MULTAS", True)
+    mm.registrar_multa(1, "LUI001", "Sin pago")
+    with open(os.path.join(mr.REPORTE_DIR, encolados[-1]["adjuntos"][0][0]), "rb") as archivo:
+        assert archivo.read() == encolados[-1]["adjuntos"][0][1]
+
+def test_reportlab_se_importa_al_primer_pdf():
+    codigo = ("import sys, modulo_reportes as mr; assert 'reportlab' not in sys.modules; "
+              "assert mr.contexto_pdf() is mr.contexto_pdf(); assert 'reportlab' in sys.modules")
+    subprocess.run([sys.executable, "-c", codigo], check=True,
+                   cwd=os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+def test_pdfs_en_lote(almacen, tmp_path):
+    almacen.agregar_usuario({"identificacion": "2", "nombre": "Beto", "apellidos": "Rojas", "correo": "beto@correo.com",
+                             "tarjeta": {"numero": "4333"}, "vehiculos": []})
+    almacen.agregar_usuario({"identificacion": "3", "nombre": "Sin", "apellidos": "Alquileres", "correo": "sin@correo.com",
+                             "tarjeta": {"numero": "4444"}, "vehiculos": []})
+    avisos = []
+    historiales = mr.generar_historiales_en_lote(directorio=str(tmp_path), procesos=2, progreso=avisos.append)
+    assert historiales == {"ana@correo.com": str(tmp_path / "historial_espacios_1.pdf"),
+                           "beto@correo.com": str(tmp_path / "historial_espacios_2.pdf")}
+    assert avisos == [1, 2]
+
+    multas = mr.reemitir_multas_en_lote("01/01/2024", "02/01/2024", directorio=str(tmp_path), procesos=1)
+    assert sorted(multas) == ["m1", "m2"]
+    for ruta in [*historiales.values(), *multas.values()]:
+        with open(ruta, "rb") as archivo:
+            assert archivo.read(4) == b"%PDF"
+    assert not [nombre for nombre in os.listdir(tmp_path) if nombre.endswith(".tmp")]
+
+def test_historiales_en_lote_leen_un_usuario_a_la_vez(almacen, tmp_path, monkeypatch):
+    almacen.agregar_usuario({"identificacion": "2", "nombre": "Beto", "apellidos": "Rojas", "correo": "beto@correo.com",
+                             "tarjeta": {"numero": "4333"}, "vehiculos": []})
+    eventos = []
+    buscar = almacen.alquileres_de_usuario
+    monkeypatch.setattr(almacen, "alquileres_de_usuario", lambda correo: eventos.append(correo) or buscar(correo))
+    monkeypatch.setattr(almacen, "recorrer_alquileres", lambda: pytest.fail("recorrió todo el historial"))
+
+    historiales = mr.generar_historiales_en_lote(directorio=str(tmp_path), procesos=1, progreso=eventos.append)
+    assert sorted(historiales) == ["ana@correo.com", "beto@correo.com"]
+    # Los alquileres de cada usuario se buscan cuando se va a dibujar su PDF
+    assert eventos == ["ana@correo.com", 1, "beto@correo.com", 2]
+
+    with open(historiales["ana@correo.com"], "rb") as archivo:
+        assert archivo.read(4) == b"%PDF"
+    assert [a["id"] for a in almacen.alquileres_de_usuario("ana@correo.com")] == ["a", "c", "fuera"]
@@ -2,9 +2,16 @@
 
 import sys
 import os
+import multiprocessing
+import json
+import socket
+import threading
+import time
+import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src import modulo_smtp_local as msl
 from src import modulo_utiles as mu
 
 def test_validar_correo():
@@ -23,3 +30,392 @@ def test_fecha_hora_actual():
     resultado = mu.fecha_hora_actual()
     assert isinstance(resultado, str)
     assert len(resultado) == 16
+
+# ------------------------
+# Caché de lectura JSON
+# ------------------------
+
+TEST_CACHE = "data/test_cache.json"
+
+def test_leer_json_usa_cache_si_no_cambia():
+    mu.escribir_json(TEST_CACHE, {"a": 1})
+    mu.reiniciar_estadisticas_cache_json()
+
+    assert mu.leer_json(TEST_CACHE) == {"a": 1}
+    assert mu.leer_json(TEST_CACHE) == {"a": 1}
+
+    estadisticas = mu.estadisticas_cache_json()
+    assert estadisticas["fallos"] == 1
+    assert estadisticas["aciertos"] == 1
+    os.remove(TEST_CACHE)
+
+def test_leer_json_retorna_copia_independiente():
+    mu.escribir_json(TEST_CACHE, [{"id": 1}])
+    datos = mu.leer_json(TEST_CACHE)
+    datos.append({"id": 2})
+
+    assert mu.leer_json(TEST_CACHE) == [{"id": 1}]
+    os.remove(TEST_CACHE)
+
+def test_escribir_json_invalida_cache():
+    mu.escribir_json(TEST_CACHE, {"a": 1})
+    mu.leer_json(TEST_CACHE)
+    mu.escribir_json(TEST_CACHE, {"a": 2})
+
+    assert mu.leer_json(TEST_CACHE) == {"a": 2}
+    os.remove(TEST_CACHE)
+
+# ------------------------
+# Escritura atómica y commit grupal
+# ------------------------
+
+def test_escribir_json_no_deja_temporales():
+    mu.escribir_json(TEST_CACHE, {"a": 1})
+    temporales = [f for f in os.listdir("data") if f.endswith(".tmp")]
+    assert temporales == []
+    os.remove(TEST_CACHE)
+
+def test_archivo_atomico(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "reporte.pdf")
+    sincronizados = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: sincronizados.append(fd) or fsync(fd))
+
+    with mu.archivo_atomico(ruta, "wb") as archivo:
+        archivo.write(b"%PDF-1")
+    # Se sincroniza el temporal y el directorio
+    assert len(sincronizados) == (2 if os.name == "posix" else 1)
+
+    # Si el bloque falla, el destino queda intacto y no quedan temporales
+    with pytest.raises(RuntimeError):
+        with mu.archivo_atomico(ruta, "wb") as archivo:
+            archivo.write(b"a medias")
+            raise RuntimeError("falla al dibujar")
+    with open(ruta, "rb") as archivo:
+        assert archivo.read() == b"%PDF-1"
+    assert os.listdir(tmp_path) == ["reporte.pdf"]
+
+def test_commit_grupal_combina_escrituras():
+    mu.activar_commit_grupal(ventana=60)
+    try:
+        antes = mu.estadisticas_escritura_json()["fisicas"]
+        for i in range(5):
+            mu.escribir_json(TEST_CACHE, {"n": i})
+
+        # Las lecturas ven el último valor aunque no esté en disco
+        assert mu.leer_json(TEST_CACHE) == {"n": 4}
+        assert mu.estadisticas_escritura_json()["fisicas"] == antes
+    finally:
+        mu.desactivar_commit_grupal()
+
+    assert mu.estadisticas_escritura_json()["fisicas"] == antes + 1
+    with open(TEST_CACHE, encoding="utf-8") as f:
+        assert f.read().count('"n"') == 1
+    assert mu.leer_json(TEST_CACHE) == {"n": 4}
+    os.remove(TEST_CACHE)
+
+def test_vaciados_simultaneos_no_pisan_datos_nuevos(monkeypatch):
+    escribir_atomico = mu._escribir_atomico
+    otro = []
+
+    def escribir_lento(path, data):
+        if data == {"n": 1} and not otro:
+            # Mientras este vaciado escribe el valor viejo, otro hilo
+            # escribe uno nuevo y vacía por su cuenta
+            def vaciar_otro():
+                mu.escribir_json(TEST_CACHE, {"n": 2})
+                mu.vaciar_escrituras_pendientes()
+            otro.append(threading.Thread(target=vaciar_otro))
+            otro[0].start()
+            otro[0].join(0.2)
+        escribir_atomico(path, data)
+
+    monkeypatch.setattr(mu, "_escribir_atomico", escribir_lento)
+    mu.activar_commit_grupal(ventana=60)
+    try:
+        mu.escribir_json(TEST_CACHE, {"n": 1})
+        mu.vaciar_escrituras_pendientes()
+        otro[0].join()
+    finally:
+        mu.desactivar_commit_grupal()
+
+    with open(TEST_CACHE, encoding="utf-8") as f:
+        assert json.load(f) == {"n": 2}
+    os.remove(TEST_CACHE)
+
+# ------------------------
+# Bloqueo entre procesos y versiones
+# ------------------------
+
+def test_lectores_de_varios_hilos_no_se_esperan(tmp_path):
+    path = str(tmp_path / "datos.json")
+    juntos = threading.Barrier(2, timeout=5)
+    leyendo = threading.Event()
+    soltar = threading.Event()
+    eventos = []
+
+    def leer():
+        with mu.bloquear_archivo(path, exclusivo=False):
+            # Falla por tiempo si el otro lector no puede entrar a la vez
+            juntos.wait()
+            leyendo.set()
+            soltar.wait(5)
+            eventos.append("lectura")
+
+    def escribir():
+        leyendo.wait(5)
+        with mu.bloquear_archivo(path):
+            eventos.append("escritura")
+
+    hilos = [threading.Thread(target=leer), threading.Thread(target=leer), threading.Thread(target=escribir)]
+    for hilo in hilos:
+        hilo.start()
+    leyendo.wait(5)
+    time.sleep(0.1)
+    # El escritor espera a que terminen los lectores
+    assert eventos == []
+    soltar.set()
+    for hilo in hilos:
+        hilo.join(5)
+    assert eventos == ["lectura", "lectura", "escritura"]
+
+    # Un exclusivo dentro de uno compartido vuelve a la lectura al terminar
+    with mu.bloquear_archivo(path, exclusivo=False):
+        with mu.bloquear_archivo(path):
+            assert mu._bloqueo_propio(path)
+        assert not mu._bloqueo_propio(path)
+
+def test_escritura_aumenta_version():
+    mu.escribir_json(TEST_CACHE, {"a": 1})
+    datos, version = mu.leer_json_versionado(TEST_CACHE)
+    mu.escribir_json(TEST_CACHE, {"a": 2})
+
+    assert datos == {"a": 1}
+    assert mu.version_json(TEST_CACHE) == version + 1
+    os.remove(TEST_CACHE)
+
+def test_escritura_versionada_detecta_conflicto():
+    mu.escribir_json(TEST_CACHE, {"a": 1})
+    _, version = mu.leer_json_versionado(TEST_CACHE)
+    mu.escribir_json(TEST_CACHE, {"a": 2})  # otra terminal escribe primero
+
+    with pytest.raises(mu.ConflictoVersion):
+        mu.escribir_json_versionado(TEST_CACHE, {"a": 3}, version)
+    assert mu.leer_json(TEST_CACHE) == {"a": 2}
+    os.remove(TEST_CACHE)
+
+def _incrementar_contador(veces):
+    for _ in range(veces):
+        while True:
+            datos, version = mu.leer_json_versionado(TEST_CACHE)
+            try:
+                mu.escribir_json_versionado(TEST_CACHE, {"n": datos["n"] + 1}, version)
+                break
+            except mu.ConflictoVersion:
+                pass
+
+@pytest.mark.skipif(mu.fcntl is None, reason="requiere fcntl")
+def test_escrituras_versionadas_entre_procesos_no_se_pierden():
+    mu.escribir_json(TEST_CACHE, {"n": 0})
+    contexto = multiprocessing.get_context("fork")
+    procesos = [contexto.Process(target=_incrementar_contador, args=(20,)) for _ in range(4)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join()
+
+    mu.invalidar_cache_json(TEST_CACHE)
+    assert mu.leer_json(TEST_CACHE) == {"n": 80}
+    os.remove(TEST_CACHE)
+
+# ------------------------
+# Estados de parqueo
+# ------------------------
+
+def test_marcas_de_tiempo():
+    marca = mu.marca_de_tiempo("02/01/2024 08:30")
+    assert isinstance(marca, int)
+    assert mu.formatear_marca(marca) == "02/01/2024 08:30"
+    assert mu.marca_de_tiempo("") is None and mu.formatear_marca(None) == ""
+
+    # Se usa la marca guardada; sin ella se convierte el texto
+    assert mu.marca({"fin": "02/01/2024 08:30", "fin_ts": 5}, "fin") == 5
+    assert mu.marca({"fin": "02/01/2024 08:30"}, "fin") == marca
+    assert mu.sellar_fechas({"inicio": "02/01/2024 08:30", "fin": ""}) == {
+        "inicio": "02/01/2024 08:30", "inicio_ts": marca, "fin": "", "fin_ts": None}
+
+    desde, hasta = mu.rango_de_marcas("02/01/2024", "02/01/2024")
+    assert desde <= marca < hasta and hasta - desde == 24 * 60 * 60
+
+def test_alquiler_mas_reciente_por_espacio_compara_fechas():
+    alquileres = [
+        {"id": "a", "espacio_id": 1, "fin": "31/12/2023 23:00", "estado": "activo"},
+        {"id": "b", "espacio_id": 1, "fin": "02/01/2024 08:00", "estado": "activo"},
+        {"id": "c", "espacio_id": 1, "fin": "05/01/2024 08:00", "estado": "finalizado"},
+        {"id": "d", "espacio_id": 2, "fin": "01/01/2024 08:00", "estado": "activo"},
+    ]
+    recientes = mu.alquiler_mas_reciente_por_espacio(alquileres)
+
+    # Como texto "31/12/2023" quedaría después de "02/01/2024"
+    assert recientes["1"][1]["id"] == "b"
+    assert recientes["2"][1]["id"] == "d"
+    assert sorted(recientes) == ["1", "2"]
+
+# ------------------------
+# Transporte de correo
+# ------------------------
+
+@pytest.fixture
+def servidor_smtp():
+    with msl.ServidorSMTPLocal() as servidor:
+        yield servidor
+
+def crear_transporte(servidor):
+    return mu.TransporteSMTP(*servidor.direccion, clave="clave", tls=False)
+
+def test_transporte_reutiliza_la_conexion(servidor_smtp):
+    transporte = crear_transporte(servidor_smtp)
+    for i in range(3):
+        transporte.enviar(mu._crear_mensaje("ana@correo.com", f"Correo {i}", "Hola"))
+    assert (servidor_smtp.conexiones, servidor_smtp.logins, len(servidor_smtp.mensajes)) == (1, 1, 3)
+
+    # Si el servidor cierra la conexión, el siguiente envío reconecta
+    servidor_smtp.cortar_conexiones()
+    transporte.enviar(mu._crear_mensaje("ana@correo.com", "Otro", "Hola"))
+    assert (servidor_smtp.conexiones, servidor_smtp.logins, len(servidor_smtp.mensajes)) == (2, 2, 4)
+    transporte.cerrar()
+
+def test_sesion_usa_una_conexion_por_lote(servidor_smtp):
+    transporte = crear_transporte(servidor_smtp)
+    transporte.max_conexiones = 0  # sin reutilizar fuera de la sesión
+    with transporte.sesion():
+        for i in range(5):
+            transporte.enviar(mu._crear_mensaje("ana@correo.com", f"Correo {i}", "Hola"))
+    assert (servidor_smtp.conexiones, len(servidor_smtp.mensajes)) == (1, 5)
+
+def test_servidor_local_termina_la_sesion_si_se_corta_el_mensaje(servidor_smtp):
+    # El cliente deja de escribir a mitad del mensaje pero sigue leyendo
+    with socket.create_connection(servidor_smtp.direccion) as cliente:
+        cliente.sendall(b"EHLO prueba\r\nDATA\r\nSubject: a medias\r\n")
+        cliente.shutdown(socket.SHUT_WR)
+        fin = time.monotonic() + 5
+        while (servidor_smtp.conexiones == 0 or servidor_smtp.sockets) and time.monotonic() < fin:
+            time.sleep(0.01)
+        assert cliente.recv(1024).startswith(b"220")
+    assert servidor_smtp.sockets == [] and servidor_smtp.recibidos == 0
+
+def test_enviar_correo_usa_el_transporte_configurado(servidor_smtp):
+    mu.configurar_transporte(crear_transporte(servidor_smtp))
+    try:
+        assert mu.enviar_correo("ana@correo.com", "Asunto", "Cuerpo") is True
+        assert mu.enviar_correo_con_adjunto_binario("ana@correo.com", "PDF", "Cuerpo", b"%PDF", "a.pdf") is True
+    finally:
+        mu.configurar_transporte(None)
+    assert servidor_smtp.conexiones == 1
+    assert b'filename="a.pdf"' in servidor_smtp.mensajes[1]
+
+# ------------------------
+# Bandeja de salida de correos
+# ------------------------
+
+def test_bandeja_envia_los_correos_encolados(servidor_smtp, tmp_path):
+    path = str(tmp_path / "correos.json")
+    mu.configurar_transporte(crear_transporte(servidor_smtp))
+    try:
+        id_correo = mu.encolar_correo("ana@correo.com", "PDF", "Cuerpo", [("a.pdf", b"%PDF")], path=path)
+        assert mu.estado_correo(id_correo, path)["estado"] == "pendiente"
+        assert servidor_smtp.mensajes == []
+
+        # El adjunto va en su propio archivo, no en la bandeja
+        assert mu.leer_json(path)[id_correo]["adjuntos"] == ["a.pdf"]
+        assert os.listdir(mu.ruta_adjuntos(path)) == [f"{id_correo}-0"]
+
+        assert mu.procesar_correos(path) == 1
+        assert mu.procesar_correos(path) == 0
+    finally:
+        mu.configurar_transporte(None)
+    estado = mu.estado_correo(id_correo, path)
+    assert (estado["estado"], estado["intentos"]) == ("enviado", 1)
+    assert b'filename="a.pdf"' in servidor_smtp.mensajes[0]
+    assert os.listdir(mu.ruta_adjuntos(path)) == []
+
+def test_encolar_correos_escribe_el_lote_junto(tmp_path):
+    path = str(tmp_path / "correos.json")
+    ids = mu.encolar_correos([("ana@correo.com", "Uno", "Hola"), ("luis@correo.com", "Dos", "Hola")], path=path)
+    assert mu.version_json(path) == 1
+    assert [mu.estado_correo(i, path)["estado"] for i in ids] == ["pendiente", "pendiente"]
+    assert mu.encolar_correos([], path=path) == []
+
+def test_bandeja_reintenta_y_marca_fallidos(tmp_path, monkeypatch):
+    path = str(tmp_path / "correos.json")
+    monkeypatch.setattr(mu, "REINTENTOS_CORREO", 2)
+    monkeypatch.setattr(mu, "ESPERA_CORREO", 0)
+    # Un puerto sin servidor: cada envío falla al conectar
+    with socket.socket() as libre:
+        libre.bind(("127.0.0.1", 0))
+        puerto = libre.getsockname()[1]
+    mu.configurar_transporte(mu.TransporteSMTP("127.0.0.1", puerto, tls=False, timeout=1))
+    try:
+        id_correo = mu.encolar_correo("ana@correo.com", "Asunto", "Cuerpo", path=path)
+        assert mu.procesar_correos(path) == 0
+        estado = mu.estado_correo(id_correo, path)
+        assert (estado["estado"], estado["intentos"]) == ("pendiente", 1)
+        assert estado["error"]
+
+        mu.procesar_correos(path)
+        assert mu.estado_correo(id_correo, path)["estado"] == "fallido"
+        assert mu.procesar_correos(path) == 0
+    finally:
+        mu.configurar_transporte(None)
+
+def test_despachador_vacia_la_bandeja(servidor_smtp, tmp_path):
+    path = str(tmp_path / "correos.json")
+    mu.configurar_transporte(crear_transporte(servidor_smtp))
+    hilo = mu.iniciar_despachador(intervalo=60, path=path)
+    try:
+        for i in range(3):
+            mu.encolar_correo("ana@correo.com", f"Correo {i}", "Hola", path=path)
+        assert servidor_smtp.esperar_mensajes(3)
+    finally:
+        mu.detener_despachador()
+        hilo.join(5)
+        mu.configurar_transporte(None)
+    assert not hilo.is_alive()
+
+def test_despachador_se_inicia_una_sola_vez(tmp_path):
+    path = str(tmp_path / "correos.json")
+    hilo = mu.iniciar_despachador(intervalo=60, path=path)
+    try:
+        assert mu.iniciar_despachador(intervalo=60, path=path) is hilo
+        assert [h for h in threading.enumerate() if h.name == "despachador-correos"] == [hilo]
+    finally:
+        mu.detener_despachador()
+        hilo.join(5)
+    assert not hilo.is_alive()
+
+    # Detenido, se puede volver a iniciar
+    otro = mu.iniciar_despachador(intervalo=60, path=path)
+    try:
+        assert otro is not hilo and otro.is_alive()
+    finally:
+        mu.detener_despachador()
+        otro.join(5)
+
+def test_despachador_avisa_si_falta_la_clave(tmp_path, capsys):
+    path = str(tmp_path / "correos.json")
+    mu.configurar_transporte(mu.TransporteSMTP(servidor="smtp.ejemplo.com", clave=None))
+    try:
+        hilo = mu.iniciar_despachador(intervalo=60, path=path)
+        mu.iniciar_despachador(intervalo=60, path=path)
+        mu.detener_despachador()
+        hilo.join(5)
+        assert capsys.readouterr().out.count("PARQUEOS_SMTP_CLAVE") == 1
+
+        # Un servidor local, como el de prueba, no necesita clave
+        mu.configurar_transporte(mu.TransporteSMTP(servidor="127.0.0.1", clave=None))
+        assert mu.verificar_configuracion_correo()
+        mu.configurar_transporte(mu.TransporteSMTP(servidor="smtp.ejemplo.com", clave="secreta"))
+        assert mu.verificar_configuracion_correo()
+        assert capsys.readouterr().out == ""
+    finally:
+        mu.configurar_transporte(None)